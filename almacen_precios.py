@@ -0,0 +1,164 @@
+# dao/almacen_precios.py
+from db_connection import conectar_db
+from dao.filas_bd import como_columnas
+import logging
+import numpy as np
+
+"""
+Almacén columnar en memoria de velas de 1 minuto (PriceStore).
+
+Carga de una sola vez id, high, low y close de ohlcv_raw_1m para todos los
+tickers necesarios en [fecha_inicio, fecha_fin]. Cada ticker queda como un
+conjunto de arreglos NumPy indexados por el desplazamiento en minutos desde
+fecha_inicio, más un bitmap de cobertura (True = existe vela en ese minuto).
+Las búsquedas son O(1) y no tocan la base de datos.
+"""
+
+# dtype de cada columna de (ticker, timestamp, id, high, low, close); None = lista
+TIPOS_FILA_VELA = (None, None, np.int64, np.float64, np.float64, np.float64)
+
+
+class SerieVelas:
+    """
+    Arreglos de un ticker, todos de longitud n_minutos.
+    """
+    __slots__ = ('ids', 'high', 'low', 'close', 'cobertura')
+
+    def __init__(self, n_minutos):
+        self.ids = np.full(n_minutos, -1, dtype=np.int64)
+        self.high = np.full(n_minutos, np.nan, dtype=np.float64)
+        self.low = np.full(n_minutos, np.nan, dtype=np.float64)
+        self.close = np.full(n_minutos, np.nan, dtype=np.float64)
+        self.cobertura = np.zeros(n_minutos, dtype=bool)
+
+
+class PriceStore:
+    """
+    Velas de 1 minuto precargadas para un rango fijo de fechas.
+    """
+
+    def __init__(self, fecha_inicio, fecha_fin):
+        self.fecha_inicio = fecha_inicio
+        self.fecha_fin = fecha_fin
+        delta = fecha_fin - fecha_inicio
+        self.n_minutos = delta.days * 1440 + delta.seconds // 60 + 1
+        self.series = {}  # ticker -> SerieVelas
+
+    @classmethod
+    def para_rango(cls, fecha_inicio, fecha_fin, tickers=None, usar_cache=True, backend=None):
+        """
+        Crea y carga un PriceStore desde `backend` (por defecto el global).
+        Si no se indican tickers se usan los que tienen señales en el rango.
+        En PostgreSQL, con usar_cache (y SIM_CACHE_VELAS no vacío) las velas
+        salen de la caché en disco (dao/cache_velas.py).
+        """
+        if backend is None:
+            from dao.backend_datos import obtener_backend
+            backend = obtener_backend()
+        if tickers is None:
+            tickers = backend.obtener_tickers_senales_rango(fecha_inicio, fecha_fin)
+        store = cls(fecha_inicio, fecha_fin)
+        backend.cargar_velas(store, tickers, usar_cache=usar_cache)
+        return store
+
+    def offset(self, timestamp):
+        """
+        Minuto relativo a fecha_inicio, o None si el timestamp está fuera del
+        rango o no cae exactamente en un minuto.
+        """
+        delta = timestamp - self.fecha_inicio
+        if delta.days < 0 or delta.microseconds or delta.seconds % 60:
+            return None
+        minuto = delta.days * 1440 + delta.seconds // 60
+        return minuto if minuto < self.n_minutos else None
+
+    def cubre(self, ticker, timestamp):
+        """
+        True si el store es la fuente autorizada para (ticker, timestamp):
+        el ticker fue cargado y el timestamp está dentro del rango.
+        """
+        return ticker in self.series and self.offset(timestamp) is not None
+
+    def serie(self, ticker):
+        return self.series.get(ticker)
+
+    def obtener(self, ticker, timestamp):
+        """
+        Retorna (id, high, low, close) o (None, None, None, None) si no hay vela.
+        """
+        serie = self.series.get(ticker)
+        minuto = self.offset(timestamp)
+        if serie is None or minuto is None or not serie.cobertura[minuto]:
+            return None, None, None, None
+        return (
+            int(serie.ids[minuto]),
+            float(serie.high[minuto]),
+            float(serie.low[minuto]),
+            float(serie.close[minuto])
+        )
+
+    def cargar(self, tickers, tamano_lote=50000):
+        """
+        Carga en bloque las velas de los tickers indicados que aún no estén
+        en memoria. Usa un cursor de servidor para no traer todo de una vez.
+        """
+        pendientes = sorted(set(tickers) - set(self.series))
+        if not pendientes:
+            return
+        logging.info(f"📦 Precargando velas 1m de {len(pendientes)} tickers | {self.fecha_inicio} → {self.fecha_fin}")
+        for ticker in pendientes:
+            self.series[ticker] = SerieVelas(self.n_minutos)
+
+        query = """
+            SELECT ticker, "timestamp", id, high, low, close
+            FROM ohlcv_raw_1m
+            WHERE ticker = ANY(%s) AND "timestamp" BETWEEN %s AND %s
+            ORDER BY ticker, "timestamp";
+        """
+        total = 0
+        try:
+            with conectar_db() as conn:
+                with conn.cursor(name='precarga_velas_1m') as cur:
+                    cur.itersize = tamano_lote
+                    cur.execute(query, (pendientes, self.fecha_inicio, self.fecha_fin))
+                    ticker_actual = None
+                    bloque = []
+                    for row in cur:
+                        if row[0] != ticker_actual:
+                            total += self._volcar_bloque(ticker_actual, bloque)
+                            ticker_actual = row[0]
+                            bloque = []
+                        bloque.append(row)
+                    total += self._volcar_bloque(ticker_actual, bloque)
+        except Exception as e:
+            logging.error(f"❌ Error al precargar velas 1m: {e}")
+            raise
+        logging.info(f"✅ {total} velas 1m precargadas en memoria")
+
+    def _volcar_bloque(self, ticker, filas):
+        """
+        Copia las filas de un ticker a sus arreglos. Retorna las filas usadas.
+        """
+        if not filas:
+            return 0
+        _, timestamps, ids, highs, lows, closes = como_columnas(filas, TIPOS_FILA_VELA)
+        minutos = np.array([-1 if m is None else m for m in map(self.offset, timestamps)], dtype=np.int64)
+        usadas = minutos >= 0
+        return self.asignar(ticker, minutos[usadas], ids[usadas], highs[usadas], lows[usadas], closes[usadas])
+
+    def asignar(self, ticker, minutos, ids, highs, lows, closes):
+        """
+        Escribe velas ya ubicadas por minuto en la serie del ticker.
+        """
+        if len(minutos) == 0:
+            return 0
+        serie = self.series.get(ticker)
+        if serie is None:
+            serie = self.series[ticker] = SerieVelas(self.n_minutos)
+        idx = np.asarray(minutos, dtype=np.int64)
+        serie.ids[idx] = np.asarray(ids, dtype=np.int64)
+        serie.high[idx] = np.asarray(highs, dtype=np.float64)
+        serie.low[idx] = np.asarray(lows, dtype=np.float64)
+        serie.close[idx] = np.asarray(closes, dtype=np.float64)
+        serie.cobertura[idx] = True
+        return len(idx)
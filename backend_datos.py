@@ -0,0 +1,280 @@
+# dao/backend_datos.py
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from db_connection import conectar_db
+from dao import senales, precios, estrategias, inversionistas, operaciones, logs
+
+"""
+Backend de datos del simulador.
+
+BackendDatos define todo el acceso a datos que usan Simulador, Operacion,
+RepositorioOperaciones y logging_utils: señales, precios, estrategias,
+inversionistas, operaciones y logs. Hay tres implementaciones:
+- BackendPostgres (este módulo): las funciones dao/* sobre PostgreSQL;
+- BackendMemoria (dao/backend_memoria.py): tablas en dicts y listas;
+- BackendSQLite (dao/backend_sqlite.py): un archivo SQLite local.
+BackendInvestigacion (dao/backend_investigacion.py) lee de otro backend y
+escribe en memoria (Simulador con persistir=False).
+
+Simulador y Operacion reciben el backend por parámetro; quien no lo recibe
+usa el backend global (obtener_backend), PostgreSQL salvo que se cambie con
+configurar_backend.
+"""
+
+# Backend global; None = crear BackendPostgres en el primer uso
+_backend = None
+
+
+def limites_dia(fecha):
+    """[inicio, fin) del día `fecha` como datetime."""
+    inicio = datetime(fecha.year, fecha.month, fecha.day)
+    return inicio, inicio + timedelta(days=1)
+
+
+class BackendDatos(ABC):
+    """
+    Interfaz del acceso a datos. Las filas de operaciones van en el orden de
+    dao.operaciones.COLUMNAS_OPERACION y las de eventos en el de
+    dao.logs.COLUMNAS_LOG. Un backend al que le falte un método abstracto
+    falla al instanciarse.
+    """
+
+    # --- Señales ---
+
+    @abstractmethod
+    def obtener_senales(self, timestamp):
+        """Señales de un minuto como lista de dicts (COLUMNAS_SENAL)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def obtener_tickers_senales_rango(self, fecha_inicio, fecha_fin):
+        raise NotImplementedError
+
+    @abstractmethod
+    def cargar_senales_rango(self, fecha_inicio, fecha_fin):
+        """Señales de [fecha_inicio, fecha_fin] como TablaSenales."""
+        raise NotImplementedError
+
+    # --- Precios ---
+
+    @abstractmethod
+    def obtener_vela_1m(self, ticker, timestamp):
+        """(id, high, low, close) o (None, None, None, None)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def cargar_velas(self, store, tickers, usar_cache=True):
+        """Llena un PriceStore con las velas de los tickers en su rango."""
+        raise NotImplementedError
+
+    def preparar_velas(self, fecha_inicio, fecha_fin):
+        """
+        Deja lista una caché de velas compartida antes de lanzar workers.
+        Sin caché no hace nada.
+        """
+
+    # --- Estrategias ---
+
+    @abstractmethod
+    def obtener_parametros_estrategia(self, id_estrategia):
+        """Parámetros de cierre ya convertidos a fracción (ValueError si no existe)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def cargar_parametros_estrategias(self):
+        """{id_estrategia: parámetros} de todas las estrategias activas con parámetros completos."""
+        raise NotImplementedError
+
+    # --- Inversionistas ---
+
+    @abstractmethod
+    def obtener_todos_inversionistas_activos(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def actualizar_capital_inversionista(self, id_inversionista, capital_actual):
+        raise NotImplementedError
+
+    # --- Operaciones ---
+
+    @abstractmethod
+    def crear_operacion(self, **campos):
+        """Inserta una apertura (argumentos de crear_operacion_en_bd) y retorna su id."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def actualizar_operacion_dca(self, id_operacion, precio_entrada, cantidad, capital_riesgo_usado,
+                                 valor_total_exposicion, cnt_operaciones):
+        raise NotImplementedError
+
+    @abstractmethod
+    def actualizar_operacion_cierre(self, id_operacion, timestamp_cierre, precio_cierre, resultado,
+                                    motivo_cierre, duracion_operacion, id_vela_1m_cierre):
+        raise NotImplementedError
+
+    @abstractmethod
+    def actualizar_precios_max_min_lote(self, filas):
+        """filas: [(id_operacion, precio_max, precio_min), ...]"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def reservar_ids_operacion(self, cantidad):
+        """Lista de `cantidad` ids de operación que nadie más usará."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def persistir_operaciones(self, nuevas, cambios):
+        """
+        Inserta `nuevas` (tuplas con id) y aplica `cambios`
+        ({id_operacion: {columna: valor}}) de forma atómica. Lanza si falla.
+        """
+        raise NotImplementedError
+
+    # --- Logs ---
+
+    @abstractmethod
+    def insertar_eventos(self, filas):
+        raise NotImplementedError
+
+    # --- Puntos de control ---
+
+    @abstractmethod
+    def marca_persistencia(self, id_inversionista):
+        """
+        Marca opaca de las operaciones y eventos del inversionista ya escritos,
+        para descartar_posteriores.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def descartar_posteriores(self, id_inversionista, marca):
+        """
+        Borra, de forma atómica, las operaciones y eventos del inversionista
+        escritos después de `marca`. Solo deshace inserciones: los cambios
+        posteriores a filas anteriores a la marca los rehace la corrida
+        reanudada.
+        """
+        raise NotImplementedError
+
+    # --- Simulación incremental ---
+
+    @abstractmethod
+    def cargar_estado_final(self, id_inversionista, fecha):
+        """
+        Estado con que terminó la última simulación del inversionista:
+        - capital_actual: el de la tabla inversionistas (None si no hay);
+        - operaciones_abiertas: dicts de COLUMNAS_OPERACION_ABIERTA, en orden de apertura;
+        - operaciones_dia: aperturas sin padre y DCA del día `fecha`;
+        - ultima_actividad: apertura o cierre más reciente (None si no hay).
+        """
+        raise NotImplementedError
+
+
+class BackendPostgres(BackendDatos):
+    """
+    Implementación sobre PostgreSQL: delega en las funciones de dao/*.
+    """
+
+    def obtener_senales(self, timestamp):
+        return senales.obtener_senales(timestamp)
+
+    def obtener_tickers_senales_rango(self, fecha_inicio, fecha_fin):
+        return senales.obtener_tickers_senales_rango(fecha_inicio, fecha_fin)
+
+    def cargar_senales_rango(self, fecha_inicio, fecha_fin):
+        return senales.cargar_senales_rango(fecha_inicio, fecha_fin)
+
+    def obtener_vela_1m(self, ticker, timestamp):
+        return precios.consultar_vela_1m(ticker, timestamp)
+
+    def cargar_velas(self, store, tickers, usar_cache=True):
+        from dao.cache_velas import CacheVelas, DIRECTORIO_CACHE_VELAS
+        if usar_cache and DIRECTORIO_CACHE_VELAS:
+            CacheVelas(DIRECTORIO_CACHE_VELAS).cargar_en(store, tickers)
+        else:
+            store.cargar(tickers)
+
+    def preparar_velas(self, fecha_inicio, fecha_fin):
+        from dao.cache_velas import CacheVelas, DIRECTORIO_CACHE_VELAS
+        if DIRECTORIO_CACHE_VELAS:
+            tickers = self.obtener_tickers_senales_rango(fecha_inicio, fecha_fin)
+            CacheVelas(DIRECTORIO_CACHE_VELAS).preparar(tickers, fecha_inicio, fecha_fin)
+
+    def obtener_parametros_estrategia(self, id_estrategia):
+        return estrategias.obtener_parametros_estrategia(id_estrategia)
+
+    def cargar_parametros_estrategias(self):
+        return estrategias.cargar_parametros_estrategias()
+
+    def obtener_todos_inversionistas_activos(self):
+        return inversionistas.obtener_todos_inversionistas_activos()
+
+    def actualizar_capital_inversionista(self, id_inversionista, capital_actual):
+        logs.actualizar_capital_inversionista(id_inversionista, capital_actual)
+
+    def crear_operacion(self, **campos):
+        return operaciones.crear_operacion_en_bd(**campos)
+
+    def actualizar_operacion_dca(self, id_operacion, precio_entrada, cantidad, capital_riesgo_usado,
+                                 valor_total_exposicion, cnt_operaciones):
+        operaciones.actualizar_operacion_dca(
+            id_operacion, precio_entrada, cantidad, capital_riesgo_usado,
+            valor_total_exposicion, cnt_operaciones
+        )
+
+    def actualizar_operacion_cierre(self, id_operacion, timestamp_cierre, precio_cierre, resultado,
+                                    motivo_cierre, duracion_operacion, id_vela_1m_cierre):
+        operaciones.actualizar_operacion_cierre(
+            id_operacion, timestamp_cierre, precio_cierre, resultado,
+            motivo_cierre, duracion_operacion, id_vela_1m_cierre
+        )
+
+    def actualizar_precios_max_min_lote(self, filas):
+        operaciones.actualizar_precios_max_min_lote(filas)
+
+    def reservar_ids_operacion(self, cantidad):
+        return operaciones.reservar_ids_operacion(cantidad)
+
+    def persistir_operaciones(self, nuevas, cambios):
+        with conectar_db() as conn:
+            if nuevas:
+                operaciones.insertar_operaciones_lote(nuevas, operaciones.COLUMNAS_OPERACION, conn=conn)
+            if cambios:
+                operaciones.actualizar_operaciones_lote(cambios, conn)
+            conn.commit()
+
+    def insertar_eventos(self, filas):
+        logs.insertar_eventos_log(filas)
+
+    def marca_persistencia(self, id_inversionista):
+        return operaciones.marca_persistencia(id_inversionista)
+
+    def descartar_posteriores(self, id_inversionista, marca):
+        operaciones.descartar_posteriores(id_inversionista, *marca)
+
+    def cargar_estado_final(self, id_inversionista, fecha):
+        operaciones_dia, ultima_actividad = operaciones.resumen_actividad(id_inversionista, *limites_dia(fecha))
+        return {
+            'capital_actual': inversionistas.obtener_capital_actual(id_inversionista),
+            'operaciones_abiertas': operaciones.obtener_operaciones_abiertas(id_inversionista),
+            'operaciones_dia': operaciones_dia,
+            'ultima_actividad': ultima_actividad,
+        }
+
+
+def configurar_backend(backend):
+    """
+    Instala el backend global. None vuelve a PostgreSQL.
+    """
+    global _backend
+    _backend = backend
+    if backend is not None:
+        logging.info(f"🗃️  Backend de datos: {type(backend).__name__}")
+
+
+def obtener_backend():
+    global _backend
+    if _backend is None:
+        _backend = BackendPostgres()
+    return _backend
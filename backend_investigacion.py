@@ -0,0 +1,75 @@
+# dao/backend_investigacion.py
+from dao.backend_datos import obtener_backend
+from dao.backend_memoria import BackendMemoria
+
+"""
+Backend para corridas de investigación: lee del backend de origen (por
+defecto el global, normalmente PostgreSQL) y nunca escribe en él.
+
+Señales, velas, estrategias, inversionistas y el estado final de una
+simulación incremental salen del origen; aperturas, DCA, cierres, extremos,
+eventos y capital quedan en las tablas en memoria de BackendMemoria. Los
+id_operacion se numeran en memoria desde 1, sin tocar la secuencia de
+producción.
+"""
+
+
+class BackendInvestigacion(BackendMemoria):
+    """
+    Lecturas del origen, escrituras en memoria.
+    """
+
+    def __init__(self, origen=None):
+        super().__init__()
+        self.origen = origen if origen is not None else obtener_backend()
+        self.capital_final = {}  # id_inversionista -> capital_actual escrito al terminar
+
+    # --- Lecturas (origen) ---
+
+    def obtener_senales(self, timestamp):
+        return self.origen.obtener_senales(timestamp)
+
+    def obtener_tickers_senales_rango(self, fecha_inicio, fecha_fin):
+        return self.origen.obtener_tickers_senales_rango(fecha_inicio, fecha_fin)
+
+    def cargar_senales_rango(self, fecha_inicio, fecha_fin):
+        return self.origen.cargar_senales_rango(fecha_inicio, fecha_fin)
+
+    def obtener_vela_1m(self, ticker, timestamp):
+        return self.origen.obtener_vela_1m(ticker, timestamp)
+
+    def cargar_velas(self, store, tickers, usar_cache=True):
+        self.origen.cargar_velas(store, tickers, usar_cache=usar_cache)
+
+    def preparar_velas(self, fecha_inicio, fecha_fin):
+        self.origen.preparar_velas(fecha_inicio, fecha_fin)
+
+    def obtener_parametros_estrategia(self, id_estrategia):
+        return self.origen.obtener_parametros_estrategia(id_estrategia)
+
+    def cargar_parametros_estrategias(self):
+        return self.origen.cargar_parametros_estrategias()
+
+    def obtener_todos_inversionistas_activos(self):
+        return self.origen.obtener_todos_inversionistas_activos()
+
+    def cargar_estado_final(self, id_inversionista, fecha):
+        """
+        Estado final del origen. Las operaciones abiertas se copian a las
+        tablas en memoria para que sus DCA y cierres se puedan aplicar.
+        """
+        estado = self.origen.cargar_estado_final(id_inversionista, fecha)
+        for fila in estado['operaciones_abiertas']:
+            registro = dict(fila)
+            registro['estado'] = 'abierta'
+            self.operaciones[registro['id_operacion']] = registro
+        if estado['operaciones_abiertas']:
+            # Los ids nuevos no deben chocar con los de las operaciones copiadas
+            self._siguiente_id_operacion = max(self._siguiente_id_operacion, max(self.operaciones) + 1)
+        return estado
+
+    # --- Escrituras (memoria) ---
+
+    def actualizar_capital_inversionista(self, id_inversionista, capital_actual):
+        self.consultas['actualizar_capital_inversionista'] += 1
+        self.capital_final[id_inversionista] = capital_actual
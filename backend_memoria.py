@@ -0,0 +1,277 @@
+# dao/backend_memoria.py
+from dao.backend_datos import BackendDatos, limites_dia
+from dao.almacen_precios import SerieVelas
+from dao.senales import COLUMNAS_SENAL, TablaSenales
+from dao.operaciones import COLUMNAS_OPERACION, COLUMNAS_OPERACION_ABIERTA
+from dao.logs import COLUMNAS_LOG
+from dao.estrategias import COLUMNAS_PARAMETROS, convertir_parametros
+from collections import Counter
+
+"""
+Backend de datos en memoria, para investigación offline y pruebas.
+
+Las tablas se cargan con los métodos insertar_* (mismas filas que las tablas
+de PostgreSQL) y las escrituras del simulador quedan en `operaciones` y
+`log`. `consultas` cuenta las llamadas por método: cada una sería un viaje a
+la base de datos con BackendPostgres.
+"""
+
+_INDICE_INVERSIONISTA_LOG = COLUMNAS_LOG.index('id_inversionista_fk')
+_INDICE_TIPO_EVENTO_LOG = COLUMNAS_LOG.index('tipo_evento')
+_INDICE_TIMESTAMP_LOG = COLUMNAS_LOG.index('timestamp_evento')
+
+
+class BackendMemoria(BackendDatos):
+    """
+    Tablas del simulador en dicts y listas.
+    """
+
+    def __init__(self):
+        self.velas = {}  # ticker -> {timestamp: (id, high, low, close)}
+        self.senales = []  # tuplas en orden de COLUMNAS_SENAL
+        self.estrategias = {}  # id_estrategia -> fila (porcentajes como en la tabla)
+        self.inversionistas = {}  # id_inversionista -> config + capital_actual + activo
+        self.operaciones = {}  # id_operacion -> {columna: valor}
+        self.log = []  # tuplas en orden de COLUMNAS_LOG
+        self.consultas = Counter()
+        self._siguiente_id_operacion = 1
+
+    # --- Carga de datos ---
+
+    def insertar_velas(self, filas):
+        """filas: (ticker, timestamp, id, high, low, close)"""
+        for ticker, ts, id_vela, high, low, close in filas:
+            self.velas.setdefault(ticker, {})[ts] = (id_vela, float(high), float(low), float(close))
+
+    def insertar_senales(self, filas):
+        self.senales.extend(tuple(f) for f in filas)
+        self.senales.sort(key=lambda s: (s[3], s[0]))
+
+    def insertar_estrategias(self, filas):
+        for fila in filas:
+            self.estrategias[fila['id_estrategia']] = dict(fila)
+
+    def insertar_inversionistas(self, configs):
+        for config in configs:
+            registro = dict(config)
+            registro.setdefault('capital_actual', registro['capital_aportado'])
+            registro.setdefault('activo', True)
+            self.inversionistas[registro['id_inversionista']] = registro
+
+    def total_consultas(self):
+        return sum(self.consultas.values())
+
+    # --- Señales ---
+
+    def obtener_senales(self, timestamp):
+        self.consultas['obtener_senales'] += 1
+        return [dict(zip(COLUMNAS_SENAL, s)) for s in self.senales if s[3] == timestamp]
+
+    def obtener_tickers_senales_rango(self, fecha_inicio, fecha_fin):
+        self.consultas['obtener_tickers_senales_rango'] += 1
+        return sorted({s[2] for s in self.senales if fecha_inicio <= s[3] <= fecha_fin})
+
+    def cargar_senales_rango(self, fecha_inicio, fecha_fin):
+        self.consultas['cargar_senales_rango'] += 1
+        return TablaSenales(fecha_inicio, fecha_fin, [s for s in self.senales if fecha_inicio <= s[3] <= fecha_fin])
+
+    # --- Precios ---
+
+    def obtener_vela_1m(self, ticker, timestamp):
+        self.consultas['obtener_vela_1m'] += 1
+        return self.velas.get(ticker, {}).get(timestamp, (None, None, None, None))
+
+    def cargar_velas(self, store, tickers, usar_cache=True):
+        self.consultas['cargar_velas'] += 1
+        for ticker in sorted(set(tickers) - set(store.series)):
+            store.series[ticker] = SerieVelas(store.n_minutos)
+            minutos, ids, highs, lows, closes = [], [], [], [], []
+            for ts, (id_vela, high, low, close) in self.velas.get(ticker, {}).items():
+                minuto = store.offset(ts)
+                if minuto is None:
+                    continue
+                minutos.append(minuto)
+                ids.append(id_vela)
+                highs.append(high)
+                lows.append(low)
+                closes.append(close)
+            store.asignar(ticker, minutos, ids, highs, lows, closes)
+
+    # --- Estrategias ---
+
+    def obtener_parametros_estrategia(self, id_estrategia):
+        self.consultas['obtener_parametros_estrategia'] += 1
+        row = self.estrategias.get(id_estrategia)
+        if row is None or not row.get('activa', True):
+            raise ValueError(f"❌ ERROR CRÍTICO: No se encontró estrategia activa con ID {id_estrategia}")
+        return convertir_parametros([row[c] for c in COLUMNAS_PARAMETROS])
+
+    def cargar_parametros_estrategias(self):
+        self.consultas['cargar_parametros_estrategias'] += 1
+        return {
+            id_estrategia: convertir_parametros([row[c] for c in COLUMNAS_PARAMETROS])
+            for id_estrategia, row in sorted(self.estrategias.items())
+            if row.get('activa', True) and all(row.get(c) is not None for c in COLUMNAS_PARAMETROS)
+        }
+
+    # --- Inversionistas ---
+
+    def obtener_todos_inversionistas_activos(self):
+        self.consultas['obtener_todos_inversionistas_activos'] += 1
+        columnas = [
+            'id_inversionista', 'capital_aportado', 'riesgo_max_pct', 'tamano_min', 'tamano_max',
+            'limite_diario', 'limite_abiertas', 'apalancamiento_max', 'comision_pct',
+            'slippage_pct', 'usar_parametros_senal'
+        ]
+        return [
+            {c: registro[c] for c in columnas}
+            for _, registro in sorted(self.inversionistas.items()) if registro['activo']
+        ]
+
+    def actualizar_capital_inversionista(self, id_inversionista, capital_actual):
+        self.consultas['actualizar_capital_inversionista'] += 1
+        if id_inversionista in self.inversionistas:
+            self.inversionistas[id_inversionista]['capital_actual'] = capital_actual
+
+    # --- Operaciones ---
+
+    def crear_operacion(self, **campos):
+        self.consultas['crear_operacion'] += 1
+        id_operacion = self._tomar_ids(1)[0]
+        fila = (
+            id_operacion,
+            campos['id_inversionista_fk'], campos['id_estrategia_fk'], campos['id_senal'], campos['ticker'],
+            campos['tipo_operacion'], campos['precio_entrada'], campos['cantidad'], campos['apalancamiento'],
+            campos['stop_loss'], campos['take_profit'], campos['id_operacion_padre'],
+            campos['timestamp_apertura'], campos['capital_riesgo_usado'], campos['valor_total_exposicion'],
+            campos['porc_sl'], campos['porc_tp'], campos['precio_max_alcanzado'], campos['cnt_operaciones'],
+            campos.get('id_vela_1m_apertura')
+        )
+        self.operaciones[id_operacion] = self._registro_operacion(fila)
+        return id_operacion
+
+    @staticmethod
+    def _registro_operacion(fila):
+        registro = dict(zip(COLUMNAS_OPERACION, fila))
+        registro['estado'] = 'abierta'
+        return registro
+
+    def _actualizar(self, id_operacion, valores):
+        if id_operacion in self.operaciones:
+            self.operaciones[id_operacion].update(valores)
+
+    def actualizar_operacion_dca(self, id_operacion, precio_entrada, cantidad, capital_riesgo_usado,
+                                 valor_total_exposicion, cnt_operaciones):
+        self.consultas['actualizar_operacion_dca'] += 1
+        self._actualizar(id_operacion, {
+            'precio_entrada': precio_entrada,
+            'cantidad': cantidad,
+            'capital_riesgo_usado': capital_riesgo_usado,
+            'valor_total_exposicion': valor_total_exposicion,
+            'cnt_operaciones': cnt_operaciones
+        })
+
+    def actualizar_operacion_cierre(self, id_operacion, timestamp_cierre, precio_cierre, resultado,
+                                    motivo_cierre, duracion_operacion, id_vela_1m_cierre):
+        self.consultas['actualizar_operacion_cierre'] += 1
+        self._actualizar(id_operacion, {
+            'timestamp_cierre': timestamp_cierre,
+            'precio_cierre': precio_cierre,
+            'resultado': resultado,
+            'motivo_cierre': motivo_cierre,
+            'duracion_operacion': duracion_operacion,
+            'id_vela_1m_cierre': id_vela_1m_cierre,
+            'estado': 'cerrada_total'
+        })
+
+    def actualizar_precios_max_min_lote(self, filas):
+        if not filas:
+            return
+        self.consultas['actualizar_precios_max_min_lote'] += 1
+        for id_operacion, precio_max, precio_min in filas:
+            self._actualizar(id_operacion, {'precio_max_alcanzado': precio_max, 'precio_min_alcanzado': precio_min})
+
+    def _tomar_ids(self, cantidad):
+        inicio = self._siguiente_id_operacion
+        self._siguiente_id_operacion += cantidad
+        return list(range(inicio, inicio + cantidad))
+
+    def reservar_ids_operacion(self, cantidad):
+        self.consultas['reservar_ids_operacion'] += 1
+        return self._tomar_ids(cantidad)
+
+    def persistir_operaciones(self, nuevas, cambios):
+        self.consultas['persistir_operaciones'] += 1
+        # Validar antes de escribir: todo o nada, como la transacción en PostgreSQL
+        ids_nuevos = {fila[0] for fila in nuevas}
+        if ids_nuevos & self.operaciones.keys():
+            raise ValueError(f"id_operacion duplicado: {sorted(ids_nuevos & self.operaciones.keys())[:5]}")
+        faltantes = [i for i in cambios if i not in self.operaciones and i not in ids_nuevos]
+        if faltantes:
+            raise KeyError(f"Operaciones inexistentes: {faltantes[:5]}")
+        for fila in nuevas:
+            self.operaciones[fila[0]] = self._registro_operacion(fila)
+        for id_operacion, valores in cambios.items():
+            self.operaciones[id_operacion].update(valores)
+
+    # --- Logs ---
+
+    def insertar_eventos(self, filas):
+        self.consultas['insertar_eventos'] += 1
+        self.log.extend(filas)
+
+    def eventos(self):
+        """Log como lista de dicts (COLUMNAS_LOG)."""
+        return [dict(zip(COLUMNAS_LOG, fila)) for fila in self.log]
+
+    # --- Puntos de control ---
+
+    def marca_persistencia(self, id_inversionista):
+        """(máximo id_operacion, cantidad de eventos) del inversionista."""
+        self.consultas['marca_persistencia'] += 1
+        ids = [i for i, registro in self.operaciones.items() if registro['id_inversionista_fk'] == id_inversionista]
+        eventos = sum(1 for fila in self.log if fila[_INDICE_INVERSIONISTA_LOG] == id_inversionista)
+        return max(ids, default=0), eventos
+
+    def descartar_posteriores(self, id_inversionista, marca):
+        self.consultas['descartar_posteriores'] += 1
+        id_operacion_max, eventos_max = marca
+        log = []
+        vistos = 0
+        for fila in self.log:
+            if fila[_INDICE_INVERSIONISTA_LOG] == id_inversionista:
+                vistos += 1
+                if vistos > eventos_max:
+                    continue
+            log.append(fila)
+        self.log = log
+        for id_operacion in [i for i, registro in self.operaciones.items()
+                             if registro['id_inversionista_fk'] == id_inversionista and i > id_operacion_max]:
+            del self.operaciones[id_operacion]
+
+    # --- Simulación incremental ---
+
+    def cargar_estado_final(self, id_inversionista, fecha):
+        self.consultas['cargar_estado_final'] += 1
+        propias = [r for r in self.operaciones.values() if r['id_inversionista_fk'] == id_inversionista]
+        padres = {r['id_operacion_padre'] for r in propias}
+        abiertas = [
+            {c: r.get(c) for c in COLUMNAS_OPERACION_ABIERTA} for r in propias
+            if r.get('timestamp_cierre') is None and r['id_operacion'] not in padres
+        ]
+        abiertas.sort(key=lambda r: (r['timestamp_apertura'], r['id_senal_fk'], r['id_operacion']))
+        inicio, fin = limites_dia(fecha)
+        aperturas = sum(1 for r in propias if r['id_operacion_padre'] is None and inicio <= r['timestamp_apertura'] < fin)
+        dca = sum(
+            1 for fila in self.log
+            if fila[_INDICE_INVERSIONISTA_LOG] == id_inversionista and fila[_INDICE_TIPO_EVENTO_LOG] == 'dca'
+            and inicio <= fila[_INDICE_TIMESTAMP_LOG] < fin
+        )
+        momentos = [t for r in propias for t in (r['timestamp_apertura'], r.get('timestamp_cierre')) if t is not None]
+        registro = self.inversionistas.get(id_inversionista)
+        return {
+            'capital_actual': registro['capital_actual'] if registro is not None else None,
+            'operaciones_abiertas': abiertas,
+            'operaciones_dia': aperturas + dca,
+            'ultima_actividad': max(momentos, default=None),
+        }
@@ -0,0 +1,397 @@
+# dao/backend_sqlite.py
+from dao.backend_datos import BackendDatos, limites_dia
+from dao.almacen_precios import SerieVelas
+from dao.senales import COLUMNAS_SENAL, TablaSenales
+from dao.operaciones import COLUMNAS_OPERACION, COLUMNAS_OPERACION_ABIERTA
+from dao.logs import COLUMNAS_LOG
+from dao.estrategias import COLUMNAS_PARAMETROS, convertir_parametros
+import logging
+import sqlite3
+from datetime import datetime
+
+"""
+Backend de datos sobre un archivo SQLite (o ':memory:').
+
+Usa las mismas tablas y columnas que PostgreSQL; los timestamps se guardan
+como texto ISO ('YYYY-MM-DD HH:MM:SS'), que ordena igual que la fecha. Los
+id_operacion salen de la tabla secuencias, así las operaciones creadas una a
+una y las reservadas en bloque nunca chocan.
+"""
+
+COLUMNAS_OPERACION_CIERRE = (
+    'precio_min_alcanzado', 'timestamp_cierre', 'precio_cierre', 'resultado',
+    'motivo_cierre', 'duracion_operacion', 'id_vela_1m_cierre', 'pyg_no_realizado'
+)
+
+ESQUEMA = f"""
+CREATE TABLE IF NOT EXISTS ohlcv_raw_1m (
+    id INTEGER PRIMARY KEY, ticker TEXT NOT NULL, "timestamp" TEXT NOT NULL,
+    high REAL, low REAL, close REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_ohlcv_ticker_ts ON ohlcv_raw_1m (ticker, "timestamp");
+CREATE TABLE IF NOT EXISTS senales_generadas (
+    id_senal INTEGER PRIMARY KEY, id_estrategia_fk INTEGER, ticker_fk TEXT, timestamp_senal TEXT,
+    tipo_senal TEXT, precio_senal REAL, target_profit_price REAL, stop_loss_price REAL,
+    apalancamiento_calculado REAL
+);
+CREATE INDEX IF NOT EXISTS ix_senales_ts ON senales_generadas (timestamp_senal);
+CREATE TABLE IF NOT EXISTS estrategias (
+    id_estrategia INTEGER PRIMARY KEY, porc_limite_retro_entrada REAL, porc_limite_retro REAL,
+    porc_retroceso_liquidacion_sl REAL, porc_liquidacion_parcial_sl REAL, activa INTEGER DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS inversionistas (
+    id_inversionista INTEGER PRIMARY KEY, capital_aportado REAL, capital_actual REAL,
+    riesgo_max_operacion_pct REAL, tamano_min_operacion REAL, tamano_max_operacion REAL,
+    limite_diario_operaciones INTEGER, limite_operaciones_abiertas INTEGER, apalancamiento_max REAL,
+    comision_operacion_pct REAL, slippage_pct REAL, usar_parametros_senal INTEGER, activo INTEGER DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS operaciones_simuladas (
+    {', '.join(COLUMNAS_OPERACION[:1])} INTEGER PRIMARY KEY,
+    {', '.join(COLUMNAS_OPERACION[1:] + COLUMNAS_OPERACION_CIERRE)},
+    estado TEXT DEFAULT 'abierta'
+);
+CREATE TABLE IF NOT EXISTS log_operaciones_simuladas (
+    id_log INTEGER PRIMARY KEY, {', '.join(COLUMNAS_LOG)}
+);
+CREATE TABLE IF NOT EXISTS secuencias (nombre TEXT PRIMARY KEY, valor INTEGER NOT NULL);
+"""
+
+# Columnas de inversionistas: clave de la config -> columna de la tabla
+COLUMNAS_INVERSIONISTA = {
+    'id_inversionista': 'id_inversionista',
+    'capital_aportado': 'capital_aportado',
+    'riesgo_max_pct': 'riesgo_max_operacion_pct',
+    'tamano_min': 'tamano_min_operacion',
+    'tamano_max': 'tamano_max_operacion',
+    'limite_diario': 'limite_diario_operaciones',
+    'limite_abiertas': 'limite_operaciones_abiertas',
+    'apalancamiento_max': 'apalancamiento_max',
+    'comision_pct': 'comision_operacion_pct',
+    'slippage_pct': 'slippage_pct',
+    'usar_parametros_senal': 'usar_parametros_senal'
+}
+
+
+def _texto(valor):
+    """Valor listo para SQLite: las fechas como texto ISO."""
+    return valor.isoformat(sep=' ') if isinstance(valor, datetime) else valor
+
+
+def _fila_sql(fila):
+    return tuple(_texto(v) for v in fila)
+
+
+def _fecha(texto):
+    return datetime.fromisoformat(texto) if texto is not None else None
+
+
+class BackendSQLite(BackendDatos):
+    """
+    Acceso a datos sobre SQLite con una conexión propia.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.conn = sqlite3.connect(ruta)
+        self.conn.executescript(ESQUEMA)
+        logging.info(f"🗃️  Backend SQLite abierto: {ruta}")
+
+    def cerrar(self):
+        self.conn.close()
+
+    # --- Carga de datos ---
+
+    def insertar_velas(self, filas):
+        """filas: (ticker, timestamp, id, high, low, close)"""
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO ohlcv_raw_1m (ticker, "timestamp", id, high, low, close) VALUES (?, ?, ?, ?, ?, ?)',
+                (_fila_sql(f) for f in filas)
+            )
+
+    def insertar_senales(self, filas):
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO senales_generadas ({', '.join(COLUMNAS_SENAL)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNAS_SENAL))})",
+                (_fila_sql(f) for f in filas)
+            )
+
+    def insertar_estrategias(self, filas):
+        columnas = ('id_estrategia', 'porc_limite_retro_entrada', 'porc_limite_retro',
+                    'porc_retroceso_liquidacion_sl', 'porc_liquidacion_parcial_sl', 'activa')
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO estrategias ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})",
+                (tuple(fila.get(c, True) if c == 'activa' else fila[c] for c in columnas) for fila in filas)
+            )
+
+    def insertar_inversionistas(self, configs):
+        columnas = list(COLUMNAS_INVERSIONISTA.values()) + ['capital_actual', 'activo']
+        filas = [
+            tuple(config[c] for c in COLUMNAS_INVERSIONISTA) +
+            (config.get('capital_actual', config['capital_aportado']), config.get('activo', True))
+            for config in configs
+        ]
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO inversionistas ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})",
+                filas
+            )
+
+    # --- Señales ---
+
+    @staticmethod
+    def _senal(row):
+        row = list(row)
+        row[3] = datetime.fromisoformat(row[3])
+        return tuple(row)
+
+    def obtener_senales(self, timestamp):
+        cur = self.conn.execute(
+            f"SELECT {', '.join(COLUMNAS_SENAL)} FROM senales_generadas WHERE timestamp_senal = ?",
+            (_texto(timestamp),)
+        )
+        return [dict(zip(COLUMNAS_SENAL, self._senal(row))) for row in cur.fetchall()]
+
+    def obtener_tickers_senales_rango(self, fecha_inicio, fecha_fin):
+        cur = self.conn.execute(
+            "SELECT DISTINCT ticker_fk FROM senales_generadas WHERE timestamp_senal BETWEEN ? AND ? ORDER BY ticker_fk",
+            (_texto(fecha_inicio), _texto(fecha_fin))
+        )
+        return [row[0] for row in cur.fetchall()]
+
+    def cargar_senales_rango(self, fecha_inicio, fecha_fin):
+        cur = self.conn.execute(
+            f"SELECT {', '.join(COLUMNAS_SENAL)} FROM senales_generadas "
+            "WHERE timestamp_senal BETWEEN ? AND ? ORDER BY timestamp_senal, id_senal",
+            (_texto(fecha_inicio), _texto(fecha_fin))
+        )
+        tabla = TablaSenales(fecha_inicio, fecha_fin, [self._senal(row) for row in cur.fetchall()])
+        logging.info(f"📥 {len(tabla)} señales precargadas para {fecha_inicio} → {fecha_fin}")
+        return tabla
+
+    # --- Precios ---
+
+    def obtener_vela_1m(self, ticker, timestamp):
+        row = self.conn.execute(
+            'SELECT id, high, low, close FROM ohlcv_raw_1m WHERE ticker = ? AND "timestamp" = ?',
+            (ticker, _texto(timestamp))
+        ).fetchone()
+        return tuple(row) if row else (None, None, None, None)
+
+    def cargar_velas(self, store, tickers, usar_cache=True):
+        pendientes = sorted(set(tickers) - set(store.series))
+        total = 0
+        for ticker in pendientes:
+            store.series[ticker] = SerieVelas(store.n_minutos)
+            cur = self.conn.execute(
+                'SELECT "timestamp", id, high, low, close FROM ohlcv_raw_1m '
+                'WHERE ticker = ? AND "timestamp" BETWEEN ? AND ?',
+                (ticker, _texto(store.fecha_inicio), _texto(store.fecha_fin))
+            )
+            minutos, ids, highs, lows, closes = [], [], [], [], []
+            for ts, id_vela, high, low, close in cur:
+                minuto = store.offset(datetime.fromisoformat(ts))
+                if minuto is None:
+                    continue
+                minutos.append(minuto)
+                ids.append(id_vela)
+                highs.append(high)
+                lows.append(low)
+                closes.append(close)
+            total += store.asignar(ticker, minutos, ids, highs, lows, closes)
+        logging.info(f"✅ {total} velas 1m cargadas desde SQLite ({len(pendientes)} tickers)")
+
+    # --- Estrategias ---
+
+    def obtener_parametros_estrategia(self, id_estrategia):
+        row = self.conn.execute(
+            "SELECT porc_limite_retro_entrada, porc_limite_retro, porc_retroceso_liquidacion_sl, "
+            "porc_liquidacion_parcial_sl FROM estrategias WHERE id_estrategia = ? AND activa",
+            (id_estrategia,)
+        ).fetchone()
+        if not row or any(v is None for v in row):
+            raise ValueError(f"❌ ERROR CRÍTICO: No se encontró estrategia activa con ID {id_estrategia}")
+        return convertir_parametros(row)
+
+    def cargar_parametros_estrategias(self):
+        cur = self.conn.execute(
+            f"SELECT id_estrategia, {', '.join(COLUMNAS_PARAMETROS)} FROM estrategias "
+            "WHERE activa ORDER BY id_estrategia"
+        )
+        return {row[0]: convertir_parametros(row[1:]) for row in cur.fetchall() if None not in row[1:]}
+
+    # --- Inversionistas ---
+
+    def obtener_todos_inversionistas_activos(self):
+        cur = self.conn.execute(
+            f"SELECT {', '.join(COLUMNAS_INVERSIONISTA.values())} FROM inversionistas "
+            "WHERE activo ORDER BY id_inversionista"
+        )
+        registros = []
+        for row in cur.fetchall():
+            registro = dict(zip(COLUMNAS_INVERSIONISTA, row))
+            registro['usar_parametros_senal'] = bool(registro['usar_parametros_senal'])
+            registros.append(registro)
+        return registros
+
+    def actualizar_capital_inversionista(self, id_inversionista, capital_actual):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE inversionistas SET capital_actual = ? WHERE id_inversionista = ?",
+                (capital_actual, id_inversionista)
+            )
+
+    # --- Operaciones ---
+
+    def _tomar_ids(self, cantidad):
+        """Avanza la secuencia dentro de la transacción abierta por el llamador."""
+        self.conn.execute(
+            "INSERT OR IGNORE INTO secuencias (nombre, valor) "
+            "SELECT 'operaciones_simuladas', COALESCE(max(id_operacion), 0) FROM operaciones_simuladas"
+        )
+        self.conn.execute("UPDATE secuencias SET valor = valor + ? WHERE nombre = 'operaciones_simuladas'", (cantidad,))
+        ultimo = self.conn.execute("SELECT valor FROM secuencias WHERE nombre = 'operaciones_simuladas'").fetchone()[0]
+        return list(range(ultimo - cantidad + 1, ultimo + 1))
+
+    def reservar_ids_operacion(self, cantidad):
+        with self.conn:
+            return self._tomar_ids(cantidad)
+
+    def _insertar_operaciones(self, filas):
+        self.conn.executemany(
+            f"INSERT INTO operaciones_simuladas ({', '.join(COLUMNAS_OPERACION)}) "
+            f"VALUES ({', '.join('?' * len(COLUMNAS_OPERACION))})",
+            (_fila_sql(f) for f in filas)
+        )
+
+    def _actualizar(self, cambios):
+        grupos = {}
+        for id_operacion, valores in cambios.items():
+            columnas = tuple(sorted(valores))
+            grupos.setdefault(columnas, []).append(tuple(_texto(valores[c]) for c in columnas) + (id_operacion,))
+        for columnas, filas in grupos.items():
+            asignaciones = ', '.join(f"{c} = ?" for c in columnas)
+            self.conn.executemany(f"UPDATE operaciones_simuladas SET {asignaciones} WHERE id_operacion = ?", filas)
+
+    def crear_operacion(self, **campos):
+        with self.conn:
+            id_operacion = self._tomar_ids(1)[0]
+            self._insertar_operaciones([(
+                id_operacion,
+                campos['id_inversionista_fk'], campos['id_estrategia_fk'], campos['id_senal'], campos['ticker'],
+                campos['tipo_operacion'], campos['precio_entrada'], campos['cantidad'], campos['apalancamiento'],
+                campos['stop_loss'], campos['take_profit'], campos['id_operacion_padre'],
+                campos['timestamp_apertura'], campos['capital_riesgo_usado'], campos['valor_total_exposicion'],
+                campos['porc_sl'], campos['porc_tp'], campos['precio_max_alcanzado'], campos['cnt_operaciones'],
+                campos.get('id_vela_1m_apertura')
+            )])
+        return id_operacion
+
+    def actualizar_operacion_dca(self, id_operacion, precio_entrada, cantidad, capital_riesgo_usado,
+                                 valor_total_exposicion, cnt_operaciones):
+        with self.conn:
+            self._actualizar({id_operacion: {
+                'precio_entrada': precio_entrada,
+                'cantidad': cantidad,
+                'capital_riesgo_usado': capital_riesgo_usado,
+                'valor_total_exposicion': valor_total_exposicion,
+                'cnt_operaciones': cnt_operaciones
+            }})
+
+    def actualizar_operacion_cierre(self, id_operacion, timestamp_cierre, precio_cierre, resultado,
+                                    motivo_cierre, duracion_operacion, id_vela_1m_cierre):
+        with self.conn:
+            self._actualizar({id_operacion: {
+                'timestamp_cierre': timestamp_cierre,
+                'precio_cierre': precio_cierre,
+                'resultado': resultado,
+                'motivo_cierre': motivo_cierre,
+                'duracion_operacion': duracion_operacion,
+                'id_vela_1m_cierre': id_vela_1m_cierre,
+                'estado': 'cerrada_total'
+            }})
+
+    def actualizar_precios_max_min_lote(self, filas):
+        if not filas:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE operaciones_simuladas SET precio_max_alcanzado = ?, precio_min_alcanzado = ? WHERE id_operacion = ?",
+                [(precio_max, precio_min, id_operacion) for id_operacion, precio_max, precio_min in filas]
+            )
+
+    def persistir_operaciones(self, nuevas, cambios):
+        with self.conn:
+            if nuevas:
+                self._insertar_operaciones(nuevas)
+            if cambios:
+                self._actualizar(cambios)
+
+    # --- Logs ---
+
+    def insertar_eventos(self, filas):
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO log_operaciones_simuladas ({', '.join(COLUMNAS_LOG)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNAS_LOG))})",
+                (_fila_sql(f) for f in filas)
+            )
+
+    # --- Puntos de control ---
+
+    def marca_persistencia(self, id_inversionista):
+        return self.conn.execute(
+            "SELECT (SELECT COALESCE(max(id_operacion), 0) FROM operaciones_simuladas WHERE id_inversionista_fk = ?), "
+            "(SELECT COALESCE(max(id_log), 0) FROM log_operaciones_simuladas WHERE id_inversionista_fk = ?)",
+            (id_inversionista, id_inversionista)
+        ).fetchone()
+
+    def descartar_posteriores(self, id_inversionista, marca):
+        id_operacion_max, id_log_max = marca
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM log_operaciones_simuladas WHERE id_inversionista_fk = ? AND id_log > ?",
+                (id_inversionista, id_log_max)
+            )
+            self.conn.execute(
+                "DELETE FROM operaciones_simuladas WHERE id_inversionista_fk = ? AND id_operacion > ?",
+                (id_inversionista, id_operacion_max)
+            )
+
+    # --- Simulación incremental ---
+
+    def cargar_estado_final(self, id_inversionista, fecha):
+        cur = self.conn.execute(
+            f"SELECT {', '.join('o.' + c for c in COLUMNAS_OPERACION_ABIERTA)} FROM operaciones_simuladas o "
+            "WHERE o.id_inversionista_fk = ? AND o.timestamp_cierre IS NULL AND NOT EXISTS "
+            "(SELECT 1 FROM operaciones_simuladas h WHERE h.id_operacion_padre = o.id_operacion) "
+            "ORDER BY o.timestamp_apertura, o.id_senal_fk, o.id_operacion",
+            (id_inversionista,)
+        )
+        abiertas = []
+        for row in cur.fetchall():
+            registro = dict(zip(COLUMNAS_OPERACION_ABIERTA, row))
+            registro['timestamp_apertura'] = _fecha(registro['timestamp_apertura'])
+            abiertas.append(registro)
+        inicio, fin = (_texto(t) for t in limites_dia(fecha))
+        operaciones_dia, ultima_apertura, ultimo_cierre = self.conn.execute(
+            "SELECT (SELECT count(*) FROM operaciones_simuladas WHERE id_inversionista_fk = ? "
+            "AND id_operacion_padre IS NULL AND timestamp_apertura >= ? AND timestamp_apertura < ?) "
+            "+ (SELECT count(*) FROM log_operaciones_simuladas WHERE id_inversionista_fk = ? "
+            "AND tipo_evento = 'dca' AND timestamp_evento >= ? AND timestamp_evento < ?), "
+            "(SELECT max(timestamp_apertura) FROM operaciones_simuladas WHERE id_inversionista_fk = ?), "
+            "(SELECT max(timestamp_cierre) FROM operaciones_simuladas WHERE id_inversionista_fk = ?)",
+            (id_inversionista, inicio, fin, id_inversionista, inicio, fin, id_inversionista, id_inversionista)
+        ).fetchone()
+        capital = self.conn.execute(
+            "SELECT capital_actual FROM inversionistas WHERE id_inversionista = ?", (id_inversionista,)
+        ).fetchone()
+        momentos = [_fecha(t) for t in (ultima_apertura, ultimo_cierre) if t is not None]
+        return {
+            'capital_actual': capital[0] if capital else None,
+            'operaciones_abiertas': abiertas,
+            'operaciones_dia': operaciones_dia,
+            'ultima_actividad': max(momentos, default=None),
+        }
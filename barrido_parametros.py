@@ -0,0 +1,248 @@
+# modulos/barrido_parametros.py
+import argparse
+import csv
+import itertools
+import logging
+from datetime import datetime
+import numpy as np
+from dao.almacen_precios import PriceStore
+from dao.backend_datos import obtener_backend
+from modulos.escaner_salidas import (
+    escanear_salidas_parametros, SIN_EVENTO, EVENTO_TP, EVENTO_RETRO_ENTRADA,
+    EVENTO_RETRO_EXTREMO, EVENTO_PARCIAL, EVENTO_SL
+)
+
+"""
+Barrido vectorizado de parámetros de cierre de estrategia.
+
+Evalúa muchas combinaciones de porc_limite_retro_entrada, porc_limite_retro,
+porc_retroceso_liquidacion_sl y porc_liquidacion_parcial_sl en una sola
+pasada: señales y velas se cargan una vez y, por cada señal, las condiciones
+de salida se calculan para todas las combinaciones a la vez
+(escanear_salidas_parametros). No escribe en la base de datos.
+
+Simplificaciones frente a Simulador:
+- cada señal abre una posición independiente de tamaño 1 (sin capital,
+  límites ni DCA);
+- tras un cierre parcial la posición restante sigue desde el minuto
+  siguiente con extremos reiniciados al precio de entrada (como la hija);
+  si en el mismo minuto se toca el SL, se cierra todo por SL;
+- el resultado es el retorno sobre el nocional de entrada.
+"""
+
+# Valores en las mismas unidades que la tabla estrategias (porcentajes)
+GRILLA_DEFECTO = {
+    'porc_limite_retro_entrada': (0.5, 1.0, 1.5, 2.0, 3.0),
+    'porc_limite_retro': (20.0, 30.0, 40.0, 50.0, 60.0),
+    'porc_retroceso_liquidacion_sl': (0.5, 1.0, 1.5, 2.0),
+    'porc_liquidacion_parcial_sl': (25.0, 50.0, 75.0),
+}
+
+MOTIVOS = {
+    EVENTO_TP: 'tp',
+    EVENTO_RETRO_ENTRADA: 'retro_entrada',
+    EVENTO_RETRO_EXTREMO: 'retro_extremo',
+    EVENTO_SL: 'sl',
+}
+
+VENTANA_INICIAL_MINUTOS = 64  # Primer bloque al buscar la salida; se duplica mientras no haya evento
+
+
+class GrillaParametros:
+    """
+    Producto cartesiano de valores, guardado como vectores de largo P ya
+    convertidos como en obtener_parametros_estrategia (fracciones).
+    """
+
+    def __init__(self, valores=GRILLA_DEFECTO):
+        combinaciones = list(itertools.product(
+            valores['porc_limite_retro_entrada'],
+            valores['porc_limite_retro'],
+            valores['porc_retroceso_liquidacion_sl'],
+            valores['porc_liquidacion_parcial_sl'],
+        ))
+        tabla = np.array(combinaciones, dtype=np.float64).reshape(-1, 4)
+        self.combinaciones = combinaciones
+        self.retro_entrada = tabla[:, 0] / 100
+        self.retro = tabla[:, 1] / 100
+        self.retro_parcial = tabla[:, 2] / 100
+        self.liquidacion = tabla[:, 3]  # porcentaje, como porc_liquidacion_parcial_sl
+
+    def __len__(self):
+        return len(self.combinaciones)
+
+
+class AcumuladorResultados:
+    """
+    Totales por combinación, actualizados señal a señal.
+    """
+
+    def __init__(self, p):
+        self.operaciones = np.zeros(p, dtype=np.int64)
+        self.cerradas = np.zeros(p, dtype=np.int64)
+        self.ganadoras = np.zeros(p, dtype=np.int64)
+        self.resultado = np.zeros(p)
+        self.resultado_abiertas = np.zeros(p)
+        self.duracion = np.zeros(p)
+        self.parciales = np.zeros(p, dtype=np.int64)
+        self.por_motivo = {nombre: np.zeros(p, dtype=np.int64) for nombre in MOTIVOS.values()}
+
+
+def _simular_senal(serie, minuto, tipo, precio_entrada, take_profit, stop_loss, grilla, acumulado, ventana):
+    p = len(grilla)
+    n = len(serie.close)
+    signo = 1.0 if tipo == "LONG" else -1.0
+    desde = np.full(p, minuto, dtype=np.int64)
+    extremo = np.full(p, precio_entrada)
+    restante = np.ones(p)
+    resultado = np.zeros(p)
+    activo = np.ones(p, dtype=bool)
+    ventanas = np.full(p, ventana, dtype=np.int64)  # Bloque siguiente de cada combinación
+
+    while activo.any():
+        indices = np.flatnonzero(activo)
+        for inicio in np.unique(desde[indices]):
+            grupo = indices[desde[indices] == inicio]
+            if inicio >= n:
+                activo[grupo] = False
+                continue
+            fin = min(n, inicio + int(ventanas[grupo].max()))
+            m, motivo, ext, sl_mismo = escanear_salidas_parametros(
+                serie, inicio, fin, tipo, precio_entrada, take_profit, stop_loss,
+                extremo[grupo], grilla.retro_entrada[grupo], grilla.retro[grupo], grilla.retro_parcial[grupo]
+            )
+            sin_evento = motivo == SIN_EVENTO
+            g = grupo[sin_evento]
+            extremo[g] = ext[sin_evento]
+            desde[g] = fin
+            ventanas[g] *= 2
+
+            con_evento = ~sin_evento
+            final = con_evento & ((motivo != EVENTO_PARCIAL) | sl_mismo)
+            parcial = con_evento & ~final
+
+            gp = grupo[parcial]
+            if len(gp):
+                precio = serie.close[m[parcial]]
+                liquidado = restante[gp] * grilla.liquidacion[gp] / 100
+                resultado[gp] += liquidado * signo * (precio - precio_entrada) / precio_entrada
+                restante[gp] -= liquidado
+                acumulado.parciales[gp] += 1
+                desde[gp] = m[parcial] + 1
+                extremo[gp] = precio_entrada
+                ventanas[gp] = ventana  # La posición restante vuelve a empezar con un bloque chico
+
+            gf = grupo[final]
+            if len(gf):
+                precio = serie.close[m[final]]
+                resultado[gf] += restante[gf] * signo * (precio - precio_entrada) / precio_entrada
+                restante[gf] = 0.0
+                activo[gf] = False
+                acumulado.cerradas[gf] += 1
+                acumulado.duracion[gf] += m[final] - minuto
+                motivos_finales = np.where(sl_mismo[final], EVENTO_SL, motivo[final])
+                for codigo, nombre in MOTIVOS.items():
+                    acumulado.por_motivo[nombre][gf[motivos_finales == codigo]] += 1
+
+    # Posiciones que siguen abiertas al final: resultado no realizado al último close
+    abiertas = restante > 0
+    if abiertas.any() and serie.cobertura[n - 1]:
+        ultimo = serie.close[n - 1]
+        acumulado.resultado_abiertas[abiertas] += restante[abiertas] * signo * (ultimo - precio_entrada) / precio_entrada
+
+    acumulado.operaciones += 1
+    acumulado.resultado += resultado
+    acumulado.ganadoras += (resultado > 0) & ~abiertas
+
+
+def ejecutar_barrido(fecha_inicio, fecha_fin, valores=GRILLA_DEFECTO, id_estrategia=None,
+                     slippage_pct=0.0, ventana=VENTANA_INICIAL_MINUTOS, price_store=None, backend=None):
+    """
+    Evalúa todas las combinaciones de `valores` sobre las señales del rango.
+    Retorna una lista de dicts, uno por combinación. ventana: minutos del
+    primer bloque de búsqueda de cada salida (se duplica mientras no haya
+    evento, como en resolver_confirmaciones); no cambia los resultados.
+    """
+    grilla = GrillaParametros(valores)
+    backend = backend or obtener_backend()
+    tabla = backend.cargar_senales_rango(fecha_inicio, fecha_fin)
+    if price_store is None:
+        price_store = PriceStore.para_rango(fecha_inicio, fecha_fin, backend=backend)
+    acumulado = AcumuladorResultados(len(grilla))
+    logging.info(f"🧪 Barrido: {len(grilla)} combinaciones sobre {len(tabla)} señales")
+
+    for i in range(len(tabla)):
+        if id_estrategia is not None and tabla.id_estrategia_fk[i] != id_estrategia:
+            continue
+        serie = price_store.serie(tabla.ticker_fk[i])
+        minuto = price_store.offset(tabla.timestamp_senal[i])
+        if serie is None or minuto is None or not serie.cobertura[minuto]:
+            continue
+        tipo = tabla.tipo_senal[i]
+        factor = 1 + slippage_pct / 100 if tipo == "LONG" else 1 - slippage_pct / 100
+        precio_entrada = float(serie.close[minuto]) * factor
+        take_profit = tabla.numericos['target_profit_price'][i]
+        stop_loss = tabla.numericos['stop_loss_price'][i]
+        # Igual que Operacion: TP/SL ausentes quedan en 0.0
+        take_profit = 0.0 if take_profit != take_profit else float(take_profit)
+        stop_loss = 0.0 if stop_loss != stop_loss else float(stop_loss)
+        _simular_senal(serie, minuto, tipo, precio_entrada, take_profit, stop_loss, grilla, acumulado, ventana)
+
+    resultados = []
+    for j, combinacion in enumerate(grilla.combinaciones):
+        cerradas = int(acumulado.cerradas[j])
+        fila = {
+            'porc_limite_retro_entrada': combinacion[0],
+            'porc_limite_retro': combinacion[1],
+            'porc_retroceso_liquidacion_sl': combinacion[2],
+            'porc_liquidacion_parcial_sl': combinacion[3],
+            'operaciones': int(acumulado.operaciones[j]),
+            'cerradas': cerradas,
+            'ganadoras': int(acumulado.ganadoras[j]),
+            'tasa_acierto': float(acumulado.ganadoras[j] / cerradas) if cerradas else 0.0,
+            'resultado_total': float(acumulado.resultado[j]),
+            'resultado_no_realizado': float(acumulado.resultado_abiertas[j]),
+            'duracion_media_min': float(acumulado.duracion[j] / cerradas) if cerradas else 0.0,
+            'cierres_parciales': int(acumulado.parciales[j]),
+        }
+        for nombre, conteo in acumulado.por_motivo.items():
+            fila[f'cierres_{nombre}'] = int(conteo[j])
+        resultados.append(fila)
+    resultados.sort(key=lambda r: r['resultado_total'], reverse=True)
+    return resultados
+
+
+def guardar_csv(resultados, ruta):
+    if not resultados:
+        return
+    with open(ruta, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(resultados[0]))
+        writer.writeheader()
+        writer.writerows(resultados)
+    logging.info(f"📄 Resultados del barrido guardados en {ruta}")
+
+
+def _lista_floats(texto):
+    return tuple(float(v) for v in texto.split(','))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(levelname)s | %(message)s')
+    parser = argparse.ArgumentParser(description="Barrido de parámetros de cierre")
+    parser.add_argument('--desde', required=True, type=datetime.fromisoformat)
+    parser.add_argument('--hasta', required=True, type=datetime.fromisoformat)
+    parser.add_argument('--estrategia', type=int, default=None)
+    parser.add_argument('--slippage', type=float, default=0.0)
+    parser.add_argument('--retro-entrada', type=_lista_floats, default=GRILLA_DEFECTO['porc_limite_retro_entrada'])
+    parser.add_argument('--retro', type=_lista_floats, default=GRILLA_DEFECTO['porc_limite_retro'])
+    parser.add_argument('--retro-parcial', type=_lista_floats, default=GRILLA_DEFECTO['porc_retroceso_liquidacion_sl'])
+    parser.add_argument('--liquidacion', type=_lista_floats, default=GRILLA_DEFECTO['porc_liquidacion_parcial_sl'])
+    parser.add_argument('--salida', default='barrido_parametros.csv')
+    args = parser.parse_args()
+    valores = {
+        'porc_limite_retro_entrada': args.retro_entrada,
+        'porc_limite_retro': args.retro,
+        'porc_retroceso_liquidacion_sl': args.retro_parcial,
+        'porc_liquidacion_parcial_sl': args.liquidacion,
+    }
+    guardar_csv(ejecutar_barrido(args.desde, args.hasta, valores, args.estrategia, args.slippage), args.salida)
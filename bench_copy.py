@@ -0,0 +1,136 @@
+# benchmarks/bench_copy.py
+"""
+Compara la escritura de log_operaciones_simuladas con execute_batch
+(ruta anterior), execute_values y COPY (dao/copia_bulk).
+
+Escribe en una tabla TEMP clonada de log_operaciones_simuladas, así que no
+toca datos reales. Uso:
+
+    python -m benchmarks.bench_copy                 # 10k, 100k y 1M filas
+    python -m benchmarks.bench_copy 10000 50000
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from psycopg2.extras import execute_batch, execute_values
+from db_connection import conectar_db
+from dao.copia_bulk import copiar_filas
+from dao.logs import COLUMNAS_LOG
+
+TAMANOS_DEFECTO = (10_000, 100_000, 1_000_000)
+TABLA_TEMP = "bench_log_operaciones"
+
+
+def generar_eventos(n, semilla=42):
+    """
+    Eventos sintéticos con la forma de registrar_evento (tuplas en orden de
+    COLUMNAS_LOG), con NULLs, textos con comillas y comas.
+    """
+    rnd = random.Random(semilla)
+    base = datetime(2025, 1, 1)
+    tipos = ("apertura", "dca", "rechazo", "cierre_total", "cierre_parcial")
+    eventos = []
+    for i in range(n):
+        tipo = tipos[i % len(tipos)]
+        precio = rnd.uniform(0.1, 70000)
+        rechazo = tipo == "rechazo"
+        eventos.append((
+            base + timedelta(minutes=i),
+            1 + i % 4,
+            100000 + i,
+            None if rechazo else 5000 + i,
+            f"TK{i % 50}USDT",
+            tipo,
+            f'Evento "{tipo}" #{i}, precio={precio:.4f}',
+            None if rechazo else rnd.uniform(1000, 5000),
+            None if rechazo else rnd.uniform(1000, 5000),
+            precio,
+            precio * 0.97,
+            precio * 1.03,
+            None if rechazo else rnd.uniform(0.001, 10),
+            "Sin capital suficiente" if rechazo else None,
+            None if tipo != "cierre_total" else rnd.uniform(-50, 50),
+            "Take Profit" if tipo == "cierre_total" else None,
+            None if tipo != "cierre_total" else precio,
+            1 + i % 7,
+            None if tipo != "cierre_total" else rnd.uniform(1, 600),
+            3.0,
+            3.0,
+            None,
+            None if tipo != "cierre_total" else 900000 + i,
+            None,
+            None,
+            1 + i % 3,
+            800000 + i,
+        ))
+    return eventos
+
+
+def _crear_tabla_temp(conn):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLA_TEMP}")
+        cur.execute(f"CREATE TEMP TABLE {TABLA_TEMP} (LIKE log_operaciones_simuladas INCLUDING DEFAULTS)")
+
+
+def _ruta_execute_batch(conn, eventos):
+    columnas = ', '.join(COLUMNAS_LOG)
+    valores = ', '.join(f"%({c})s" for c in COLUMNAS_LOG)
+    query = f"INSERT INTO {TABLA_TEMP} ({columnas}) VALUES ({valores})"
+    dicts = [dict(zip(COLUMNAS_LOG, e)) for e in eventos]
+    with conn.cursor() as cur:
+        execute_batch(cur, query, dicts)
+
+
+def _ruta_execute_values(conn, eventos):
+    query = f"INSERT INTO {TABLA_TEMP} ({', '.join(COLUMNAS_LOG)}) VALUES %s"
+    with conn.cursor() as cur:
+        execute_values(cur, query, eventos, page_size=1000)
+
+
+def _ruta_copy(conn, eventos):
+    copiar_filas(TABLA_TEMP, COLUMNAS_LOG, eventos, conn=conn)
+
+
+RUTAS = (
+    ("execute_batch", _ruta_execute_batch),
+    ("execute_values", _ruta_execute_values),
+    ("copy_csv", _ruta_copy),
+)
+
+
+def medir(tamanos=TAMANOS_DEFECTO):
+    resultados = []
+    with conectar_db() as conn:
+        for n in tamanos:
+            eventos = generar_eventos(n)
+            for nombre, ruta in RUTAS:
+                _crear_tabla_temp(conn)
+                inicio = time.perf_counter()
+                ruta(conn, eventos)
+                conn.commit()
+                duracion = time.perf_counter() - inicio
+                with conn.cursor() as cur:
+                    cur.execute(f"SELECT count(*) FROM {TABLA_TEMP}")
+                    escritas = cur.fetchone()[0]
+                resultados.append({
+                    'ruta': nombre,
+                    'filas': n,
+                    'segundos': duracion,
+                    'filas_seg': n / duracion if duracion else float('inf'),
+                    'ok': escritas == n
+                })
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {TABLA_TEMP}")
+    return resultados
+
+
+def imprimir(resultados):
+    print(f"{'ruta':<16}{'filas':>10}{'segundos':>12}{'filas/s':>14}  ok")
+    for r in resultados:
+        print(f"{r['ruta']:<16}{r['filas']:>10}{r['segundos']:>12.3f}{r['filas_seg']:>14.0f}  {r['ok']}")
+
+
+if __name__ == "__main__":
+    tamanos = tuple(int(a) for a in sys.argv[1:]) or TAMANOS_DEFECTO
+    imprimir(medir(tamanos))
@@ -0,0 +1,154 @@
+# benchmarks/bench_lecturas.py
+"""
+Compara el armado de resultados de las lecturas masivas con NUMERIC como
+Decimal y conversión por valor (ruta anterior) contra NUMERIC como float
+(db_connection.registrar_numeric_float) y dao/filas_bd.
+
+Sin argumentos no usa PostgreSQL: genera las filas como las entregaría
+psycopg2 (el texto de cada NUMERIC pasa por Decimal o por el typecaster de
+float) y mide el parseo más el armado de dicts de señales, TablaSenales y
+las series del PriceStore. Con --bd mide además cargar_senales_rango y la
+precarga de velas reales del rango, primero con Decimal y luego con float.
+
+    python -m benchmarks.bench_lecturas                 # 10k, 100k y 1M filas
+    python -m benchmarks.bench_lecturas 50000
+    python -m benchmarks.bench_lecturas --bd 2025-01-01 2025-01-08
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from db_connection import _numeric_a_float, registrar_numeric_float
+from dao.almacen_precios import PriceStore
+from dao.filas_bd import como_dicts
+from dao.senales import COLUMNAS_SENAL, TablaSenales, cargar_senales_rango
+
+TAMANOS_DEFECTO = (10_000, 100_000, 1_000_000)
+TICKERS_SINTETICOS = 50
+
+
+def generar_textos(n, semilla=42):
+    """
+    Filas de señales y de velas con los NUMERIC aún como texto, igual que
+    llegan del servidor antes del typecaster.
+    """
+    rnd = random.Random(semilla)
+    base = datetime(2025, 1, 1)
+    minutos = n // TICKERS_SINTETICOS + 1
+    senales = []
+    velas = []
+    for i in range(n):
+        ts = base + timedelta(minutes=i % minutos)
+        precio = rnd.uniform(0.1, 70000)
+        senales.append((
+            100000 + i, 1 + i % 7, f"TK{i % TICKERS_SINTETICOS}USDT", ts,
+            "LONG" if i % 2 else "SHORT",
+            f"{precio:.8f}", f"{precio * 1.03:.8f}", f"{precio * 0.97:.8f}",
+            None if i % 5 == 0 else f"{rnd.uniform(1, 20):.2f}",
+        ))
+        velas.append((
+            f"TK{i // minutos}USDT", ts, i,
+            f"{precio * 1.001:.8f}", f"{precio * 0.999:.8f}", f"{precio:.8f}",
+        ))
+    velas.sort(key=lambda fila: (fila[0], fila[1]))
+    return senales, velas, base, base + timedelta(minutes=minutos - 1)
+
+
+def _castear(filas, desde, conversor):
+    return [fila[:desde] + tuple(conversor(v) if v is not None else None for v in fila[desde:]) for fila in filas]
+
+
+def _dicts_decimal(filas, columnas):
+    registros = []
+    for row in filas:
+        registro = {}
+        for col, val in zip(columnas, row):
+            if isinstance(val, Decimal):
+                registro[col] = float(val)
+            else:
+                registro[col] = val
+        registros.append(registro)
+    return registros
+
+
+def _cargar_velas(store, filas):
+    inicio = 0
+    for fin in range(1, len(filas) + 1):
+        if fin == len(filas) or filas[fin][0] != filas[inicio][0]:
+            store._volcar_bloque(filas[inicio][0], filas[inicio:fin])
+            inicio = fin
+
+
+def medir(tamanos=TAMANOS_DEFECTO):
+    resultados = []
+    for n in tamanos:
+        senales, velas, desde, hasta = generar_textos(n)
+        for nombre, conversor, dicts in (
+            ("decimal", Decimal, _dicts_decimal),
+            ("float", lambda v: _numeric_a_float(v, None), como_dicts),
+        ):
+            inicio = time.perf_counter()
+            filas_senales = _castear(senales, 5, conversor)
+            filas_velas = _castear(velas, 3, conversor)
+            parseo = time.perf_counter()
+            dicts(filas_senales, COLUMNAS_SENAL)
+            senales_dict = time.perf_counter()
+            TablaSenales(desde, hasta, filas_senales)
+            tabla = time.perf_counter()
+            _cargar_velas(PriceStore(desde, hasta), filas_velas)
+            fin = time.perf_counter()
+            resultados.append({
+                'ruta': nombre,
+                'filas': n,
+                'parseo': parseo - inicio,
+                'dicts_senales': senales_dict - parseo,
+                'tabla_senales': tabla - senales_dict,
+                'velas': fin - tabla,
+            })
+    return resultados
+
+
+def medir_bd(fecha_inicio, fecha_fin):
+    """
+    Lecturas reales del rango con NUMERIC como Decimal y como float.
+    """
+    import psycopg2.extensions
+    resultados = []
+    for nombre in ("decimal", "float"):
+        if nombre == "decimal":
+            psycopg2.extensions.register_type(psycopg2.extensions.DECIMAL)
+            psycopg2.extensions.register_type(psycopg2.extensions.DECIMALARRAY)
+        else:
+            registrar_numeric_float()
+        inicio = time.perf_counter()
+        tabla = cargar_senales_rango(fecha_inicio, fecha_fin)
+        senales = time.perf_counter()
+        store = PriceStore(fecha_inicio, fecha_fin)
+        store.cargar(sorted(set(tabla.ticker_fk)))
+        fin = time.perf_counter()
+        resultados.append({
+            'ruta': nombre,
+            'filas': len(tabla),
+            'tabla_senales': senales - inicio,
+            'velas': fin - senales,
+        })
+    return resultados
+
+
+def imprimir(resultados):
+    fases = [f for f in ('parseo', 'dicts_senales', 'tabla_senales', 'velas') if f in resultados[0]]
+    print(f"{'ruta':<10}{'filas':>10}" + ''.join(f"{f:>15}" for f in fases))
+    for r in resultados:
+        print(f"{r['ruta']:<10}{r['filas']:>10}" + ''.join(f"{r[f]:>15.3f}" for f in fases))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de lecturas masivas (Decimal vs float)")
+    parser.add_argument('tamanos', nargs='*', type=int, help="Filas sintéticas por corrida")
+    parser.add_argument('--bd', nargs=2, metavar=('DESDE', 'HASTA'), type=datetime.fromisoformat,
+                        help="Medir también las lecturas reales de PostgreSQL en este rango")
+    args = parser.parse_args()
+    imprimir(medir(tuple(args.tamanos) or TAMANOS_DEFECTO))
+    if args.bd:
+        imprimir(medir_bd(*args.bd))
@@ -0,0 +1,223 @@
+# benchmarks/bench_simulador.py
+"""
+Benchmark de Simulador.ejecutar con datos sintéticos (generador_sintetico)
+y el backend de datos en memoria (dao/backend_memoria.py), sin PostgreSQL.
+
+Cada escenario corre en un proceso propio (para medir su pico de RSS) y
+reporta minutos simulados por segundo, consultas por corrida y pico de RSS.
+El reporte JSON se compara contra un baseline guardado; una métrica peor que
+el baseline en más de --umbral cuenta como regresión y el proceso termina
+con código 1. Uso:
+
+    python -m benchmarks.bench_simulador                      # todos los escenarios
+    python -m benchmarks.bench_simulador dca_intensivo --escala 0.5
+    python -m benchmarks.bench_simulador --guardar-baseline   # fija el baseline actual
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from benchmarks.generador_sintetico import Escala, generar
+from dao.backend_datos import configurar_backend
+from dao.backend_memoria import BackendMemoria
+from clases import Inversionista
+from simulador import Simulador, MINUTOS_CHECKPOINT_OPERACIONES
+from modulos.configuracion_log import silenciar_log
+from modulos.logging_utils import configurar_buffer_eventos
+
+try:
+    import resource
+except ImportError:  # Windows: sin pico de RSS
+    resource = None
+
+RUTA_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_simulador.json')
+UMBRAL_REGRESION = 0.10
+
+ESCENARIOS = {
+    # Muchos minutos y pocas señales: costo fijo del bucle por minuto
+    'bucle_minuto': {
+        'escala': dict(tickers=5, dias=14, senales_por_dia=4),
+    },
+    # Muchas posiciones abiertas a la vez: monitoreo de salidas
+    'monitoreo_salidas': {
+        'escala': dict(tickers=40, dias=5, senales_por_dia=200, dist_tp_pct=8.0, dist_sl_pct=8.0),
+    },
+    # Pocas claves ticker-tipo y muchas señales: casi todo es DCA
+    'dca_intensivo': {
+        'escala': dict(tickers=3, dias=5, senales_por_dia=150, prob_long=1.0),
+    },
+    # Checkpoints y vaciados de log frecuentes: rutas de escritura
+    'escritura_bd': {
+        'escala': dict(tickers=20, dias=3, senales_por_dia=300, inversionistas=2),
+        'minutos_checkpoint': 30,
+        'buffer_eventos': dict(max_eventos=100),
+    },
+}
+
+# Métrica -> True si un valor mayor es mejor
+METRICAS = {
+    'minutos_seg': True,
+    'consultas': False,
+    'pico_rss_mb': False,
+}
+
+
+def _pico_rss_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB, macOS bytes
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+def ejecutar_escenario(nombre, factor_escala=1.0, semilla=42):
+    """
+    Corre un escenario en el proceso actual y retorna sus métricas.
+    """
+    logging.getLogger().setLevel(logging.ERROR)  # Los logs por operación distorsionan la medición
+    silenciar_log()  # ✅ Ni siquiera se crean los registros bajo WARNING
+    definicion = ESCENARIOS[nombre]
+    escala = Escala(semilla=semilla, **definicion['escala']).escalada(factor_escala)
+    datos = generar(escala)
+    store = datos.price_store()
+    backend = datos.cargar_en(BackendMemoria())
+    configurar_backend(backend)  # Cualquier acceso sin backend explícito tampoco toca PostgreSQL
+    configurar_buffer_eventos(**definicion.get('buffer_eventos', {}))
+
+    fases = {}  # fase -> segundos, sumados entre inversionistas
+    inicio = time.perf_counter()
+    for config in backend.obtener_todos_inversionistas_activos():
+        inv = Inversionista(id_inv=config['id_inversionista'], capital=config['capital_aportado'], config=config)
+        sim = Simulador(
+            inversionista=inv, fecha_inicio=datos.fecha_inicio, fecha_fin=datos.fecha_fin,
+            price_store=store,
+            minutos_checkpoint=definicion.get('minutos_checkpoint', MINUTOS_CHECKPOINT_OPERACIONES),
+            backend=backend
+        )
+        sim.ejecutar()
+        for fase, (segundos_fase, _) in sim.perfil.fases.items():
+            fases[fase] = fases.get(fase, 0.0) + segundos_fase
+    segundos = time.perf_counter() - inicio
+
+    minutos = store.n_minutos * len(datos.inversionistas)
+    return {
+        'escenario': nombre,
+        'datos': datos.resumen(),
+        'segundos': segundos,
+        'minutos': minutos,
+        'minutos_seg': minutos / segundos if segundos else float('inf'),
+        'consultas': backend.total_consultas(),
+        'consultas_detalle': dict(backend.consultas),
+        'operaciones': len(backend.operaciones),
+        'eventos': len(backend.log),
+        'fases_seg': fases,
+        'pico_rss_mb': _pico_rss_mb()
+    }
+
+
+def ejecutar(nombres, factor_escala=1.0, semilla=42, mismo_proceso=False):
+    resultados = {}
+    for nombre in nombres:
+        if mismo_proceso:
+            resultados[nombre] = ejecutar_escenario(nombre, factor_escala, semilla)
+            continue
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+            resultados[nombre] = pool.submit(ejecutar_escenario, nombre, factor_escala, semilla).result()
+    return resultados
+
+
+def comparar(resultados, baseline, umbral=UMBRAL_REGRESION):
+    """
+    Lista de regresiones frente al baseline: métricas que empeoraron más que
+    `umbral` (fracción).
+    """
+    regresiones = []
+    for nombre, actual in resultados.items():
+        base = baseline.get('escenarios', {}).get(nombre)
+        if base is None:
+            continue
+        for metrica, mayor_es_mejor in METRICAS.items():
+            valor, referencia = actual.get(metrica), base.get(metrica)
+            if valor is None or not referencia:
+                continue
+            variacion = (valor - referencia) / referencia
+            if (-variacion if mayor_es_mejor else variacion) > umbral:
+                regresiones.append({
+                    'escenario': nombre,
+                    'metrica': metrica,
+                    'actual': valor,
+                    'baseline': referencia,
+                    'variacion': variacion
+                })
+    return regresiones
+
+
+def construir_reporte(resultados, factor_escala, semilla):
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'escala': factor_escala,
+        'semilla': semilla,
+        'escenarios': resultados
+    }
+
+
+def imprimir(reporte, regresiones):
+    print(f"{'escenario':<20}{'minutos/s':>12}{'consultas':>11}{'rss MB':>9}{'ops':>8}{'eventos':>9}")
+    for r in reporte['escenarios'].values():
+        rss = f"{r['pico_rss_mb']:.0f}" if r['pico_rss_mb'] is not None else "-"
+        print(f"{r['escenario']:<20}{r['minutos_seg']:>12.0f}{r['consultas']:>11}{rss:>9}{r['operaciones']:>8}{r['eventos']:>9}")
+    for g in regresiones:
+        print(f"REGRESIÓN {g['escenario']} {g['metrica']}: {g['actual']:.2f} vs {g['baseline']:.2f} ({g['variacion']:+.1%})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del simulador con datos sintéticos")
+    parser.add_argument('escenarios', nargs='*', help=f"Por defecto todos: {', '.join(ESCENARIOS)}")
+    parser.add_argument('--escala', type=float, default=1.0, help="Multiplica días y señales por día")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--baseline', default=RUTA_BASELINE)
+    parser.add_argument('--umbral', type=float, default=UMBRAL_REGRESION, help="Fracción tolerada (0.10 = 10%%)")
+    parser.add_argument('--salida', default='bench_simulador.json', help="Reporte JSON de esta corrida")
+    parser.add_argument('--guardar-baseline', action='store_true', help="Guardar esta corrida como baseline")
+    parser.add_argument('--mismo-proceso', action='store_true', help="No aislar escenarios (sin RSS por escenario)")
+    args = parser.parse_args(argv)
+
+    desconocidos = set(args.escenarios) - set(ESCENARIOS)
+    if desconocidos:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+    nombres = args.escenarios or list(ESCENARIOS)
+    resultados = ejecutar(nombres, args.escala, args.semilla, args.mismo_proceso)
+    reporte = construir_reporte(resultados, args.escala, args.semilla)
+
+    regresiones = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('escala') != args.escala or baseline.get('semilla') != args.semilla:
+            print(f"Aviso: el baseline usa escala={baseline.get('escala')} semilla={baseline.get('semilla')}")
+        regresiones = comparar(resultados, baseline, args.umbral)
+    elif not args.guardar_baseline:
+        print(f"Aviso: no hay baseline en {args.baseline}; use --guardar-baseline para crearlo")
+    reporte['umbral'] = args.umbral
+    reporte['regresiones'] = regresiones
+
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(reporte, f, indent=2)
+    if args.guardar_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, indent=2)
+    imprimir(reporte, regresiones)
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
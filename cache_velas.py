@@ -0,0 +1,273 @@
+# dao/cache_velas.py
+from db_connection import conectar_db
+from dao.almacen_precios import TIPOS_FILA_VELA, SerieVelas
+from dao.filas_bd import como_columnas
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+
+"""
+Caché local en disco de velas de 1 minuto, reutilizable entre corridas.
+
+Un archivo .npy por (ticker, mes) con un arreglo estructurado (id, high, low,
+close) de una posición por minuto del mes; id = -1 marca minuto sin vela.
+El manifest.json guarda por "TICKER|YYYY-MM" la huella de datos (max(id) y
+cantidad de filas en ohlcv_raw_1m); si la huella cambió el archivo se
+reconstruye. Los archivos se abren con np.load(mmap_mode='r'): de cada mes
+solo se leen las páginas del tramo que cae en el rango del PriceStore.
+
+Con varios procesos (workers de main.py) el proceso principal deja la caché
+al día antes de lanzarlos (BackendDatos.preparar_velas), así los workers
+solo leen. Si aun así dos procesos reconstruyen a la vez, cada uno escribe
+en un temporal propio (con su pid) y el manifest se actualiza bajo un
+archivo de bloqueo, releyendo el del disco y agregando solo las entradas
+propias.
+
+SIM_CACHE_VELAS define el directorio; vacío desactiva la caché.
+"""
+
+DIRECTORIO_CACHE_VELAS = os.environ.get('SIM_CACHE_VELAS', 'cache_velas')
+DTYPE_VELA = np.dtype([('id', '<i8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8')])
+ESPERA_BLOQUEO_MANIFEST = 60  # segundos; un bloqueo más viejo se considera abandonado
+_RE_NOMBRE_SEGURO = re.compile(r'[^A-Za-z0-9_-]')
+
+
+def _inicio_mes(fecha):
+    return datetime(fecha.year, fecha.month, 1)
+
+
+def _mes_siguiente(mes):
+    return datetime(mes.year + 1, 1, 1) if mes.month == 12 else datetime(mes.year, mes.month + 1, 1)
+
+
+def _minutos_entre(desde, hasta):
+    delta = hasta - desde
+    return delta.days * 1440 + delta.seconds // 60
+
+
+def _minuto_alineado(delta):
+    """Minutos de `delta`, o -1 si no es un número exacto de minutos."""
+    if delta.microseconds or delta.seconds % 60:
+        return -1
+    return delta.days * 1440 + delta.seconds // 60
+
+
+def meses_del_rango(fecha_inicio, fecha_fin):
+    meses = []
+    mes = _inicio_mes(fecha_inicio)
+    while mes <= fecha_fin:
+        meses.append(mes)
+        mes = _mes_siguiente(mes)
+    return meses
+
+
+class CacheVelas:
+    """
+    Directorio de archivos .npy por ticker y mes, más su manifest.
+    """
+
+    def __init__(self, directorio=DIRECTORIO_CACHE_VELAS, verificar_huella=True):
+        self.directorio = directorio
+        self.verificar_huella = verificar_huella  # False = confiar en el manifest sin consultar la BD
+        self.ruta_manifest = os.path.join(directorio, 'manifest.json')
+        os.makedirs(directorio, exist_ok=True)
+        self.manifest = self._leer_manifest()
+        self._actualizadas = {}  # Entradas reconstruidas por este proceso, aún sin guardar
+
+    def _leer_manifest(self):
+        if not os.path.exists(self.ruta_manifest):
+            return {}
+        try:
+            with open(self.ruta_manifest, encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.warning(f"⚠️  Manifest de caché de velas ilegible, se reconstruye: {e}")
+            return {}
+
+    @contextmanager
+    def _bloqueo_manifest(self):
+        """
+        Exclusión entre procesos para leer-combinar-escribir el manifest.
+        """
+        ruta = self.ruta_manifest + '.lock'
+        while True:
+            try:
+                os.close(os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    abandonado = time.time() - os.path.getmtime(ruta) > ESPERA_BLOQUEO_MANIFEST
+                except FileNotFoundError:
+                    continue  # Se liberó entre medio
+                if abandonado:  # Proceso caído con el bloqueo tomado
+                    logging.warning(f"⚠️  Bloqueo de manifest abandonado, se toma: {ruta}")
+                    try:
+                        os.remove(ruta)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            os.remove(ruta)
+
+    def _guardar_manifest(self):
+        """
+        Agrega las entradas reconstruidas por este proceso al manifest del
+        disco (que otro proceso pudo haber cambiado) y lo reemplaza.
+        """
+        with self._bloqueo_manifest():
+            self.manifest = self._leer_manifest()
+            self.manifest.update(self._actualizadas)
+            tmp = self._temporal(self.ruta_manifest)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.ruta_manifest)
+        self._actualizadas = {}
+
+    @staticmethod
+    def _temporal(ruta):
+        return f"{ruta}.{os.getpid()}.tmp"
+
+    @staticmethod
+    def _clave(ticker, mes):
+        return f"{ticker}|{mes:%Y-%m}"
+
+    def _ruta(self, ticker, mes):
+        nombre = _RE_NOMBRE_SEGURO.sub('_', ticker)
+        if nombre != ticker:
+            # Sin separadores ni '..' en la ruta; el hash evita choques entre tickers saneados igual
+            nombre = f"{nombre}_{hashlib.sha1(ticker.encode('utf-8')).hexdigest()[:8]}"
+        return os.path.join(self.directorio, f"{nombre}_{mes:%Y-%m}.npy")
+
+    def _huellas(self, tickers, fecha_desde, fecha_hasta):
+        """
+        {(ticker, 'YYYY-MM'): (max_id, filas)} de ohlcv_raw_1m en una sola consulta.
+        """
+        query = """
+            SELECT ticker, to_char(date_trunc('month', "timestamp"), 'YYYY-MM'), max(id), count(*)
+            FROM ohlcv_raw_1m
+            WHERE ticker = ANY(%s) AND "timestamp" >= %s AND "timestamp" < %s
+            GROUP BY 1, 2;
+        """
+        try:
+            with conectar_db() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(query, (list(tickers), fecha_desde, fecha_hasta))
+                    return {(row[0], row[1]): (int(row[2]), int(row[3])) for row in cur.fetchall()}
+        except Exception as e:
+            logging.error(f"❌ Error al obtener huellas de velas: {e}")
+            raise
+
+    def _construir(self, ticker, mes, huella):
+        """
+        Descarga un mes de velas de un ticker y lo guarda como .npy.
+        """
+        fin_mes = _mes_siguiente(mes)
+        datos = np.zeros(_minutos_entre(mes, fin_mes), dtype=DTYPE_VELA)
+        datos['id'] = -1
+        for campo in ('high', 'low', 'close'):
+            datos[campo] = np.nan
+        query = """
+            SELECT "timestamp", id, high, low, close
+            FROM ohlcv_raw_1m
+            WHERE ticker = %s AND "timestamp" >= %s AND "timestamp" < %s;
+        """
+        try:
+            with conectar_db() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(query, (ticker, mes, fin_mes))
+                    filas = cur.fetchall()
+        except Exception as e:
+            logging.error(f"❌ Error al descargar velas de {ticker} {mes:%Y-%m}: {e}")
+            raise
+        timestamps, ids, highs, lows, closes = como_columnas(filas, TIPOS_FILA_VELA[1:])
+        minutos = np.array([_minuto_alineado(ts - mes) for ts in timestamps], dtype=np.int64)
+        usadas = minutos >= 0
+        if usadas.any():
+            idx = minutos[usadas]
+            datos['id'][idx] = ids[usadas]
+            datos['high'][idx] = highs[usadas]
+            datos['low'][idx] = lows[usadas]
+            datos['close'][idx] = closes[usadas]
+
+        ruta = self._ruta(ticker, mes)
+        tmp = self._temporal(ruta) + '.npy'  # np.save agrega .npy si falta
+        np.save(tmp, datos)
+        os.replace(tmp, ruta)
+        entrada = {
+            'archivo': os.path.basename(ruta),
+            'max_id': huella[0],
+            'filas': huella[1]
+        }
+        self.manifest[self._clave(ticker, mes)] = entrada
+        self._actualizadas[self._clave(ticker, mes)] = entrada
+        logging.info(f"🗄️  Caché de velas reconstruida: {ticker} {mes:%Y-%m} ({len(filas)} filas)")
+
+    def preparar(self, tickers, fecha_inicio, fecha_fin):
+        """
+        Deja al día los archivos de los tickers y meses del rango.
+        Retorna {(ticker, mes): ruta} de los que tienen datos.
+        """
+        meses = meses_del_rango(fecha_inicio, fecha_fin)
+        if not meses or not tickers:
+            return {}
+        disponibles = {}
+        if self.verificar_huella:
+            huellas = self._huellas(tickers, meses[0], _mes_siguiente(meses[-1]))
+            reconstruidos = 0
+            for (ticker, etiqueta), huella in huellas.items():
+                mes = datetime.strptime(etiqueta, '%Y-%m')
+                entrada = self.manifest.get(self._clave(ticker, mes))
+                ruta = self._ruta(ticker, mes)
+                vigente = entrada is not None and os.path.exists(ruta) and \
+                    (entrada['max_id'], entrada['filas']) == huella
+                if not vigente:
+                    self._construir(ticker, mes, huella)
+                    reconstruidos += 1
+                disponibles[(ticker, mes)] = ruta
+            if reconstruidos:
+                self._guardar_manifest()
+            logging.info(f"🗄️  Caché de velas: {len(disponibles)} archivos vigentes, {reconstruidos} reconstruidos")
+        else:
+            for ticker in tickers:
+                for mes in meses:
+                    ruta = self._ruta(ticker, mes)
+                    if self._clave(ticker, mes) in self.manifest and os.path.exists(ruta):
+                        disponibles[(ticker, mes)] = ruta
+        return disponibles
+
+    def cargar_en(self, store, tickers):
+        """
+        Llena un PriceStore desde los archivos mapeados en memoria. Cada mapa
+        se libera apenas se copia su tramo.
+        """
+        tickers = sorted(set(tickers) - set(store.series))
+        disponibles = self.preparar(tickers, store.fecha_inicio, store.fecha_fin)
+        total = 0
+        for ticker in tickers:
+            store.series[ticker] = SerieVelas(store.n_minutos)
+        for (ticker, mes), ruta in disponibles.items():
+            datos = np.load(ruta, mmap_mode='r')
+            desplazamiento = _minutos_entre(store.fecha_inicio, mes)
+            desde = max(0, desplazamiento)
+            hasta = min(store.n_minutos, desplazamiento + len(datos))
+            if hasta > desde:
+                tramo = datos[desde - desplazamiento:hasta - desplazamiento]
+                serie = store.series[ticker]
+                serie.ids[desde:hasta] = tramo['id']
+                serie.high[desde:hasta] = tramo['high']
+                serie.low[desde:hasta] = tramo['low']
+                serie.close[desde:hasta] = tramo['close']
+                serie.cobertura[desde:hasta] = tramo['id'] >= 0
+                total += int(np.count_nonzero(serie.cobertura[desde:hasta]))
+                del tramo  # Vista sobre el mapa
+            del datos  # ✅ Cierra el mapa: el archivo queda libre para reconstruirlo (os.replace)
+        logging.info(f"✅ {total} velas 1m cargadas desde caché local ({len(tickers)} tickers)")
@@ -1,9 +1,12 @@
 # clases.py
+import time
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import List, Optional
 import logging
-from decimal import Decimal
-from dao.operaciones import crear_operacion_en_bd, actualizar_operacion_cierre, actualizar_operacion_dca, actualizar_precio_max_min
+from dao.backend_datos import obtener_backend
+from modulos.libro_posiciones import CAMPOS_LIBRO, CampoLibro, LibroPosiciones
+
+logger = logging.getLogger(__name__)
 
 
 def calcular_precio_promedio(precio1, cant1, precio2, cant2):
@@ -17,14 +20,29 @@ def calcular_precio_promedio(precio1, cant1, precio2, cant2):
 
 def aplicar_slippage(precio, slippage_pct, tipo):
     """
-    Aplica slippage al precio de entrada.
-    Maneja Decimal y float correctamente.
+    Aplica slippage al precio de entrada (en float: los precios ya no llegan
+    como Decimal).
+    """
+    factor = 1 + slippage_pct / 100 if tipo == 'LONG' else 1 - slippage_pct / 100
+    return float(precio) * factor
+
+
+def persistir_extremos_pendientes(operaciones):
+    """
+    Persiste los precios extremos de las operaciones marcadas como pendientes:
+    vía su repositorio si lo tienen, o en un solo UPDATE por backend.
     """
-    precio = Decimal(str(precio)) if not isinstance(precio, Decimal) else precio
-    slippage_pct = Decimal(str(slippage_pct))
-    factor = (Decimal('1') + slippage_pct / Decimal('100')) if tipo == 'LONG' \
-             else (Decimal('1') - slippage_pct / Decimal('100'))
-    return float(precio * factor)
+    directas = {}  # backend -> [(id_operacion, precio_max, precio_min), ...]
+    for op in operaciones:
+        if not op.extremos_pendientes:
+            continue
+        if op.repositorio is not None:
+            op.repositorio.registrar_extremos(op)
+        else:
+            directas.setdefault(op.backend, []).append((op.id_operacion, op.precio_max_alcanzado, op.precio_min_alcanzado))
+        op.extremos_pendientes = False
+    for backend, filas in directas.items():
+        backend.actualizar_precios_max_min_lote(filas)
 
 
 class Inversionista:
@@ -52,10 +70,15 @@ class Inversionista:
         # Estado
         self.operaciones_hoy = 0
         self.fecha_actual_operaciones = None  # ✅ Nueva: fecha del conteo de operaciones
-        self.operaciones_activas: Dict[str, 'Operacion'] = {}  # clave: f"{ticker}-{tipo}"
-        self.log_eventos: List[Dict] = []  # Eventos en memoria antes de guardar
+        self.operaciones_activas = LibroPosiciones()  # clave: (ticker, tipo); arreglos por slot
+        self.log_eventos: List[tuple] = []  # Eventos en memoria antes de guardar (orden de COLUMNAS_LOG)
+        self.ultimo_vaciado_log = time.monotonic()
+        self.vaciado_log_fallido = False
+        self.resumen_eventos = None  # ✅ ResumenEventos: conteo por tipo para el log por hora (None = no contar)
+        self.repositorio_operaciones = None  # ✅ Si existe, se persiste antes de vaciar el log (FK)
+        self.backend = None  # ✅ Backend de datos del log (lo asigna Simulador; None = global)
 
-        logging.info(f"👤 Inversionista {self.id} cargado | Capital: {self.capital_actual:.2f}")
+        logger.info("👤 Inversionista %s cargado | Capital: %.2f", self.id, self.capital_actual)
 
     def verificar_y_reiniciar_contadores(self, fecha_actual):
         """
@@ -65,25 +88,59 @@ class Inversionista:
         if self.fecha_actual_operaciones != fecha_operaciones:
             self.operaciones_hoy = 0
             self.fecha_actual_operaciones = fecha_operaciones
-            logging.info(f"🔄 Contadores diarios reiniciados para inversionista {self.id}")
+            logger.info("🔄 Contadores diarios reiniciados para inversionista %s", self.id)
 
 
 class Operacion:
     """
     Representa una operación de trading (LONG/SHORT), con soporte para DCA y cierres parciales.
+    Los campos numéricos (CAMPOS_LIBRO) viven en el LibroPosiciones del
+    inversionista mientras la operación está abierta en él.
     """
+    __slots__ = (
+        '_libro', '_slot', '_valores', 'clave',
+        'id_operacion', 'id_inversionista', 'repositorio', 'backend', 'id_senal', 'ticker',
+        'tipo_operacion', 'timestamp_apertura', 'timestamp_cierre', 'precio_cierre', 'resultado',
+        'motivo_cierre', 'estado', 'id_operacion_padre', 'id_estrategia_fk', 'id_vela_1m_apertura',
+        'extremos_pendientes', 'porc_sl', 'porc_tp', 'duracion_operacion', 'pyg_no_realizado',
+        'cnt_operaciones', 'es_operacion_hija'
+    )
+
+    precio_entrada = CampoLibro('precio_entrada')
+    cantidad = CampoLibro('cantidad')
+    apalancamiento = CampoLibro('apalancamiento')
+    stop_loss = CampoLibro('stop_loss')
+    take_profit = CampoLibro('take_profit')
+    precio_max_alcanzado = CampoLibro('precio_max_alcanzado')
+    precio_min_alcanzado = CampoLibro('precio_min_alcanzado')
+    capital_riesgo_usado = CampoLibro('capital_riesgo_usado')
+    valor_total_exposicion = CampoLibro('valor_total_exposicion')
+
+    # Atributos que no van en un punto de control (se reasignan al restaurar)
+    _NO_SERIALIZABLES = ('_libro', '_slot', '_valores', 'repositorio', 'backend')
 
     def __init__(
         self, id_senal, ticker, tipo, precio, cant, apal, sl, tp,
         padre=None, id_inversionista=None, id_estrategia_fk=None,
         timestamp_apertura=None,
         inversionista_obj=None,  # ✅ Nuevo: objeto completo del inversionista
-        id_vela_1m_apertura=None  # ✅ Nuevo: ID de vela de apertura
+        id_vela_1m_apertura=None,  # ✅ Nuevo: ID de vela de apertura
+        repositorio=None,  # ✅ RepositorioOperaciones: persistencia diferida (None = escribir en BD al momento)
+        backend=None  # ✅ BackendDatos para las escrituras directas (None = el del repositorio o el global)
     ):
+        self._libro = None  # LibroPosiciones que guarda los campos numéricos (None = copia propia)
+        self._slot = None
+        self._valores = [0.0] * len(CAMPOS_LIBRO)
         self.id_operacion: Optional[int] = None
+        self.id_inversionista = id_inversionista
+        self.repositorio = repositorio
+        if backend is None:
+            backend = repositorio.backend if repositorio is not None else obtener_backend()
+        self.backend = backend
         self.id_senal = id_senal
         self.ticker = ticker
         self.tipo_operacion = tipo  # "LONG" o "SHORT"
+        self.clave = (ticker, tipo)  # Clave en operaciones_activas
         self.precio_entrada = float(precio)
         self.cantidad = float(cant)
         self.apalancamiento = apal
@@ -103,9 +160,10 @@ class Operacion:
         # ✅ Guardar ID de vela de apertura
         self.id_vela_1m_apertura = id_vela_1m_apertura
 
-        # Seguimiento de precios extremos
+        # Seguimiento de precios extremos (se persisten en cierres y checkpoints)
         self.precio_max_alcanzado = self.precio_entrada
         self.precio_min_alcanzado = self.precio_entrada
+        self.extremos_pendientes = False
 
         # Cálculos nuevos: agregar valores reales
         self.capital_riesgo_usado = self.cantidad * self.precio_entrada
@@ -120,29 +178,32 @@ class Operacion:
 
         # ✅ Insertar en BD con todos los campos calculados
         try:
-            self.id_operacion = crear_operacion_en_bd(
-                id_senal=self.id_senal,
-                ticker=self.ticker,
-                tipo_operacion=self.tipo_operacion,
-                precio_entrada=self.precio_entrada,
-                cantidad=self.cantidad,
-                apalancamiento=self.apalancamiento,
-                stop_loss=self.stop_loss,
-                take_profit=self.take_profit,
-                id_operacion_padre=self.id_operacion_padre,
-                id_inversionista_fk=id_inversionista,
-                id_estrategia_fk=id_estrategia_fk,
-                timestamp_apertura=self.timestamp_apertura,
-                capital_riesgo_usado=self.capital_riesgo_usado,
-                valor_total_exposicion=self.valor_total_exposicion,
-                porc_sl=self.porc_sl,
-                porc_tp=self.porc_tp,
-                precio_max_alcanzado=self.precio_max_alcanzado,
-                cnt_operaciones=self.cnt_operaciones,
-                id_vela_1m_apertura=self.id_vela_1m_apertura  # ✅ Pasar ID de vela de apertura
-            )
+            if self.repositorio is not None:
+                self.id_operacion = self.repositorio.registrar_apertura(self, id_inversionista)
+            else:
+                self.id_operacion = self.backend.crear_operacion(
+                    id_senal=self.id_senal,
+                    ticker=self.ticker,
+                    tipo_operacion=self.tipo_operacion,
+                    precio_entrada=self.precio_entrada,
+                    cantidad=self.cantidad,
+                    apalancamiento=self.apalancamiento,
+                    stop_loss=self.stop_loss,
+                    take_profit=self.take_profit,
+                    id_operacion_padre=self.id_operacion_padre,
+                    id_inversionista_fk=id_inversionista,
+                    id_estrategia_fk=id_estrategia_fk,
+                    timestamp_apertura=self.timestamp_apertura,
+                    capital_riesgo_usado=self.capital_riesgo_usado,
+                    valor_total_exposicion=self.valor_total_exposicion,
+                    porc_sl=self.porc_sl,
+                    porc_tp=self.porc_tp,
+                    precio_max_alcanzado=self.precio_max_alcanzado,
+                    cnt_operaciones=self.cnt_operaciones,
+                    id_vela_1m_apertura=self.id_vela_1m_apertura  # ✅ Pasar ID de vela de apertura
+                )
         except Exception as e:
-            logging.error(f"❌ Fallo al crear operación en BD: {e}")
+            logger.error("❌ Fallo al crear operación en BD: %s", e)
             raise
 
         # ✅ Registrar evento solo si se pasa el objeto completo del inversionista
@@ -170,33 +231,107 @@ class Operacion:
                 id_vela_1m_apertura=self.id_vela_1m_apertura  # ✅ Pasar ID de vela de apertura
             )
 
-        logging.info(f"🆕 Operación creada: {self.ticker} | {self.tipo_operacion} | "
-                     f"Cantidad={self.cantidad:.6f} | Precio={self.precio_entrada} | "
-                     f"SL={self.stop_loss} | TP={self.take_profit} | Vela ID={self.id_vela_1m_apertura}")
+        logger.debug("🆕 Operación creada: %s | %s | Cantidad=%.6f | Precio=%s | SL=%s | TP=%s | Vela ID=%s",
+                     self.ticker, self.tipo_operacion, self.cantidad, self.precio_entrada,
+                     self.stop_loss, self.take_profit, self.id_vela_1m_apertura)
+
+    def estado_punto_control(self):
+        """
+        Atributos de la operación, sin backend ni repositorio, para un punto de control.
+        """
+        estado = {
+            nombre: getattr(self, nombre) for nombre in Operacion.__slots__
+            if nombre not in Operacion._NO_SERIALIZABLES and hasattr(self, nombre)
+        }
+        estado.update((campo, getattr(self, campo)) for campo in CAMPOS_LIBRO)
+        return estado
+
+    @classmethod
+    def desde_punto_control(cls, estado, repositorio=None, backend=None):
+        """
+        Reconstruye una operación de estado_punto_control sin escribir en la BD
+        ni registrar eventos.
+        """
+        op = cls.__new__(cls)
+        op._libro = None
+        op._slot = None
+        op._valores = [0.0] * len(CAMPOS_LIBRO)
+        op.repositorio = repositorio
+        if backend is None:
+            backend = repositorio.backend if repositorio is not None else obtener_backend()
+        op.backend = backend
+        for nombre, valor in estado.items():
+            setattr(op, nombre, valor)
+        return op
+
+    @classmethod
+    def desde_bd(cls, fila, repositorio=None, backend=None):
+        """
+        Reconstruye una operación abierta a partir de su fila en
+        operaciones_simuladas (dict de COLUMNAS_OPERACION_ABIERTA), sin
+        escribir en la BD ni registrar eventos.
+        """
+        precio_entrada = float(fila['precio_entrada'])
+        precio_min = fila.get('precio_min_alcanzado')
+        precio_max = fila.get('precio_max_alcanzado')
+        return cls.desde_punto_control({
+            'id_operacion': fila['id_operacion'],
+            'id_inversionista': fila['id_inversionista_fk'],
+            'id_senal': fila['id_senal_fk'],
+            'ticker': fila['ticker_fk'],
+            'tipo_operacion': fila['tipo_operacion'],
+            'clave': (fila['ticker_fk'], fila['tipo_operacion']),
+            'precio_entrada': precio_entrada,
+            'cantidad': float(fila['cantidad']),
+            'apalancamiento': fila['apalancamiento'],
+            'stop_loss': float(fila['stop_loss_price'] or 0.0),
+            'take_profit': float(fila['take_profit_price'] or 0.0),
+            'timestamp_apertura': fila['timestamp_apertura'],
+            'timestamp_cierre': None,
+            'precio_cierre': None,
+            'resultado': 0.0,
+            'motivo_cierre': None,
+            'estado': "abierta",
+            'id_operacion_padre': fila['id_operacion_padre'],
+            'id_estrategia_fk': fila['id_estrategia_fk'],
+            'id_vela_1m_apertura': fila['id_vela_1m_apertura'],
+            # Sin extremos guardados aún, el precio de entrada (como en __init__)
+            'precio_max_alcanzado': float(precio_max) if precio_max is not None else precio_entrada,
+            'precio_min_alcanzado': float(precio_min) if precio_min is not None else precio_entrada,
+            'extremos_pendientes': False,
+            'capital_riesgo_usado': float(fila['capital_riesgo_usado']),
+            'valor_total_exposicion': float(fila['valor_total_exposicion']),
+            'porc_sl': fila['porc_sl'],
+            'porc_tp': fila['porc_tp'],
+            'duracion_operacion': 0.0,
+            'pyg_no_realizado': fila.get('pyg_no_realizado') or 0.0,
+            'cnt_operaciones': fila['cnt_operaciones'],
+        }, repositorio, backend)
 
     def actualizar_precio(self, precio, timestamp):
         """
         Actualiza el seguimiento de precios extremos.
-        Usa el precio de cierre de la vela.
+        Usa el precio de cierre de la vela. Solo marca la operación como
+        pendiente; la BD se actualiza en persistir_extremos_pendientes.
         """
         precio = float(precio)
         if self.tipo_operacion == "LONG":
             if precio > self.precio_max_alcanzado:
                 self.precio_max_alcanzado = precio
-                actualizar_precio_max_min(self.id_operacion, self.precio_max_alcanzado, self.precio_min_alcanzado)
-                logging.debug(f"📈 {self.ticker} | Nuevo máximo alcanzado: {precio}")
+                self.extremos_pendientes = True
+                logger.debug("📈 %s | Nuevo máximo alcanzado: %s", self.ticker, precio)
         elif self.tipo_operacion == "SHORT":
             if precio < self.precio_min_alcanzado:
                 self.precio_min_alcanzado = precio
-                actualizar_precio_max_min(self.id_operacion, self.precio_max_alcanzado, self.precio_min_alcanzado)
-                logging.debug(f"📉 {self.ticker} | Nuevo mínimo alcanzado: {precio}")
+                self.extremos_pendientes = True
+                logger.debug("📉 %s | Nuevo mínimo alcanzado: %s", self.ticker, precio)
 
     def aplicar_dca(self, inversionista, precio, cantidad):
         """
         Acumula cantidad y recalcula precio promedio.
         NO registra eventos de logging - eso se hace en el nivel superior.
         """
-        logging.info(f"🔁 DCA en {self.ticker}: {cantidad:.6f} @ {precio}")
+        logger.debug("🔁 DCA en %s: %.6f @ %s", self.ticker, cantidad, precio)
         nuevo_precio = calcular_precio_promedio(
             self.precio_entrada, self.cantidad,
             precio, cantidad
@@ -210,17 +345,20 @@ class Operacion:
         self.cnt_operaciones += 1  # Incrementar contador
 
         # Actualizar en BD
-        actualizar_operacion_dca(
-            self.id_operacion,
-            self.precio_entrada,
-            self.cantidad,
-            self.capital_riesgo_usado,
-            self.valor_total_exposicion,
-            self.cnt_operaciones
-        )
+        if self.repositorio is not None:
+            self.repositorio.registrar_dca(self)
+        else:
+            self.backend.actualizar_operacion_dca(
+                self.id_operacion,
+                self.precio_entrada,
+                self.cantidad,
+                self.capital_riesgo_usado,
+                self.valor_total_exposicion,
+                self.cnt_operaciones
+            )
 
         # ✅ NO registrar evento aquí - se hace en simulador.py con datos correctos
-        logging.info(f"🔁 DCA aplicado: {self.ticker} | {self.tipo_operacion} | +{cantidad:.6f}")
+        logger.debug("🔁 DCA aplicado: %s | %s | +%.6f", self.ticker, self.tipo_operacion, cantidad)
 
     def calcular_resultado(self, precio_salida):
         """
@@ -235,7 +373,7 @@ class Operacion:
         """
         Cierra parcialmente y devuelve nueva operación hija.
         """
-        logging.warning(f"⚠️  Cierre parcial por SL en {self.ticker}: {porc_liquidar}% del tamaño")
+        logger.debug("⚠️  Cierre parcial por SL en %s: %s%% del tamaño", self.ticker, porc_liquidar)
 
         cantidad_liquidar = self.cantidad * (porc_liquidar / 100)
         cantidad_restante = self.cantidad - cantidad_liquidar
@@ -249,6 +387,7 @@ class Operacion:
         self.resultado = resultado_parcial
         self.motivo_cierre = "Liquidación parcial por SL"
         self.estado = "cerrada_parcial"
+        persistir_extremos_pendientes([self])
 
         from modulos.logging_utils import registrar_evento
         registrar_evento(
@@ -292,9 +431,11 @@ class Operacion:
             id_estrategia_fk=self.id_estrategia_fk,
             timestamp_apertura=self.timestamp_apertura,
             inversionista_obj=inversionista,  # ✅ Pasar objeto completo
-            id_vela_1m_apertura=self.id_vela_1m_apertura  # ✅ Pasar ID de vela de apertura original
+            id_vela_1m_apertura=self.id_vela_1m_apertura,  # ✅ Pasar ID de vela de apertura original
+            repositorio=self.repositorio,
+            backend=self.backend
         )
-        inversionista.operaciones_activas[f"{self.ticker}-{self.tipo_operacion}"] = operacion_hija
+        inversionista.operaciones_activas[self.clave] = operacion_hija
 
         registrar_evento(
             inversionista=inversionista,
@@ -312,8 +453,8 @@ class Operacion:
             id_vela_1m_apertura=operacion_hija.id_vela_1m_apertura  # ✅ Pasar ID de vela de apertura
         )
 
-        logging.info(f"👶 Operación hija creada: ID={operacion_hija.id_operacion} | "
-                     f"Cantidad={cantidad_restante:.6f} | Precio={operacion_hija.precio_entrada}")
+        logger.debug("👶 Operación hija creada: ID=%s | Cantidad=%.6f | Precio=%s",
+                     operacion_hija.id_operacion, cantidad_restante, operacion_hija.precio_entrada)
 
         return operacion_hija
 
@@ -362,15 +503,19 @@ class Operacion:
         )
 
         # Actualizar en BD todos los campos
-        actualizar_operacion_cierre(
-            self.id_operacion,
-            self.timestamp_cierre,
-            self.precio_cierre,
-            self.resultado,
-            self.motivo_cierre,
-            self.duracion_operacion,
-            id_vela_1m_cierre
-        )
+        persistir_extremos_pendientes([self])
+        if self.repositorio is not None:
+            self.repositorio.registrar_cierre(self, id_vela_1m_cierre)
+        else:
+            self.backend.actualizar_operacion_cierre(
+                self.id_operacion,
+                self.timestamp_cierre,
+                self.precio_cierre,
+                self.resultado,
+                self.motivo_cierre,
+                self.duracion_operacion,
+                id_vela_1m_cierre
+            )
 
-        logging.info(f"CloseOperation: {self.ticker} | {self.tipo_operacion} | "
-                     f"Resultado={self.resultado:+.2f} | Motivo={motivo}")
\ No newline at end of file
+        logger.debug("CloseOperation: %s | %s | Resultado=%+.2f | Motivo=%s",
+                     self.ticker, self.tipo_operacion, self.resultado, motivo)
\ No newline at end of file
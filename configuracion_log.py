@@ -0,0 +1,146 @@
+# modulos/configuracion_log.py
+import atexit
+import logging
+import logging.handlers
+import queue
+from multiprocessing import util
+
+"""
+Logging asíncrono del simulador.
+
+El logger raíz solo tiene un QueueHandler: el hilo que simula deja el
+registro en una cola y un QueueListener (hilo aparte) lo formatea y lo
+escribe en los handlers reales (archivo y consola). Los módulos del bucle
+por minuto (simulador, clases, modulos.confirmacion, ...) usan su propio
+logger con formato perezoso (%s), así un mensaje bajo el nivel de su módulo
+no se formatea. Como el formateo ocurre en el otro hilo, los argumentos
+deben ser valores, no objetos que sigan cambiando.
+
+- niveles: nivel por logger, p. ej. {'simulador': 'WARNING'} o el texto
+  "simulador=WARNING,modulos.confirmacion=DEBUG" (parsear_niveles).
+- silencioso: modo benchmark; solo pasan WARNING y superiores.
+
+Las aperturas, DCA, cierres y rechazos se escriben en DEBUG; en INFO queda
+el resumen por hora simulada de ResumenEventos.
+"""
+
+MAX_TIPOS_RESUMEN = 8  # Pares (tipo, motivo) por línea de resumen; el resto se suma como "otros"
+
+_listener = None
+
+
+class _ColaSinFormato(logging.handlers.QueueHandler):
+    """
+    QueueHandler que deja todo el formateo (msg % args) al QueueListener.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def parsear_nivel(nivel):
+    """
+    Nivel de logging a partir de su nombre ('INFO', 'debug') o número.
+    """
+    if isinstance(nivel, int):
+        return nivel
+    valor = logging.getLevelName(str(nivel).strip().upper())
+    if not isinstance(valor, int):
+        raise ValueError(f"Nivel de log desconocido: {nivel!r}")
+    return valor
+
+
+def parsear_niveles(texto):
+    """
+    "modulo=NIVEL,modulo=NIVEL" -> {modulo: nivel}.
+    """
+    niveles = {}
+    for parte in (p.strip() for p in (texto or '').split(',')):
+        if not parte:
+            continue
+        nombre, separador, nivel = parte.partition('=')
+        if not separador or not nombre.strip():
+            raise ValueError(f"Nivel de log inválido: {parte!r} (se espera modulo=NIVEL)")
+        niveles[nombre.strip()] = parsear_nivel(nivel)
+    return niveles
+
+
+def configurar_log(handlers, formato, nivel=logging.INFO, niveles=None, silencioso=False):
+    """
+    Instala la cola en el logger raíz y arranca el QueueListener que escribe
+    en `handlers` con `formato`. Reemplaza la configuración anterior.
+    """
+    global _listener
+    detener_log()
+    for handler in handlers:
+        handler.setFormatter(logging.Formatter(formato))
+    cola = queue.SimpleQueue()
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(_ColaSinFormato(cola))
+    raiz.setLevel(parsear_nivel(nivel))
+    for nombre, nivel_modulo in (niveles or {}).items():
+        logging.getLogger(nombre).setLevel(parsear_nivel(nivel_modulo))
+    silenciar_log(silencioso)
+    _listener = logging.handlers.QueueListener(cola, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def silenciar_log(silencioso=True):
+    """
+    Modo benchmark: descarta todo lo que esté por debajo de WARNING antes de
+    crear el registro. False lo desactiva.
+    """
+    logging.disable(logging.INFO if silencioso else logging.NOTSET)
+
+
+def detener_log():
+    """
+    Escribe lo que quede en la cola y detiene el QueueListener.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(detener_log)
+util.Finalize(None, detener_log, exitpriority=10)  # Los workers de multiprocessing no corren atexit
+
+
+class ResumenEventos:
+    """
+    Eventos de un inversionista contados por (tipo_evento, motivo) entre dos
+    llamadas a emitir(). registrar_evento cuenta y Simulador emite una línea
+    por hora simulada, en lugar de una línea por evento.
+    """
+
+    def __init__(self, id_inversionista, logger, desde=None):
+        self.id_inversionista = id_inversionista
+        self.logger = logger
+        self.desde = desde
+        self.conteos = {}
+
+    def contar(self, tipo_evento, motivo=None):
+        clave = (tipo_evento, motivo)
+        self.conteos[clave] = self.conteos.get(clave, 0) + 1
+
+    def emitir(self, hasta):
+        """
+        Escribe en INFO lo contado desde la emisión anterior y reinicia.
+        """
+        if self.conteos and self.logger.isEnabledFor(logging.INFO):
+            ordenados = sorted(self.conteos.items(), key=lambda par: -par[1])
+            partes = [
+                f"{n} {tipo}" + (f" ({motivo})" if motivo else "")
+                for (tipo, motivo), n in ordenados[:MAX_TIPOS_RESUMEN]
+            ]
+            otros = sum(n for _, n in ordenados[MAX_TIPOS_RESUMEN:])
+            if otros:
+                partes.append(f"{otros} otros")
+            self.logger.info("📊 Inversionista %s | %s → %s | %s",
+                             self.id_inversionista, self.desde, hasta, " | ".join(partes))
+        self.conteos = {}
+        self.desde = hasta
@@ -1,90 +1,253 @@
 # modulos/confirmacion.py
 from dao.precios import obtener_precio_min_max_close  # ✅ Import corregido
+from datetime import timedelta
+import heapq
 import logging
+import numpy as np
+
+"""
+Cola de confirmación de señales.
+
+Cada señal espera hasta cumplir sus reglas:
+- tiempo_max_espera (minutos): se rechaza si lleva más que esto en cola;
+- precio_supera (%): se confirma cuando el high de un minuto supera el
+  precio de entrada a la cola (close del primer minuto con vela) en ese
+  porcentaje;
+- volumen_min: sin implementar (no bloquea).
+Una señal sin regla de precio se confirma en su primer minuto en cola.
+
+La cola no se recorre entera cada minuto: los plazos van en un heap por
+instante límite, y las señales con regla de precio se agrupan por ticker en
+un heap por nivel, así cada minuto se lee una vela por ticker con señales
+pendientes y solo se tocan las que vencen o se confirman. Las entradas de
+los heaps se borran de forma perezosa (se ignoran si la señal ya salió).
+
+Con un PriceStore, las señales con regla de precio cuyo ticker está
+precargado no esperan minuto a minuto: al entrar a la cola
+resolver_confirmaciones calcula, sobre los arreglos de velas, el minuto en
+que se confirmarían o vencerían, y queda programado en otro heap.
+"""
+
+logger = logging.getLogger(__name__)
+
+VENTANA_INICIAL_CONFIRMACION = 64  # minutos; se duplica mientras queden señales sin resolver
+
+
+def resolver_confirmaciones(series, desde, porcentajes, esperas):
+    """
+    Resuelve por adelantado S señales con regla de precio que entran a la
+    cola en el minuto `desde`. series: SerieVelas del ticker de cada señal
+    (del mismo PriceStore); porcentajes: precio_supera (%); esperas:
+    tiempo_max_espera (min) o NaN si no tiene plazo.
+
+    Reproduce a procesar_cola: la referencia es el close del primer minuto
+    >= desde con vela, la señal se confirma en el primer minuto con high
+    mayor que el nivel y vence en el primer minuto m con m - desde > espera
+    (en el mismo minuto, el vencimiento va antes que la confirmación). Las
+    velas de todos los tickers se comparan juntas en una matriz (señales,
+    minutos) por ventanas crecientes, así una señal con plazo corto no lee
+    el resto del día.
+
+    Retorna (minuto, confirmada, referencia), de largo S: minuto = -1 si no
+    se resuelve dentro de la serie; referencia NaN si no hubo vela.
+    """
+    porcentajes = np.asarray(porcentajes, dtype=np.float64)
+    esperas = np.asarray(esperas, dtype=np.float64)
+    unicas = {}  # id(serie) -> fila de la matriz de velas
+    filas = np.array([unicas.setdefault(id(serie), len(unicas)) for serie in series], dtype=np.int64)
+    velas = list({id(serie): serie for serie in series}.values())
+    n = len(velas[0].high) if velas else 0
+    con_plazo = ~np.isnan(esperas)
+    vence = np.full(len(esperas), n, dtype=np.int64)
+    vence[con_plazo] = np.floor(desde + esperas[con_plazo]).astype(np.int64) + 1
+    minuto = np.full(len(porcentajes), -1, dtype=np.int64)
+    confirmada = np.zeros(len(porcentajes), dtype=bool)
+    referencia_fila = np.full(len(velas), np.nan)
+
+    pendientes = np.arange(len(porcentajes))
+    inicio = desde
+    ventana = VENTANA_INICIAL_CONFIRMACION
+    while len(pendientes) and inicio < n:
+        fin = min(n, inicio + ventana)
+        high = np.stack([serie.high[inicio:fin] for serie in velas])
+        # Igual que procesar_cola: sin vela o con high 0 no se evalúa
+        valida = np.stack([serie.cobertura[inicio:fin] for serie in velas]) & (high != 0)
+        for fila in np.flatnonzero(np.isnan(referencia_fila) & valida.any(axis=1)):
+            referencia_fila[fila] = velas[fila].close[inicio + int(np.argmax(valida[fila]))]
+        # Nivel NaN (ticker aún sin vela) no supera nada
+        niveles = referencia_fila[filas[pendientes]] * (1 + porcentajes[pendientes] / 100)
+        supera = np.where(valida, high, -np.inf)[filas[pendientes]] > niveles[:, None]
+        cruza = supera.any(axis=1)
+        cruce = inicio + np.argmax(supera, axis=1)
+        plazo = vence[pendientes]
+        confirma = cruza & (cruce < plazo)
+        resueltas = confirma | (plazo < fin)
+        minuto[pendientes[resueltas]] = np.where(confirma, cruce, plazo)[resueltas]
+        confirmada[pendientes[resueltas]] = confirma[resueltas]
+        pendientes = pendientes[~resueltas]
+        inicio = fin
+        ventana *= 2
+    return minuto, confirmada, referencia_fila[filas]
+
 
 class Confirmador:
-    def __init__(self):
-        self.cola = []  # [ { senal, reglas, ts_entrada }, ... ]
+    def __init__(self, obtener_precios=None, price_store=None):
+        self.cola = {}  # id_item -> { senal, reglas, ts_entrada, ... }, en orden de llegada
+        self._secuencia = 0
+        self._nuevos = []  # ids aún sin ts_entrada (se asigna al procesar)
+        self._vencimientos = []  # heap de (ts_limite, id_item)
+        self._por_ticker = {}  # ticker -> {'sin_referencia': [id_item], 'niveles': heap de (nivel, id_item), 'pendientes': n}
+        self._programadas = []  # heap de (ts_resolucion, id_item, confirmada), resueltas con resolver_confirmaciones
+        # ✅ (ticker, ts) -> (high, low, close); Simulador pasa el de su backend
+        self.obtener_precios = obtener_precios or obtener_precio_min_max_close
+        self.price_store = price_store  # ✅ Velas precargadas: reglas de precio resueltas al entrar (None = minuto a minuto)
 
     def agregar_a_cola(self, senal, reglas):
         """
         Agrega una señal a la cola de confirmación.
         """
-        self.cola.append({
+        esperas = [regla['valor'] for regla in reglas if regla['tipo'] == "tiempo_max_espera"]
+        porcentajes = [regla['valor'] for regla in reglas if regla['tipo'] == "precio_supera"]
+        id_item = self._secuencia
+        self._secuencia += 1
+        self.cola[id_item] = {
             'senal': senal,
             'reglas': reglas,
-            'ts_entrada': None  # Se asigna al procesar
-        })
-        logging.info(f"🕒 Señal ID={senal['id_senal']} agregada a cola de confirmación")
+            'ts_entrada': None,  # Se asigna al procesar
+            'espera_max': min(esperas) if esperas else None,
+            'porc_supera': max(porcentajes) if porcentajes else None,  # Todas las reglas de precio: el nivel más alto
+            'ts_entrada_precio': None,
+            'programada': False  # Resuelta por adelantado (en _programadas, no en _por_ticker)
+        }
+        self._nuevos.append(id_item)
+        logger.debug("🕒 Señal ID=%s agregada a cola de confirmación", senal['id_senal'])
+
+    def estado(self):
+        """Estructuras de la cola, para un punto de control."""
+        return {nombre: valor for nombre, valor in vars(self).items() if nombre not in ('obtener_precios', 'price_store')}
+
+    def restaurar(self, estado):
+        for nombre, valor in estado.items():
+            setattr(self, nombre, valor)
+
+    def _entrar(self, id_item, ts_actual):
+        item = self.cola[id_item]
+        item['ts_entrada'] = ts_actual
+        if item['espera_max'] is not None:
+            heapq.heappush(self._vencimientos, (ts_actual + timedelta(minutes=item['espera_max']), id_item))
+        if item['porc_supera'] is not None:
+            grupo = self._por_ticker.get(item['senal']['ticker_fk'])
+            if grupo is None:
+                grupo = self._por_ticker[item['senal']['ticker_fk']] = {'sin_referencia': [], 'niveles': [], 'pendientes': 0}
+            grupo['sin_referencia'].append(id_item)
+            grupo['pendientes'] += 1
+            return False
+        return True  # Sin regla de precio: confirmada al entrar
+
+    def _programar(self, ids, ts_actual, minuto):
+        """
+        Resuelve de una vez las señales `ids` (entran en `minuto`, con su
+        ticker en el PriceStore) y programa su confirmación o vencimiento.
+        """
+        items = [self.cola[id_item] for id_item in ids]
+        minutos, confirmadas, referencias = resolver_confirmaciones(
+            [self.price_store.serie(item['senal']['ticker_fk']) for item in items], minuto,
+            [item['porc_supera'] for item in items],
+            [item['espera_max'] if item['espera_max'] is not None else np.nan for item in items]
+        )
+        for id_item, item, resolucion, confirmada, referencia in zip(ids, items, minutos.tolist(), confirmadas.tolist(), referencias.tolist()):
+            item['programada'] = True
+            if referencia == referencia:  # No NaN
+                item['ts_entrada_precio'] = referencia
+            if resolucion >= 0:
+                heapq.heappush(self._programadas, (ts_actual + timedelta(minutes=resolucion - minuto), id_item, confirmada))
+
+    def _sacar(self, id_item):
+        item = self.cola.pop(id_item)
+        if item['porc_supera'] is not None and not item['programada']:
+            ticker = item['senal']['ticker_fk']
+            grupo = self._por_ticker[ticker]
+            grupo['pendientes'] -= 1
+            if not grupo['pendientes']:
+                del self._por_ticker[ticker]  # Descarta también sus entradas ya obsoletas
+        return item
 
     def procesar_cola(self, ts_actual, inversionista, registrar_evento):
         """
-        Procesa todas las señales en cola que cumplan sus condiciones de confirmación.
-        Devuelve lista de señales confirmadas.
+        Procesa las señales en cola que vencen o cumplen sus condiciones de
+        confirmación en `ts_actual`. Devuelve la lista de señales
+        confirmadas, en orden de llegada a la cola.
         """
-        senales_confirmadas = []
-        activas = []
+        confirmadas = []
+        store = self.price_store
+        minuto = store.offset(ts_actual) if store is not None and self._nuevos else None
+        por_adelantado = []  # ids que se resuelven sobre el PriceStore
+        for id_item in self._nuevos:
+            item = self.cola[id_item]
+            if minuto is not None and item['porc_supera'] is not None and store.serie(item['senal']['ticker_fk']) is not None:
+                item['ts_entrada'] = ts_actual
+                por_adelantado.append(id_item)
+            elif self._entrar(id_item, ts_actual):
+                confirmadas.append(id_item)
+        self._nuevos = []
+        if por_adelantado:
+            self._programar(por_adelantado, ts_actual, minuto)
+
+        # Resoluciones programadas que caen en este minuto
+        vencidas = []
+        while self._programadas and self._programadas[0][0] <= ts_actual:
+            _, id_item, confirmada = heapq.heappop(self._programadas)
+            (confirmadas if confirmada else vencidas).append(id_item)
 
-        for item in self.cola:
+        # Plazos vencidos: tiempo en cola > tiempo_max_espera
+        while self._vencimientos and self._vencimientos[0][0] < ts_actual:
+            _, id_item = heapq.heappop(self._vencimientos)
+            if id_item in self.cola:
+                vencidas.append(id_item)
+        for id_item in sorted(vencidas):
+            item = self._sacar(id_item)
             senal = item['senal']
-            reglas = item['reglas']
+            delta = (ts_actual - item['ts_entrada']).total_seconds() / 60
+            registrar_evento(
+                inversionista=inversionista,
+                tipo_evento="rechazo_confirmacion",
+                id_senal_fk=senal["id_senal"],
+                motivo_no_operacion=f"Tiempo de espera excedido: {delta:.1f} min > {item['espera_max']} min"
+            )
+            logger.debug("❌ Señal %s rechazada por tiempo de espera", senal['id_senal'])
+        confirmadas = [id_item for id_item in confirmadas if id_item in self.cola]
 
-            # Si no tiene timestamp de entrada, se asigna ahora
-            if item['ts_entrada'] is None:
-                item['ts_entrada'] = ts_actual
+        # Reglas de precio: una vela por ticker con señales pendientes
+        for ticker, grupo in self._por_ticker.items():
+            high, low, close = self.obtener_precios(ticker, ts_actual)
+            if not high:
+                continue
+            if grupo['sin_referencia']:
+                for id_item in grupo['sin_referencia']:
+                    item = self.cola.get(id_item)
+                    if item is not None:
+                        item['ts_entrada_precio'] = close
+                        heapq.heappush(grupo['niveles'], (close * (1 + item['porc_supera'] / 100), id_item))
+                grupo['sin_referencia'] = []
+            niveles = grupo['niveles']
+            while niveles and niveles[0][0] < high:
+                _, id_item = heapq.heappop(niveles)
+                if id_item in self.cola:
+                    confirmadas.append(id_item)
 
-            # Calcular tiempo en cola (en minutos)
+        senales_confirmadas = []
+        for id_item in sorted(confirmadas):
+            item = self._sacar(id_item)
+            senal = item['senal']
             delta = (ts_actual - item['ts_entrada']).total_seconds() / 60
+            senales_confirmadas.append(senal)
+            logger.debug("✅ Señal %s confirmada tras %.1f min", senal['id_senal'], delta)
+            registrar_evento(
+                inversionista=inversionista,
+                tipo_evento="senal_confirmada",
+                id_senal_fk=senal["id_senal"],
+                ticker=senal["ticker_fk"],
+                detalle=f"Señal confirmada tras {delta:.1f} minutos"
+            )
 
-            # Aplicar reglas de confirmación
-            cumple = True
-
-            for regla in reglas:
-                tipo = regla['tipo']
-                valor = regla['valor']
-
-                if tipo == "tiempo_max_espera":
-                    if delta > valor:
-                        cumple = False
-                        registrar_evento(
-                            inversionista=inversionista,
-                            tipo_evento="rechazo_confirmacion",
-                            id_senal_fk=senal["id_senal"],
-                            motivo_no_operacion=f"Tiempo de espera excedido: {delta:.1f} min > {valor} min"
-                        )
-                        logging.info(f"❌ Señal {senal['id_senal']} rechazada por tiempo de espera")
-                        break
-
-                elif tipo == "volumen_min":
-                    # Ejemplo: requiere volumen mínimo en el periodo
-                    pass  # Implementar si es necesario
-
-                elif tipo == "precio_supera":
-                    # Ejemplo: precio debe superar un nivel desde entrada
-                    high, low, close = obtener_precio_min_max_close(senal['ticker'], ts_actual)
-                    if not high:
-                        continue
-                    precio_referencia = item['ts_entrada_precio']  # Debería estar guardado
-                    if high <= precio_referencia * (1 + valor / 100):
-                        cumple = False
-                        break
-
-                # Añade más reglas según necesidad
-
-            if cumple:
-                senales_confirmadas.append(senal)
-                logging.info(f"✅ Señal {senal['id_senal']} confirmada tras {delta:.1f} min")
-                registrar_evento(
-                    inversionista=inversionista,
-                    tipo_evento="senal_confirmada",
-                    id_senal_fk=senal["id_senal"],
-                    ticker=senal["ticker"],
-                    detalle=f"Señal confirmada tras {delta:.1f} minutos"
-                )
-            else:
-                activas.append(item)
-
-        # Actualizar cola: solo las no confirmadas
-        self.cola = activas
-
-        return senales_confirmadas
\ No newline at end of file
+        return senales_confirmadas
@@ -0,0 +1,90 @@
+# dao/copia_bulk.py
+from db_connection import conectar_db
+import io
+import logging
+import math
+from datetime import date, datetime
+from decimal import Decimal
+
+"""
+Escritura masiva con COPY ... FROM STDIN (formato CSV).
+
+Las filas se envían en bloques de tamano_bloque, cada bloque en un solo
+COPY. Reglas de serialización:
+- None            -> campo vacío sin comillas (NULL en CSV de PostgreSQL)
+- str             -> siempre entre comillas, así '' queda como cadena vacía
+- bool            -> true / false
+- float           -> repr (NaN / Infinity / -Infinity para no finitos)
+- datetime / date -> ISO 8601
+- Decimal / int   -> str
+"""
+
+TAMANO_BLOQUE_COPY = 50000
+
+
+def _campo_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, str):
+        return '"' + valor.replace('"', '""') + '"'
+    if isinstance(valor, bool):
+        return 'true' if valor else 'false'
+    if isinstance(valor, float):
+        if math.isnan(valor):
+            return 'NaN'
+        if math.isinf(valor):
+            return 'Infinity' if valor > 0 else '-Infinity'
+        return float.__repr__(valor)  # ✅ np.float64 da "np.float64(1.5)" con repr() en NumPy 2
+    if isinstance(valor, datetime):
+        return valor.isoformat(sep=' ')
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, (int, Decimal)):
+        return str(valor)
+    return '"' + str(valor).replace('"', '""') + '"'
+
+
+def filas_a_csv(filas):
+    """
+    Serializa un iterable de tuplas a un buffer CSV listo para COPY.
+    """
+    buffer = io.StringIO()
+    escribir = buffer.write
+    for fila in filas:
+        escribir(','.join([_campo_csv(v) for v in fila]))
+        escribir('\n')
+    buffer.seek(0)
+    return buffer
+
+
+def _copiar(cur, tabla, columnas, filas, tamano_bloque):
+    sql = f"COPY {tabla} ({', '.join(columnas)}) FROM STDIN WITH (FORMAT csv)"
+    total = 0
+    for inicio in range(0, len(filas), tamano_bloque):
+        bloque = filas[inicio:inicio + tamano_bloque]
+        cur.copy_expert(sql, filas_a_csv(bloque))
+        total += len(bloque)
+    return total
+
+
+def copiar_filas(tabla, columnas, filas, tamano_bloque=TAMANO_BLOQUE_COPY, conn=None):
+    """
+    Inserta `filas` (secuencia de tuplas en el orden de `columnas`) en `tabla`
+    con COPY. Si se pasa `conn` se usa sin confirmar (el llamador decide el
+    commit); si no, se presta una conexión y se confirma todo junto.
+    Retorna la cantidad de filas escritas.
+    """
+    if not filas:
+        return 0
+    if conn is not None:
+        with conn.cursor() as cur:
+            return _copiar(cur, tabla, columnas, filas, tamano_bloque)
+    try:
+        with conectar_db() as conn:
+            with conn.cursor() as cur:
+                total = _copiar(cur, tabla, columnas, filas, tamano_bloque)
+            conn.commit()
+            return total
+    except Exception as e:
+        logging.error(f"❌ Error en COPY a {tabla}: {e}")
+        raise
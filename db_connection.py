@@ -1,38 +1,192 @@
 # db_connection.py
-import psycopg2
+try:
+    import psycopg2
+    import psycopg2.extensions
+    from psycopg2 import pool
+except ImportError:  # Sin psycopg2 solo funcionan los backends de memoria y SQLite
+    psycopg2 = pool = None
 from parmspg import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
+from medicion_bd import fabrica_cursor
 import logging
+import threading
+import time
 
-# Conexión global (única)
-_conn = None
+# Tamaño del pool y verificación de salud
+POOL_MIN_CONEXIONES = 1
+POOL_MAX_CONEXIONES = 8
+SEGUNDOS_SIN_USO_VERIFICAR = 60  # Conexiones inactivas más tiempo que esto se prueban con SELECT 1
+TIMEOUT_ESPERA_CONEXION = 30  # Segundos esperando una conexión libre antes de fallar
 
-def conectar_db():
+# Pool global (uno por proceso)
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _numeric_a_float(valor, cur):
+    return float(valor) if valor is not None else None
+
+
+def registrar_numeric_float():
     """
-    Retorna una conexión a PostgreSQL (una sola vez).
+    Hace que psycopg2 entregue NUMERIC (y NUMERIC[]) como float en lugar de
+    Decimal, en todas las conexiones del proceso. Así los DAO no convierten
+    valor por valor. Se llama una vez al importar este módulo.
     """
-    global _conn
-    if _conn is None:
+    if psycopg2 is None:
+        return
+    extensiones = psycopg2.extensions
+    numeric = extensiones.new_type(extensiones.DECIMAL.values, 'NUMERIC_FLOAT', _numeric_a_float)
+    extensiones.register_type(numeric)
+    extensiones.register_type(extensiones.new_array_type(extensiones.DECIMALARRAY.values, 'NUMERIC_FLOAT_ARRAY', numeric))
+
+
+registrar_numeric_float()
+
+
+class PoolConexiones:
+    """
+    Pool de conexiones PostgreSQL seguro para hilos.
+
+    prestar() entrega una conexión sana (bloquea si todas están en uso) y
+    devolver() la regresa al pool. Las conexiones cerradas o que no responden
+    se descartan y se reemplazan.
+    """
+
+    def __init__(self, minimo=POOL_MIN_CONEXIONES, maximo=POOL_MAX_CONEXIONES):
+        self.minimo = minimo
+        self.maximo = maximo
+        self._pool = pool.ThreadedConnectionPool(
+            minimo, maximo,
+            host=DB_HOST,
+            port=DB_PORT,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            database=DB_NAME,
+            connect_timeout=10
+        )
+        self._disponibles = threading.BoundedSemaphore(maximo)
+        self._ultimo_uso = {}  # id(conn) -> time.monotonic() de la última devolución
+
+    def _sana(self, conn):
+        if conn.closed:
+            return False
+        ultimo = self._ultimo_uso.get(id(conn))
+        if ultimo is not None and time.monotonic() - ultimo < SEGUNDOS_SIN_USO_VERIFICAR:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def prestar(self):
+        if not self._disponibles.acquire(timeout=TIMEOUT_ESPERA_CONEXION):
+            raise pool.PoolError(f"No hay conexiones libres tras {TIMEOUT_ESPERA_CONEXION}s (máximo={self.maximo})")
         try:
-            _conn = psycopg2.connect(
-                host=DB_HOST,
-                port=DB_PORT,
-                user=DB_USER,
-                password=DB_PASSWORD,
-                database=DB_NAME,
-                connect_timeout=10
-            )
-            logging.info("✅ Conexión a PostgreSQL establecida.")
-        except Exception as e:
-            logging.error(f"❌ No se pudo conectar a la base de datos: {e}")
+            for _ in range(self.maximo + 1):
+                conn = self._pool.getconn()
+                if self._sana(conn):
+                    conn.cursor_factory = fabrica_cursor()  # ✅ Cursor medido si la medición está activa
+                    return conn
+                logging.warning("⚠️  Conexión a PostgreSQL no responde, se reemplaza.")
+                self._ultimo_uso.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+            raise pool.PoolError("No se pudo obtener una conexión sana del pool")
+        except Exception:
+            self._disponibles.release()
             raise
-    return _conn
+
+    def devolver(self, conn):
+        try:
+            if conn.closed:
+                self._ultimo_uso.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+            else:
+                self._ultimo_uso[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            self._disponibles.release()
+
+    def cerrar(self):
+        self._pool.closeall()
+
+
+class ConexionPrestada:
+    """
+    Context manager devuelto por conectar_db().
+
+    Al entrar presta una conexión del pool; al salir confirma (o revierte si
+    hubo excepción), igual que `with conn:` de psycopg2, y la devuelve.
+    """
+
+    def __init__(self, pool_conexiones):
+        self._pool = pool_conexiones
+        self.conn = None
+
+    def __enter__(self):
+        self.conn = self._pool.prestar()
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        conn, self.conn = self.conn, None
+        try:
+            if not conn.closed:
+                if exc_type is None:
+                    conn.commit()
+                else:
+                    conn.rollback()
+        finally:
+            self._pool.devolver(conn)
+        return False
+
+
+def obtener_pool():
+    """
+    Retorna el pool del proceso, creándolo la primera vez.
+    """
+    global _pool
+    if pool is None:
+        raise RuntimeError("psycopg2 no está instalado: no hay acceso a PostgreSQL")
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                try:
+                    _pool = PoolConexiones()
+                    logging.info(f"✅ Pool de conexiones a PostgreSQL establecido (máx={_pool.maximo}).")
+                except Exception as e:
+                    logging.error(f"❌ No se pudo conectar a la base de datos: {e}")
+                    raise
+    return _pool
+
+
+def configurar_pool(minimo=POOL_MIN_CONEXIONES, maximo=POOL_MAX_CONEXIONES):
+    """
+    (Re)crea el pool con otro tamaño. Cierra el anterior si existía.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.cerrar()
+        _pool = PoolConexiones(minimo, maximo)
+    return _pool
+
+
+def conectar_db():
+    """
+    Presta una conexión del pool. Usar siempre como `with conectar_db() as conn:`.
+    """
+    return ConexionPrestada(obtener_pool())
+
 
 def cerrar_db():
     """
-    Cierra la conexión global.
+    Cierra todas las conexiones del pool.
     """
-    global _conn
-    if _conn:
-        _conn.close()
-        _conn = None
-        logging.info("🔌 Conexión a PostgreSQL cerrada.")
\ No newline at end of file
+    global _pool
+    with _pool_lock:
+        if _pool:
+            _pool.cerrar()
+            _pool = None
+            logging.info("🔌 Conexiones a PostgreSQL cerradas.")
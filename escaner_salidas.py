@@ -0,0 +1,223 @@
+# modulos/escaner_salidas.py
+import numpy as np
+
+"""
+Escáner vectorizado de salidas para una operación abierta.
+
+A partir de los arreglos high/low/close precargados (SerieVelas de
+dao/almacen_precios) recorre hacia adelante desde el minuto indicado y
+devuelve el primer minuto en que Simulador._monitorear_cierres cerraría o
+cerraría parcialmente la operación, y el motivo. Reproduce las mismas
+comparaciones, en el mismo orden de prioridad:
+
+  TP > retroceso desde apertura > retroceso desde máximo/mínimo
+     > cierre parcial por SL > SL
+"""
+
+MOTIVO_TP = "Take Profit"
+MOTIVO_RETRO_ENTRADA = "Retroceso desde apertura"
+MOTIVO_RETRO_MAXIMO = "Retroceso desde máximo"
+MOTIVO_RETRO_MINIMO = "Retroceso desde mínimo"
+MOTIVO_PARCIAL = "Liquidación parcial por SL"
+MOTIVO_SL = "Stop Loss"
+
+
+class ResultadoEscaneo:
+    """
+    minuto: primer minuto con evento (None si no hay evento en el rango).
+    motivo: motivo del evento (constantes MOTIVO_*).
+    precio_max / precio_min: extremos alcanzados hasta ese minuto inclusive
+    (o hasta el final del rango si no hubo evento).
+    """
+    __slots__ = ('minuto', 'motivo', 'precio_max', 'precio_min')
+
+    def __init__(self, minuto, motivo, precio_max, precio_min):
+        self.minuto = minuto
+        self.motivo = motivo
+        self.precio_max = precio_max
+        self.precio_min = precio_min
+
+
+def _velas_validas(serie, desde, hasta):
+    high = serie.high[desde:hasta]
+    low = serie.low[desde:hasta]
+    close = serie.close[desde:hasta]
+    # Igual que el bucle: velas ausentes o con precio 0 se ignoran
+    valida = serie.cobertura[desde:hasta] & (high != 0) & (low != 0) & (close != 0)
+    return high, low, close, valida
+
+
+def _extremos_acumulados(close, valida, tipo, precio_max, precio_min):
+    """
+    Máximos (LONG) o mínimos (SHORT) acumulados del close, partiendo de los
+    extremos actuales de la operación. El otro extremo no cambia.
+    """
+    if tipo == "LONG":
+        maximos = np.maximum.accumulate(np.where(valida, close, -np.inf))
+        np.maximum(maximos, precio_max, out=maximos)
+        return maximos, None
+    minimos = np.minimum.accumulate(np.where(valida, close, np.inf))
+    np.minimum(minimos, precio_min, out=minimos)
+    return None, minimos
+
+
+def extremos_hasta(serie, desde, hasta, tipo, precio_max, precio_min):
+    """
+    Extremos (precio_max, precio_min) tras aplicar los close de [desde, hasta).
+    """
+    if hasta <= desde:
+        return precio_max, precio_min
+    close = serie.close[desde:hasta]
+    valida = serie.cobertura[desde:hasta] & (serie.high[desde:hasta] != 0) & \
+        (serie.low[desde:hasta] != 0) & (close != 0)
+    if not valida.any():
+        return precio_max, precio_min
+    if tipo == "LONG":
+        return max(precio_max, float(close[valida].max())), precio_min
+    return precio_max, min(precio_min, float(close[valida].min()))
+
+
+def escanear_salida(
+    serie, desde, tipo, precio_entrada, take_profit, stop_loss,
+    precio_max, precio_min, params, es_hija=False,
+    porc_minimo_avance_tp=0.20, hasta=None
+):
+    """
+    Busca el primer minuto >= desde en que la operación cerraría.
+    params: diccionario de obtener_parametros_estrategia.
+    """
+    n = len(serie.close) if hasta is None else hasta
+    if desde >= n:
+        return ResultadoEscaneo(None, None, precio_max, precio_min)
+
+    high, low, close, valida = _velas_validas(serie, desde, n)
+    maximos, minimos = _extremos_acumulados(close, valida, tipo, precio_max, precio_min)
+
+    porc_retroceso_entrada = params['porc_limite_retro_entrada']
+    porc_retroceso_max = params['porc_limite_retro']
+    porc_retroceso_parcial = params['porc_retroceso_liquidacion_sl']
+
+    if tipo == "LONG":
+        tp = high >= take_profit
+        retroceso = (precio_entrada - low) / precio_entrada
+        retro_entrada = retroceso >= porc_retroceso_entrada
+        precio_minimo_activacion = precio_entrada + porc_minimo_avance_tp * (take_profit - precio_entrada)
+        protegido = (maximos > precio_entrada) & (maximos >= precio_minimo_activacion)
+        retro_extremo = protegido & (low <= maximos - porc_retroceso_max * (maximos - precio_entrada))
+        sl = low <= stop_loss
+        motivo_extremo = MOTIVO_RETRO_MAXIMO
+    else:
+        tp = low <= take_profit
+        retroceso = (high - precio_entrada) / precio_entrada
+        retro_entrada = retroceso >= porc_retroceso_entrada
+        precio_maximo_activacion = precio_entrada - porc_minimo_avance_tp * (precio_entrada - take_profit)
+        protegido = (minimos < precio_entrada) & (minimos <= precio_maximo_activacion)
+        retro_extremo = protegido & (high >= minimos + porc_retroceso_max * (precio_entrada - minimos))
+        sl = high >= stop_loss
+        motivo_extremo = MOTIVO_RETRO_MINIMO
+
+    if es_hija:
+        parcial = np.zeros_like(valida)
+    else:
+        parcial = ~protegido & (retroceso >= porc_retroceso_parcial)
+
+    evento = valida & (tp | retro_entrada | retro_extremo | parcial | sl)
+    if not evento.any():
+        ultimo = len(close) - 1
+        return ResultadoEscaneo(
+            None, None,
+            float(maximos[ultimo]) if maximos is not None else precio_max,
+            float(minimos[ultimo]) if minimos is not None else precio_min
+        )
+
+    k = int(np.argmax(evento))
+    if tp[k]:
+        motivo = MOTIVO_TP
+    elif retro_entrada[k]:
+        motivo = MOTIVO_RETRO_ENTRADA
+    elif retro_extremo[k]:
+        motivo = motivo_extremo
+    elif parcial[k]:
+        motivo = MOTIVO_PARCIAL
+    else:
+        motivo = MOTIVO_SL
+
+    return ResultadoEscaneo(
+        desde + k, motivo,
+        float(maximos[k]) if maximos is not None else precio_max,
+        float(minimos[k]) if minimos is not None else precio_min
+    )
+
+
+# Códigos de motivo para escanear_salidas_parametros
+SIN_EVENTO, EVENTO_TP, EVENTO_RETRO_ENTRADA, EVENTO_RETRO_EXTREMO, EVENTO_PARCIAL, EVENTO_SL = range(6)
+
+
+def escanear_salidas_parametros(
+    serie, desde, hasta, tipo, precio_entrada, take_profit, stop_loss,
+    extremo_inicial, porc_retro_entrada, porc_retro, porc_retro_parcial,
+    porc_minimo_avance_tp=0.20
+):
+    """
+    Versión de escanear_salida para P juegos de parámetros a la vez, sobre la
+    ventana [desde, hasta). Los parámetros y extremo_inicial (máximo para
+    LONG, mínimo para SHORT) son vectores de largo P; las condiciones se
+    calculan con broadcasting sobre una matriz (P, minutos).
+
+    Retorna (minuto, motivo, extremo, sl_mismo_minuto), todos de largo P:
+    minuto = -1 y motivo = SIN_EVENTO si no hubo evento en la ventana; extremo
+    es el extremo en el minuto del evento (o al final de la ventana);
+    sl_mismo_minuto indica que en el minuto de un cierre parcial también se
+    tocó el SL.
+    """
+    extremo_inicial = np.asarray(extremo_inicial, dtype=np.float64)
+    p = len(extremo_inicial)
+    if hasta <= desde:
+        return np.full(p, -1), np.full(p, SIN_EVENTO, dtype=np.int8), extremo_inicial.copy(), np.zeros(p, dtype=bool)
+    high, low, close, valida = _velas_validas(serie, desde, hasta)
+    pe = np.asarray(porc_retro_entrada, dtype=np.float64)[:, None]
+    pr = np.asarray(porc_retro, dtype=np.float64)[:, None]
+    pp = np.asarray(porc_retro_parcial, dtype=np.float64)[:, None]
+
+    if tipo == "LONG":
+        acumulado = np.maximum.accumulate(np.where(valida, close, -np.inf))
+        extremos = np.maximum(extremo_inicial[:, None], acumulado[None, :])
+        tp = high >= take_profit
+        retroceso = (precio_entrada - low) / precio_entrada
+        activacion = precio_entrada + porc_minimo_avance_tp * (take_profit - precio_entrada)
+        protegido = (extremos > precio_entrada) & (extremos >= activacion)
+        retro_extremo = protegido & (low[None, :] <= extremos - pr * (extremos - precio_entrada))
+        sl = low <= stop_loss
+    else:
+        acumulado = np.minimum.accumulate(np.where(valida, close, np.inf))
+        extremos = np.minimum(extremo_inicial[:, None], acumulado[None, :])
+        tp = low <= take_profit
+        retroceso = (high - precio_entrada) / precio_entrada
+        activacion = precio_entrada - porc_minimo_avance_tp * (precio_entrada - take_profit)
+        protegido = (extremos < precio_entrada) & (extremos <= activacion)
+        retro_extremo = protegido & (high[None, :] >= extremos + pr * (precio_entrada - extremos))
+        sl = high >= stop_loss
+
+    retro_entrada = retroceso[None, :] >= pe
+    parcial = ~protegido & (retroceso[None, :] >= pp)
+    base = valida & (tp | sl)
+    evento = base[None, :] | (valida[None, :] & (retro_entrada | retro_extremo | parcial))
+
+    hay_evento = evento.any(axis=1)
+    k = np.argmax(evento, axis=1)
+    filas = np.arange(p)
+    motivo = np.full(p, SIN_EVENTO, dtype=np.int8)
+    # Asignar en orden inverso de prioridad para que gane el de mayor prioridad
+    motivo[sl[k]] = EVENTO_SL
+    motivo[parcial[filas, k]] = EVENTO_PARCIAL
+    motivo[retro_extremo[filas, k]] = EVENTO_RETRO_EXTREMO
+    motivo[retro_entrada[filas, k]] = EVENTO_RETRO_ENTRADA
+    motivo[tp[k]] = EVENTO_TP
+    motivo[~hay_evento] = SIN_EVENTO
+
+    ultimo = len(close) - 1
+    indice_extremo = np.where(hay_evento, k, ultimo)
+    extremo = extremos[filas, indice_extremo]
+    minuto = np.where(hay_evento, desde + k, -1)
+    sl_mismo_minuto = hay_evento & (motivo == EVENTO_PARCIAL) & sl[k]
+    return minuto, motivo, extremo, sl_mismo_minuto
@@ -1,7 +1,28 @@
 # dao/estrategias.py
 from db_connection import conectar_db
 import logging
-from decimal import Decimal
+
+# Parámetros de cierre, en porcentaje como en la tabla
+COLUMNAS_PARAMETROS = (
+    'porc_limite_retro_entrada',
+    'porc_limite_retro',
+    'porc_retroceso_liquidacion_sl',
+    'porc_liquidacion_parcial_sl'
+)
+
+
+def convertir_parametros(fila):
+    """
+    Fila en orden de COLUMNAS_PARAMETROS -> parámetros como los usa el
+    simulador: umbrales en fracción; la liquidación parcial sigue en porcentaje.
+    """
+    return {
+        'porc_limite_retro_entrada': float(fila[0]) / 100,
+        'porc_limite_retro': float(fila[1]) / 100,
+        'porc_retroceso_liquidacion_sl': float(fila[2]) / 100,
+        'porc_liquidacion_parcial_sl': float(fila[3])
+    }
+
 
 def obtener_parametros_estrategia(id_estrategia):
     """
@@ -32,13 +53,8 @@ def obtener_parametros_estrategia(id_estrategia):
                     logging.error(error_msg)
                     raise ValueError(error_msg)
                 
-                # Convertir Decimal a float y dividir por 100 para porcentajes
-                parametros = {
-                    'porc_limite_retro_entrada': float(row[0]) / 100,
-                    'porc_limite_retro': float(row[1]) / 100,
-                    'porc_retroceso_liquidacion_sl': float(row[2]) / 100,
-                    'porc_liquidacion_parcial_sl': float(row[3])
-                }
+                # Umbrales en fracción (la misma conversión que los demás backends)
+                parametros = convertir_parametros(row)
                 
                 logging.info(f"✅ Parámetros cargados para estrategia {id_estrategia}: {parametros}")
                 return parametros
@@ -46,4 +62,33 @@ def obtener_parametros_estrategia(id_estrategia):
     except Exception as e:
         error_msg = f"❌ ERROR CRÍTICO al obtener parámetros de estrategia {id_estrategia}: {e}"
         logging.error(error_msg)
-        raise Exception(error_msg)
\ No newline at end of file
+        raise Exception(error_msg)
+
+
+def cargar_parametros_estrategias():
+    """
+    Parámetros de todas las estrategias activas en una consulta:
+    {id_estrategia: parámetros (convertir_parametros)}. Las filas con
+    parámetros incompletos se omiten.
+    """
+    query = f"""
+        SELECT id_estrategia, {', '.join(COLUMNAS_PARAMETROS)}
+        FROM estrategias
+        WHERE activa = true
+        ORDER BY id_estrategia
+    """
+    try:
+        with conectar_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query)
+                parametros = {}
+                for row in cur.fetchall():
+                    if any(v is None for v in row[1:]):
+                        logging.warning(f"⚠️  Parámetros incompletos para estrategia ID {row[0]}: se omite")
+                        continue
+                    parametros[row[0]] = convertir_parametros(row[1:])
+                logging.info(f"✅ Parámetros cargados para {len(parametros)} estrategias activas")
+                return parametros
+    except Exception as e:
+        logging.error(f"❌ Error al cargar parámetros de estrategias: {e}")
+        raise
\ No newline at end of file
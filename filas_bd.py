@@ -0,0 +1,31 @@
+# dao/filas_bd.py
+import numpy as np
+
+"""
+Armado de resultados de consultas sin conversiones por valor.
+
+NUMERIC llega como float (db_connection.registrar_numeric_float), así que las
+filas de psycopg2 se usan tal cual: como dicts para las lecturas de pocas
+filas y transpuestas a arreglos NumPy por columna para las lecturas masivas.
+"""
+
+
+def como_dicts(filas, columnas):
+    """
+    Lista de dicts {columna: valor}, en el orden de `columnas`.
+    """
+    return [dict(zip(columnas, fila)) for fila in filas]
+
+
+def como_columnas(filas, tipos):
+    """
+    Transpone filas (tuplas) a columnas. tipos: dtype NumPy de cada columna,
+    o None para dejarla como lista de Python (textos, timestamps). En columnas
+    float, NULL queda como NaN.
+    """
+    if not filas:
+        return tuple([] if tipo is None else np.empty(0, dtype=tipo) for tipo in tipos)
+    return tuple(
+        list(columna) if tipo is None else np.array(columna, dtype=tipo)
+        for columna, tipo in zip(zip(*filas), tipos)
+    )
@@ -0,0 +1,182 @@
+# benchmarks/generador_sintetico.py
+"""
+Generador reproducible (con semilla) de datos sintéticos con la forma de las
+tablas que lee el simulador: ohlcv_raw_1m, senales_generadas, estrategias e
+inversionistas.
+
+La escala se define con Escala (tickers, días, señales por día,
+inversionistas); la misma semilla produce siempre los mismos datos.
+"""
+import math
+from datetime import datetime, timedelta
+import numpy as np
+from dao.almacen_precios import PriceStore
+
+
+class Escala:
+    """
+    Tamaño y forma de los datos a generar.
+    """
+
+    def __init__(self, tickers=10, dias=7, senales_por_dia=50, inversionistas=1,
+                 estrategias=3, prob_long=0.5, dist_tp_pct=3.0, dist_sl_pct=3.0,
+                 volatilidad=0.0015, prob_hueco=0.001, semilla=42,
+                 fecha_inicio=datetime(2025, 1, 1)):
+        self.tickers = tickers
+        self.dias = dias
+        self.senales_por_dia = senales_por_dia
+        self.inversionistas = inversionistas
+        self.estrategias = estrategias
+        self.prob_long = prob_long  # 1.0 = todas LONG (fuerza DCA sobre la misma clave)
+        self.dist_tp_pct = dist_tp_pct  # Distancia del TP al precio de la señal
+        self.dist_sl_pct = dist_sl_pct
+        self.volatilidad = volatilidad  # Desvío del retorno por minuto
+        self.prob_hueco = prob_hueco  # Probabilidad de que falte una vela
+        self.semilla = semilla
+        self.fecha_inicio = fecha_inicio
+
+    def escalada(self, factor):
+        """
+        Copia con días y señales por día multiplicados por `factor`.
+        """
+        copia = Escala(**vars(self))
+        copia.dias = max(1, int(round(self.dias * factor)))
+        copia.senales_por_dia = max(1, int(round(self.senales_por_dia * factor)))
+        return copia
+
+
+class DatosSinteticos:
+    """
+    Resultado de generar(): velas por ticker en arreglos, señales como filas
+    en el orden de COLUMNAS_SENAL, estrategias e inversionistas como dicts.
+    """
+
+    def __init__(self, fecha_inicio, fecha_fin):
+        self.fecha_inicio = fecha_inicio
+        self.fecha_fin = fecha_fin
+        self.velas = {}  # ticker -> (minutos, ids, high, low, close)
+        self.senales = []
+        self.estrategias = {}  # id_estrategia -> fila de la tabla estrategias
+        self.inversionistas = []  # mismo formato que obtener_todos_inversionistas_activos
+
+    def price_store(self):
+        store = PriceStore(self.fecha_inicio, self.fecha_fin)
+        for ticker, (minutos, ids, high, low, close) in self.velas.items():
+            store.asignar(ticker, minutos, ids, high, low, close)
+        return store
+
+    def filas_ohlcv(self):
+        """
+        Filas (ticker, timestamp, id, high, low, close) para cargar ohlcv_raw_1m.
+        """
+        for ticker, (minutos, ids, high, low, close) in self.velas.items():
+            for k in range(len(minutos)):
+                yield (
+                    ticker, self.fecha_inicio + timedelta(minutes=int(minutos[k])),
+                    int(ids[k]), float(high[k]), float(low[k]), float(close[k])
+                )
+
+    def cargar_en(self, backend):
+        """
+        Carga velas, señales, estrategias e inversionistas en un backend con
+        métodos insertar_* (BackendMemoria o BackendSQLite).
+        """
+        backend.insertar_velas(self.filas_ohlcv())
+        backend.insertar_senales(self.senales)
+        backend.insertar_estrategias(self.estrategias.values())
+        backend.insertar_inversionistas(self.inversionistas)
+        return backend
+
+    def resumen(self):
+        velas = sum(len(v[0]) for v in self.velas.values())
+        return {
+            'tickers': len(self.velas),
+            'velas': velas,
+            'senales': len(self.senales),
+            'estrategias': len(self.estrategias),
+            'inversionistas': len(self.inversionistas)
+        }
+
+
+def _generar_velas(rnd, n_minutos, escala, id_inicial):
+    precio_inicial = math.exp(rnd.uniform(math.log(0.5), math.log(50000)))
+    retornos = rnd.normal(0.0, escala.volatilidad, n_minutos)
+    close = precio_inicial * np.exp(np.cumsum(retornos))
+    mecha = np.abs(rnd.normal(0.0, escala.volatilidad, (2, n_minutos)))
+    high = close * (1 + mecha[0])
+    low = close * (1 - mecha[1])
+    minutos = np.flatnonzero(rnd.random(n_minutos) >= escala.prob_hueco)
+    ids = id_inicial + np.arange(len(minutos), dtype=np.int64)
+    return minutos, ids, high[minutos], low[minutos], close[minutos]
+
+
+def generar(escala):
+    """
+    Genera los datos de `escala`. Determinista para una misma semilla.
+    """
+    rnd = np.random.default_rng(escala.semilla)
+    fecha_inicio = escala.fecha_inicio
+    fecha_fin = fecha_inicio + timedelta(days=escala.dias) - timedelta(minutes=1)
+    datos = DatosSinteticos(fecha_inicio, fecha_fin)
+    n_minutos = escala.dias * 1440
+
+    # ohlcv_raw_1m: paseo aleatorio geométrico por ticker
+    siguiente_id = 1
+    tickers = [f"SIM{k:03d}USDT" for k in range(escala.tickers)]
+    for ticker in tickers:
+        velas = _generar_velas(rnd, n_minutos, escala, siguiente_id)
+        datos.velas[ticker] = velas
+        siguiente_id += len(velas[0])
+
+    # estrategias (valores en porcentaje, como en la tabla)
+    for id_estrategia in range(1, escala.estrategias + 1):
+        datos.estrategias[id_estrategia] = {
+            'id_estrategia': id_estrategia,
+            'porc_limite_retro_entrada': round(rnd.uniform(1.0, 3.0), 2),
+            'porc_limite_retro': round(rnd.uniform(30.0, 60.0), 2),
+            'porc_retroceso_liquidacion_sl': round(rnd.uniform(0.5, 1.5), 2),
+            'porc_liquidacion_parcial_sl': 50.0,
+            'activa': True
+        }
+
+    # senales_generadas: minutos al azar, precio = close de la vela (o la anterior)
+    total = escala.dias * escala.senales_por_dia
+    minutos = np.sort(rnd.integers(0, n_minutos, total))
+    indices_ticker = rnd.integers(0, len(tickers), total)
+    es_long = rnd.random(total) < escala.prob_long
+    ids_estrategia = rnd.integers(1, escala.estrategias + 1, total)
+    for k in range(total):
+        ticker = tickers[indices_ticker[k]]
+        minutos_vela, _, _, _, close = datos.velas[ticker]
+        pos = max(0, int(np.searchsorted(minutos_vela, minutos[k], side='right')) - 1)
+        precio = float(close[pos])
+        tipo = "LONG" if es_long[k] else "SHORT"
+        signo = 1 if es_long[k] else -1
+        datos.senales.append((
+            k + 1,
+            int(ids_estrategia[k]),
+            ticker,
+            fecha_inicio + timedelta(minutes=int(minutos[k])),
+            tipo,
+            precio,
+            precio * (1 + signo * escala.dist_tp_pct / 100),
+            precio * (1 - signo * escala.dist_sl_pct / 100),
+            float(rnd.integers(1, 11))
+        ))
+
+    # inversionistas
+    for id_inversionista in range(1, escala.inversionistas + 1):
+        datos.inversionistas.append({
+            'id_inversionista': id_inversionista,
+            'capital_aportado': 100000.0,
+            'riesgo_max_pct': 1.0,
+            'tamano_min': 10.0,
+            'tamano_max': 5000.0,
+            'limite_diario': 10 * escala.senales_por_dia,
+            'limite_abiertas': 2 * escala.tickers,
+            'apalancamiento_max': 5.0,
+            'comision_pct': 0.04,
+            'slippage_pct': 0.05,
+            'usar_parametros_senal': bool(id_inversionista % 2)
+        })
+    return datos
@@ -1,7 +1,15 @@
 # dao/inversionistas.py
 from db_connection import conectar_db
+from dao.filas_bd import como_dicts
 import logging
-from decimal import Decimal
+
+COLUMNAS_INVERSIONISTA = [
+    'id_inversionista', 'capital_aportado',
+    'riesgo_max_pct', 'tamano_min', 'tamano_max',
+    'limite_diario', 'limite_abiertas',
+    'apalancamiento_max', 'comision_pct',
+    'slippage_pct', 'usar_parametros_senal'
+]
 
 
 def obtener_todos_inversionistas_activos():
@@ -28,27 +36,24 @@ def obtener_todos_inversionistas_activos():
         with conectar_db() as conn:
             with conn.cursor() as cur:
                 cur.execute(query)
-                rows = cur.fetchall()
-                if not rows:
-                    return []
-                columnas = [
-                    'id_inversionista', 'capital_aportado',
-                    'riesgo_max_pct', 'tamano_min', 'tamano_max',
-                    'limite_diario', 'limite_abiertas',
-                    'apalancamiento_max', 'comision_pct',
-                    'slippage_pct', 'usar_parametros_senal'
-                ]
-                # Convertir Decimal a float
-                registros = []
-                for row in rows:
-                    registro = {}
-                    for col, val in zip(columnas, row):
-                        if isinstance(val, Decimal):
-                            registro[col] = float(val)
-                        else:
-                            registro[col] = val
-                    registros.append(registro)
-                return registros
+                return como_dicts(cur.fetchall(), COLUMNAS_INVERSIONISTA)
     except Exception as e:
         logging.error(f"❌ Error al obtener inversionistas activos: {e}")
-        return []
\ No newline at end of file
+        return []
+
+
+def obtener_capital_actual(id_inversionista):
+    """
+    capital_actual guardado al final de la última simulación (None si el
+    inversionista no existe o aún no tiene).
+    """
+    query = "SELECT capital_actual FROM inversionistas WHERE id_inversionista = %s;"
+    try:
+        with conectar_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (id_inversionista,))
+                row = cur.fetchone()
+                return float(row[0]) if row and row[0] is not None else None
+    except Exception as e:
+        logging.error(f"❌ Error al obtener capital actual: {e}")
+        raise
\ No newline at end of file
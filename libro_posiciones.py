@@ -0,0 +1,234 @@
+# modulos/libro_posiciones.py
+import numpy as np
+
+"""
+Libro de posiciones abiertas en arreglos (struct-of-arrays).
+
+Cada posición ocupa un slot entero; precio de entrada, cantidad,
+apalancamiento, SL, TP, extremos y exposición viven en arreglos NumPy del
+libro y las instancias de Operacion (clases.py) son vistas sobre su slot
+mediante los descriptores CampoLibro. Al salir del libro la operación copia
+sus valores y sigue funcionando sola.
+
+El libro se usa como el antiguo diccionario operaciones_activas, con clave
+(ticker, tipo) y el mismo orden de iteración (orden de inserción; reemplazar
+una clave mantiene su lugar). Guarda además, por slot, la salida programada
+por el escáner, para decidir con una sola comparación qué posiciones se
+evalúan en cada minuto.
+"""
+
+# Campos numéricos de Operacion guardados en el libro, en orden de columna
+CAMPOS_LIBRO = (
+    'precio_entrada', 'cantidad', 'apalancamiento', 'stop_loss', 'take_profit',
+    'precio_max_alcanzado', 'precio_min_alcanzado',
+    'capital_riesgo_usado', 'valor_total_exposicion',
+)
+
+SIN_PROGRAMAR = -1  # minuto_salida de una posición sin salida programada
+SIN_ESTRATEGIA = -1  # id_estrategia de una posición con id_estrategia_fk None
+SIN_SALIDA_FUTURA = np.iinfo(np.int64).max
+
+CAPACIDAD_INICIAL = 64
+
+
+class CampoLibro:
+    """
+    Descriptor de un campo de CAMPOS_LIBRO: lee y escribe el arreglo del
+    libro si la operación está en uno, o su copia propia si no.
+    """
+    __slots__ = ('indice',)
+
+    def __init__(self, nombre):
+        self.indice = CAMPOS_LIBRO.index(nombre)
+
+    def __get__(self, op, tipo=None):
+        if op is None:
+            return self
+        libro = op._libro
+        if libro is None:
+            return op._valores[self.indice]
+        return libro.columnas[self.indice].item(op._slot)
+
+    def __set__(self, op, valor):
+        libro = op._libro
+        if libro is None:
+            op._valores[self.indice] = float(valor)
+        else:
+            libro.columnas[self.indice][op._slot] = valor
+
+
+class LibroPosiciones:
+    """
+    Posiciones abiertas de un inversionista, con clave (ticker, tipo).
+    """
+
+    def __init__(self, capacidad=CAPACIDAD_INICIAL):
+        capacidad = max(1, int(capacidad))
+        self.capacidad = capacidad
+        self.columnas = [np.zeros(capacidad, dtype=np.float64) for _ in CAMPOS_LIBRO]
+        self.id_estrategia = np.full(capacidad, SIN_ESTRATEGIA, dtype=np.int64)
+        self.es_long = np.zeros(capacidad, dtype=bool)
+        self.ocupado = np.zeros(capacidad, dtype=bool)
+        self.orden = np.zeros(capacidad, dtype=np.int64)  # orden de inserción de la clave
+        self.desde_salida = np.full(capacidad, SIN_PROGRAMAR, dtype=np.int64)
+        self.minuto_salida = np.full(capacidad, SIN_PROGRAMAR, dtype=np.int64)
+        self._operaciones = [None] * capacidad  # slot -> Operacion
+        self._slots = {}  # (ticker, tipo) -> slot, en orden de inserción
+        self._libres = list(range(capacidad - 1, -1, -1))
+        self._secuencia = 0
+        self._sin_programar = 0  # slots ocupados sin salida programada
+        self._proxima_salida = SIN_SALIDA_FUTURA  # cota inferior de las salidas programadas
+
+    def columna(self, nombre):
+        """Arreglo de un campo de CAMPOS_LIBRO (largo = capacidad)."""
+        return self.columnas[CAMPOS_LIBRO.index(nombre)]
+
+    # --- Slots ---
+
+    def _crecer(self):
+        nueva = self.capacidad * 2
+        extra = nueva - self.capacidad
+        self.columnas = [np.concatenate([c, np.zeros(extra, dtype=c.dtype)]) for c in self.columnas]
+        self.id_estrategia = np.concatenate([self.id_estrategia, np.full(extra, SIN_ESTRATEGIA, dtype=np.int64)])
+        self.es_long = np.concatenate([self.es_long, np.zeros(extra, dtype=bool)])
+        self.ocupado = np.concatenate([self.ocupado, np.zeros(extra, dtype=bool)])
+        self.orden = np.concatenate([self.orden, np.zeros(extra, dtype=np.int64)])
+        self.desde_salida = np.concatenate([self.desde_salida, np.full(extra, SIN_PROGRAMAR, dtype=np.int64)])
+        self.minuto_salida = np.concatenate([self.minuto_salida, np.full(extra, SIN_PROGRAMAR, dtype=np.int64)])
+        self._operaciones.extend([None] * extra)
+        self._libres.extend(range(nueva - 1, self.capacidad - 1, -1))
+        self.capacidad = nueva
+
+    def _vincular(self, op, slot):
+        """
+        Copia los valores de la operación a `slot` y la convierte en vista.
+        """
+        for columna, valor in zip(self.columnas, op._valores):
+            columna[slot] = valor
+        self.id_estrategia[slot] = op.id_estrategia_fk if op.id_estrategia_fk is not None else SIN_ESTRATEGIA
+        self.es_long[slot] = op.tipo_operacion == "LONG"
+        self.ocupado[slot] = True
+        self.desde_salida[slot] = SIN_PROGRAMAR
+        self.minuto_salida[slot] = SIN_PROGRAMAR
+        self._sin_programar += 1
+        self._operaciones[slot] = op
+        op._libro = self
+        op._slot = slot
+        op._valores = None
+
+    def _desvincular(self, slot):
+        """
+        Devuelve a la operación de `slot` una copia de sus valores y libera el slot.
+        """
+        op = self._operaciones[slot]
+        op._valores = [float(columna[slot]) for columna in self.columnas]
+        op._libro = None
+        op._slot = None
+        self._operaciones[slot] = None
+        self.ocupado[slot] = False
+        if self.minuto_salida[slot] == SIN_PROGRAMAR:
+            self._sin_programar -= 1
+        self.desde_salida[slot] = SIN_PROGRAMAR
+        self.minuto_salida[slot] = SIN_PROGRAMAR
+        return op
+
+    # --- Interfaz de diccionario ---
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, clave):
+        return clave in self._slots
+
+    def __iter__(self):
+        return iter(list(self._slots))
+
+    def __getitem__(self, clave):
+        return self._operaciones[self._slots[clave]]
+
+    def get(self, clave, defecto=None):
+        slot = self._slots.get(clave)
+        return defecto if slot is None else self._operaciones[slot]
+
+    def __setitem__(self, clave, op):
+        if op._libro is not None:
+            raise ValueError(f"La operación {op.id_operacion} ya está en un libro de posiciones")
+        slot = self._slots.get(clave)
+        if slot is not None:
+            # Reemplazo (p. ej. operación hija): mismo slot y mismo lugar en el orden
+            self._desvincular(slot)
+        else:
+            if not self._libres:
+                self._crecer()
+            slot = self._libres.pop()
+            self._slots[clave] = slot
+            self.orden[slot] = self._secuencia
+            self._secuencia += 1
+        self._vincular(op, slot)
+
+    def __delitem__(self, clave):
+        slot = self._slots.pop(clave)
+        self._desvincular(slot)
+        self._libres.append(slot)
+
+    def keys(self):
+        return list(self._slots)
+
+    def values(self):
+        return [self._operaciones[slot] for slot in self._slots.values()]
+
+    def items(self):
+        return [(clave, self._operaciones[slot]) for clave, slot in self._slots.items()]
+
+    # --- Salidas programadas ---
+
+    def programar_salida(self, op, minuto_desde, minuto_evento):
+        if self.minuto_salida[op._slot] == SIN_PROGRAMAR:
+            self._sin_programar -= 1
+        self.desde_salida[op._slot] = minuto_desde
+        self.minuto_salida[op._slot] = minuto_evento
+        self._proxima_salida = min(self._proxima_salida, minuto_evento)
+
+    def salida_programada(self, op):
+        """(minuto_desde, minuto_evento) o None si la operación no tiene salida programada."""
+        if op._libro is not self:
+            return None
+        minuto_evento = self.minuto_salida[op._slot]
+        if minuto_evento == SIN_PROGRAMAR:
+            return None
+        return int(self.desde_salida[op._slot]), int(minuto_evento)
+
+    def quitar_salida(self, op):
+        """Como salida_programada, pero además descarta la salida."""
+        programada = self.salida_programada(op)
+        if programada is not None:
+            self.desde_salida[op._slot] = SIN_PROGRAMAR
+            self.minuto_salida[op._slot] = SIN_PROGRAMAR
+            self._sin_programar += 1
+        return programada
+
+    def _en_orden(self, slots):
+        slots = slots[np.argsort(self.orden[slots], kind='stable')]
+        return [self._operaciones[slot] for slot in slots]
+
+    def con_salida_programada(self):
+        """Operaciones con salida programada, en orden de inserción."""
+        return self._en_orden(np.flatnonzero(self.ocupado & (self.minuto_salida != SIN_PROGRAMAR)))
+
+    def por_evaluar(self, minuto):
+        """
+        Operaciones a revisar en `minuto`, en orden de inserción: las que no
+        tienen salida programada y aquellas cuya salida es en `minuto` o antes.
+        Con minuto None (sin PriceStore) se revisan todas.
+        """
+        if minuto is None:
+            return self.values()
+        if not self._sin_programar and minuto < self._proxima_salida:
+            return []
+        salida = self.minuto_salida
+        # SIN_PROGRAMAR (-1) también cumple salida <= minuto
+        vencidas = self.ocupado & (salida <= minuto)
+        futuras = salida[self.ocupado & (salida > minuto)]
+        # Las vencidas se reprograman o salen del libro; basta el mínimo de las futuras
+        self._proxima_salida = int(futuras.min()) if len(futuras) else SIN_SALIDA_FUTURA
+        return self._en_orden(np.flatnonzero(vencidas))
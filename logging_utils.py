@@ -1,8 +1,29 @@
 # modulos/logging_utils.py
-from db_connection import conectar_db
 import logging
+import re
+import time
 from datetime import datetime
-from psycopg2.extras import execute_batch
+from dao.backend_datos import obtener_backend
+
+logger = logging.getLogger(__name__)
+
+# Umbrales del buffer de eventos (por inversionista)
+LOG_MAX_EVENTOS_BUFFER = 1000  # Vaciar al acumular esta cantidad de eventos
+LOG_MAX_SEGUNDOS_BUFFER = 10.0  # ... o si pasó este tiempo desde el último vaciado
+
+# Números dentro de un motivo (montos, minutos): el resumen agrupa sin ellos
+_RE_NUMERO = re.compile(r"\d+(?:\.\d+)?")
+
+
+def configurar_buffer_eventos(max_eventos=None, max_segundos=None):
+    """
+    Cambia los umbrales de vaciado del buffer de eventos.
+    """
+    global LOG_MAX_EVENTOS_BUFFER, LOG_MAX_SEGUNDOS_BUFFER
+    if max_eventos is not None:
+        LOG_MAX_EVENTOS_BUFFER = max_eventos
+    if max_segundos is not None:
+        LOG_MAX_SEGUNDOS_BUFFER = max_segundos
 
 
 def registrar_evento(
@@ -38,136 +59,79 @@ def registrar_evento(
     id_vela_1m_apertura=None  # ✅ Nuevo parámetro para ID de vela de apertura
 ):
     """
-    Registra un evento en log_operaciones_simuladas con todos los campos disponibles.
+    Registra un evento en el buffer del inversionista (inversionista.log_eventos).
+    El buffer se vuelca a log_operaciones_simuladas en bloque al superar
+    LOG_MAX_EVENTOS_BUFFER eventos o LOG_MAX_SEGUNDOS_BUFFER segundos, y al
+    final de Simulador.ejecutar (vaciar_log_a_bd). Si el inversionista tiene
+    resumen_eventos, el evento se cuenta allí por tipo y motivo.
     """
     # ✅ Usar timestamp_evento de la señal, no utcnow()
     if not timestamp_evento:
         timestamp_evento = datetime.utcnow()
 
-    query = """
-        INSERT INTO log_operaciones_simuladas (
-            timestamp_evento,
-            id_inversionista_fk,
-            id_senal_fk,
-            id_operacion_fk,
-            ticker,
-            tipo_evento,
-            detalle,
-            capital_antes,
-            capital_despues,
-            precio_senal,
-            sl,
-            tp,
-            cantidad,
-            motivo_no_operacion,
-            resultado,
-            motivo_cierre,
-            precio_cierre,
-            id_estrategia_fk,
-            duracion_operacion,
-            porc_sl,
-            porc_tp,
-            volumen_osc_asociado,
-            id_vela_1m_cierre,
-            precio_max_alcanzado,
-            precio_min_alcanzado,
-            nro_operacion,
-            id_vela_1m_apertura
-        ) VALUES (
-            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-        );
-    """
-    try:
-        with conectar_db() as conn:
-            with conn.cursor() as cur:
-                cur.execute(query, (
-                    timestamp_evento,
-                    inversionista.id,
-                    id_senal_fk,
-                    id_operacion_fk,
-                    ticker,
-                    tipo_evento,
-                    detalle,
-                    capital_antes,
-                    capital_despues,
-                    precio_senal,
-                    sl,
-                    tp,
-                    cantidad,
-                    motivo_no_operacion,
-                    resultado,
-                    motivo_cierre,
-                    precio_cierre,
-                    id_estrategia_fk,
-                    duracion_operacion,
-                    porc_sl,
-                    porc_tp,
-                    volumen_osc_asociado,
-                    id_vela_1m_cierre,
-                    precio_max_alcanzado,
-                    precio_min_alcanzado,
-                    nro_operacion,
-                    id_vela_1m_apertura  # ✅ Agregar ID de vela de apertura
-                ))
-            conn.commit()
-    except Exception as e:
-        logging.error(f"❌ Error al registrar evento en log: {e}")
+    inversionista.log_eventos.append((
+        timestamp_evento,
+        inversionista.id,
+        id_senal_fk,
+        id_operacion_fk,
+        ticker,
+        tipo_evento,
+        detalle,
+        capital_antes,
+        capital_despues,
+        precio_senal,
+        sl,
+        tp,
+        cantidad,
+        motivo_no_operacion,
+        resultado,
+        motivo_cierre,
+        precio_cierre,
+        id_estrategia_fk,
+        duracion_operacion,
+        porc_sl,
+        porc_tp,
+        volumen_osc_asociado,
+        id_vela_1m_cierre,
+        precio_max_alcanzado,
+        precio_min_alcanzado,
+        nro_operacion,
+        id_vela_1m_apertura  # ✅ Agregar ID de vela de apertura
+    ))
+    resumen = inversionista.resumen_eventos
+    if resumen is not None:
+        motivo = motivo_cierre or motivo_no_operacion
+        resumen.contar(tipo_evento, _RE_NUMERO.sub('N', motivo) if motivo else None)
+
+    transcurrido = time.monotonic() - inversionista.ultimo_vaciado_log
+    if transcurrido >= LOG_MAX_SEGUNDOS_BUFFER or \
+       (len(inversionista.log_eventos) >= LOG_MAX_EVENTOS_BUFFER and not inversionista.vaciado_log_fallido):
+        vaciar_log_a_bd(inversionista)
 
 
 def vaciar_log_a_bd(inversionista):
     """
-    Vacía los eventos en memoria al log de la base de datos.
+    Vacía los eventos en memoria al log del backend del inversionista (o el
+    backend global si no tiene uno asignado). Si falla, los eventos se conservan y se reintenta por tiempo.
     """
+    inversionista.ultimo_vaciado_log = time.monotonic()
     if not inversionista.log_eventos:
-        logging.debug("🟡 No hay eventos para guardar en BD.")
+        logger.debug("🟡 No hay eventos para guardar en BD.")
         return
 
-    query = """
-        INSERT INTO log_operaciones_simuladas (
-            timestamp_evento,
-            id_inversionista_fk,
-            id_senal_fk,
-            id_operacion_fk,
-            ticker,
-            tipo_evento,
-            detalle,
-            capital_antes,
-            capital_despues,
-            precio_senal,
-            sl,
-            tp,
-            cantidad,
-            motivo_no_operacion,
-            resultado,
-            motivo_cierre,
-            precio_cierre,
-            id_estrategia_fk,
-            duracion_operacion,
-            porc_sl,
-            porc_tp,
-            volumen_osc_asociado,
-            id_vela_1m_cierre,
-            precio_max_alcanzado,
-            precio_min_alcanzado,
-            nro_operacion,
-            id_vela_1m_apertura
-        ) VALUES (
-            %(timestamp_evento)s, %(id_inversionista_fk)s, %(id_senal_fk)s, %(id_operacion_fk)s,
-            %(ticker)s, %(tipo_evento)s, %(detalle)s, %(capital_antes)s, %(capital_despues)s,
-            %(precio_senal)s, %(sl)s, %(tp)s, %(cantidad)s, %(motivo_no_operacion)s,
-            %(resultado)s, %(motivo_cierre)s, %(precio_cierre)s, %(id_estrategia_fk)s,
-            %(duracion_operacion)s, %(porc_sl)s, %(porc_tp)s, %(volumen_osc_asociado)s,
-            %(id_vela_1m_cierre)s, %(precio_max_alcanzado)s, %(precio_min_alcanzado)s,
-            %(nro_operacion)s, %(id_vela_1m_apertura)s
-        );
-    """
+    # Los eventos referencian id_operacion: las operaciones diferidas van primero
+    repositorio = inversionista.repositorio_operaciones
+    if repositorio is not None and not repositorio.persistir():
+        inversionista.vaciado_log_fallido = True
+        return
+
+    eventos = inversionista.log_eventos
+    backend = inversionista.backend or obtener_backend()
     try:
-        with conectar_db() as conn:
-            with conn.cursor() as cur:
-                execute_batch(cur, query, inversionista.log_eventos)
-            conn.commit()
-            logging.info(f"✅ {len(inversionista.log_eventos)} eventos guardados exitosamente.")
+        backend.insertar_eventos(eventos)
+        logger.info("✅ %s eventos guardados exitosamente.", len(eventos))
+        inversionista.log_eventos = []
+        inversionista.vaciado_log_fallido = False
     except Exception as e:
-        logging.error(f"❌ Error al vaciar log a BD: {e}")
-        if 'conn' in locals():
-            conn.rollback()
\ No newline at end of file
+        logger.error("❌ Error al vaciar log a BD: %s", e)
+        inversionista.vaciado_log_fallido = True
@@ -1,58 +1,348 @@
 # main.py
+import argparse
+import atexit
 import logging
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 from clases import Inversionista
-from dao.inversionistas import obtener_todos_inversionistas_activos
-from simulador import Simulador
-from db_connection import conectar_db
-
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)s | %(message)s',
-    handlers=[
-        logging.FileHandler('simulador.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
-
-
-def main():
+from dao.backend_datos import obtener_backend, configurar_backend
+from simulador import Simulador, MINUTOS_CHECKPOINT_OPERACIONES
+from dao.almacen_precios import PriceStore
+from dao.registro_estrategias import RegistroEstrategias, configurar_registro_estrategias, obtener_registro_estrategias
+from db_connection import cerrar_db, conectar_db
+from medicion_bd import activar_medicion, medicion_activa, tomar_medicion, combinar_mediciones, reporte_medicion
+from modulos.configuracion_log import configurar_log, parsear_nivel, parsear_niveles
+from modulos.logging_utils import vaciar_log_a_bd
+from modulos.perfilado import PerfilSimulacion
+from modulos.punto_control import PuntoControl
+
+LOG_FORMAT = '%(asctime)s | %(levelname)s | %(message)s'
+LOG_FORMAT_WORKER = '%(asctime)s | %(processName)s | %(levelname)s | %(message)s'
+
+# Reporte de viajes a la BD de la corrida (con --medir-bd)
+RUTA_REPORTE_BD = 'medicion_bd.txt'
+
+# PriceStore del proceso worker (se reutiliza entre inversionistas con el mismo rango)
+_price_store_worker = None
+
+
+def configurar_logging(opciones_log=None):
+    """
+    Logging del proceso principal: archivo + consola, escritos por el hilo
+    del QueueListener. opciones_log: argumentos de configurar_log (nivel,
+    niveles, silencioso).
+    """
+    configurar_log(
+        [logging.FileHandler('simulador.log', encoding='utf-8'), logging.StreamHandler()],
+        LOG_FORMAT, **(opciones_log or {})
+    )
+
+
+def configurar_backend_sqlite(ruta_sqlite):
+    """
+    Usa un archivo SQLite como backend global en lugar de PostgreSQL.
+    """
+    from dao.backend_sqlite import BackendSQLite
+    configurar_backend(BackendSQLite(ruta_sqlite))
+
+
+def _inicializar_worker(ruta_sqlite=None, opciones_medicion=None, registro_estrategias=None, opciones_log=None):
+    """
+    Inicializador de cada proceso del pool: log propio por worker y cierre de
+    su conexión a la BD al terminar. Con el contexto 'spawn' cada worker
+    arranca sin conexión heredada y abre la suya en la primera consulta.
+    opciones_medicion: argumentos de activar_medicion (None = sin medir).
+    registro_estrategias: RegistroEstrategias cargado por el proceso principal.
+    opciones_log: argumentos de configurar_log, los mismos del proceso principal.
+    """
+    configurar_log([logging.FileHandler(f'simulador_worker_{os.getpid()}.log', encoding='utf-8')],
+                   LOG_FORMAT_WORKER, **(opciones_log or {}))
+    if ruta_sqlite:
+        configurar_backend_sqlite(ruta_sqlite)
+    if opciones_medicion is not None:
+        activar_medicion(**opciones_medicion)
+    configurar_registro_estrategias(registro_estrategias)
+    atexit.register(cerrar_db)
+
+
+def _price_store_para(fecha_inicio, fecha_fin):
+    global _price_store_worker
+    store = _price_store_worker
+    if store is None or store.fecha_inicio != fecha_inicio or store.fecha_fin != fecha_fin:
+        store = _price_store_worker = PriceStore.para_rango(fecha_inicio, fecha_fin)
+    return store
+
+
+def simular_inversionista(config, fecha_inicio, fecha_fin, price_store=None, opciones_perfil=None,
+                          opciones_punto_control=None, incremental=False, persistir=True, directorio_resultados=None):
+    """
+    Simula un inversionista y devuelve un resumen. Nunca lanza: los errores se
+    reportan en el resultado para que no detengan al resto.
+    opciones_perfil: argumentos de PerfilSimulacion (directorio, cprofile, traza).
+    opciones_punto_control: argumentos de PuntoControl.para_inversionista
+    (directorio, cada_minutos, cada_segundos, reanudar).
+    incremental: continuar desde el estado final guardado en la BD.
+    persistir: False = modo investigación, sin escribir en la BD; el resumen
+    lleva en 'simulacion' el ResultadoSimulacion (operaciones y eventos en
+    memoria), que además se guarda en directorio_resultados si se indica.
+    """
+    id_inversionista = config['id_inversionista']
+    inicio = time.perf_counter()
+    inv = None
+    try:
+        logging.info(f"💼 Cargando inversión: ID={id_inversionista}")
+        logging.info(f"💰 Capital inicial: {config['capital_aportado']:.2f}")
+        inv = Inversionista(id_inv=id_inversionista, capital=config['capital_aportado'], config=config)
+        if price_store is None:
+            price_store = _price_store_para(fecha_inicio, fecha_fin)
+        perfil = PerfilSimulacion(id_inversionista, **(opciones_perfil or {}))
+        punto_control = None
+        if opciones_punto_control is not None:
+            punto_control = PuntoControl.para_inversionista(id_inversionista=id_inversionista, **opciones_punto_control)
+        sim = Simulador(inversionista=inv, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin,
+                        price_store=price_store, perfil=perfil, punto_control=punto_control,
+                        incremental=incremental, persistir=persistir)
+        logging.info(f"⚙️  Ejecutando simulador para inversionista {id_inversionista}...")
+        simulacion = sim.ejecutar()
+        logging.info(f"✅ Simulación completada para inversionista {id_inversionista}")
+        if simulacion is not None and directorio_resultados:
+            logging.info(f"🧪 Resultado en memoria guardado: {simulacion.guardar(directorio_resultados)}")
+        return {
+            'id_inversionista': id_inversionista,
+            'ok': True,
+            'capital_final': inv.capital_actual,
+            'duracion_seg': time.perf_counter() - inicio,
+            'error': None,
+            'medicion_bd': tomar_medicion() if medicion_activa() else None,
+            'simulacion': simulacion
+        }
+    except Exception as e:
+        logging.error(f"❌ Simulación fallida para inversionista {id_inversionista}: {e}")
+        if inv is not None:
+            vaciar_log_a_bd(inv)  # No perder los eventos que quedaron en el buffer
+        return {
+            'id_inversionista': id_inversionista,
+            'ok': False,
+            'capital_final': None,
+            'duracion_seg': time.perf_counter() - inicio,
+            'error': f"{type(e).__name__}: {e}",
+            'traceback': traceback.format_exc(),
+            'medicion_bd': tomar_medicion() if medicion_activa() else None,
+            'simulacion': None
+        }
+
+
+def ejecutar_en_paralelo(configs, fecha_inicio, fecha_fin, workers, ruta_sqlite=None, opciones_perfil=None,
+                         opciones_medicion=None, opciones_punto_control=None, incremental=False, persistir=True,
+                         registro_estrategias=None, opciones_log=None, directorio_resultados=None):
+    """
+    Reparte los inversionistas en un pool de procesos (uno por worker, cada
+    uno con su conexión y su archivo de log). El registro de estrategias se
+    envía una vez a cada worker.
+    """
+    resultados = []
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=contexto,
+                             initializer=_inicializar_worker, initargs=(ruta_sqlite, opciones_medicion, registro_estrategias, opciones_log)) as pool:
+        futuros = {
+            pool.submit(simular_inversionista, config, fecha_inicio, fecha_fin,
+                        opciones_perfil=opciones_perfil,
+                        opciones_punto_control=opciones_punto_control,
+                        incremental=incremental, persistir=persistir,
+                        directorio_resultados=directorio_resultados): config['id_inversionista']
+            for config in configs
+        }
+        for futuro in as_completed(futuros):
+            id_inversionista = futuros[futuro]
+            try:
+                resultado = futuro.result()
+            except Exception as e:
+                # El proceso worker murió (p. ej. BrokenProcessPool)
+                resultado = {
+                    'id_inversionista': id_inversionista,
+                    'ok': False,
+                    'capital_final': None,
+                    'duracion_seg': None,
+                    'error': f"{type(e).__name__}: {e}"
+                }
+            estado = "✅" if resultado['ok'] else "❌"
+            logging.info(f"{estado} Inversionista {id_inversionista} terminado ({len(resultados) + 1}/{len(futuros)})")
+            resultados.append(resultado)
+    return resultados
+
+
+def reportar_resultados(resultados):
+    """
+    Resumen agregado de completados y fallidos.
+    """
+    completados = [r for r in resultados if r['ok']]
+    fallidos = [r for r in resultados if not r['ok']]
+    logging.info(f"📊 Resumen: {len(completados)} completados | {len(fallidos)} fallidos | {len(resultados)} total")
+    for r in sorted(resultados, key=lambda r: r['id_inversionista']):
+        duracion = f"{r['duracion_seg']:.1f}s" if r['duracion_seg'] is not None else "-"
+        if r['ok']:
+            simulacion = r.get('simulacion')
+            en_memoria = f" | {len(simulacion.operaciones)} operaciones, {len(simulacion.eventos)} eventos en memoria" \
+                if simulacion is not None else ""
+            logging.info(f"   ✅ ID={r['id_inversionista']} | Capital final={r['capital_final']:.2f} | {duracion}{en_memoria}")
+        else:
+            logging.error(f"   ❌ ID={r['id_inversionista']} | {r['error']} | {duracion}")
+            if r.get('traceback'):
+                logging.debug(r['traceback'])
+
+
+def reportar_medicion_bd(resultados, explicar_top=0, ruta=RUTA_REPORTE_BD):
+    """
+    Junta la medición de viajes a la BD de todos los inversionistas (y la de
+    este proceso, p. ej. la precarga de velas) y escribe el reporte.
+    """
+    medicion = combinar_mediciones(*(r.get('medicion_bd') for r in resultados), tomar_medicion())
+    if explicar_top:
+        with conectar_db() as conn:
+            reporte = reporte_medicion(medicion, conn=conn, explicar_top=explicar_top)
+    else:
+        reporte = reporte_medicion(medicion)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write(reporte + "\n")
+    logging.info(f"📏 Viajes a la BD por función y sentencia ({ruta}):\n{reporte}")
+
+
+def main(workers=None, ruta_sqlite=None, opciones_perfil=None, opciones_medicion=None, explicar_top=0,
+         opciones_punto_control=None, fecha_inicio=None, fecha_fin=None, incremental=False, persistir=True,
+         opciones_log=None, directorio_resultados=None):
     logging.info("🟢 Iniciando simulador de trading...")
-    
+    if ruta_sqlite:
+        configurar_backend_sqlite(ruta_sqlite)
+    if opciones_medicion is not None:
+        activar_medicion(**opciones_medicion)
+
     # 1. Definir rango de simulación
-    fecha_inicio = datetime(2025, 1, 1, 0, 0, 0)
-    fecha_fin = datetime(2025, 3, 1, 0, 0, 0)
-    
-    logging.info(f"📅 Rango de simulación: {fecha_inicio} → {fecha_fin}")
-    
+    fecha_inicio = fecha_inicio or datetime(2025, 1, 1, 0, 0, 0)
+    fecha_fin = fecha_fin or datetime(2025, 3, 1, 0, 0, 0)
+
+    logging.info(f"📅 Rango de simulación: {fecha_inicio} → {fecha_fin}{' (incremental)' if incremental else ''}"
+                 f"{' (sin persistencia)' if not persistir else ''}")
+
     # 2. Obtener todos los inversionistas activos
-    inversionistas_configs = obtener_todos_inversionistas_activos()
-    
+    inversionistas_configs = obtener_backend().obtener_todos_inversionistas_activos()
+
     if not inversionistas_configs:
         logging.error("❌ No se encontraron inversionistas activos")
-        return
-    
-    logging.info(f"👥 Procesando {len(inversionistas_configs)} inversionistas activos")
-    
+        return []
+
+    # Parámetros de estrategias: una consulta para todos los inversionistas y workers
+    registro_estrategias = obtener_registro_estrategias()
+    if registro_estrategias is None:
+        registro_estrategias = RegistroEstrategias.cargar()
+        configurar_registro_estrategias(registro_estrategias)
+    else:
+        registro_estrategias.refrescar()  # Proceso de larga vida: tomar cambios entre corridas
+
+    if workers is None:
+        workers = int(os.environ.get('SIM_WORKERS', os.cpu_count() or 1))
+    workers = max(1, min(workers, len(inversionistas_configs)))
+    logging.info(f"👥 Procesando {len(inversionistas_configs)} inversionistas activos con {workers} worker(s)")
+
     # 3. Procesar cada inversionista
-    for config in inversionistas_configs:
-        id_inversionista = config['id_inversionista']
-        capital_inicial = config['capital_aportado']
-        
-        logging.info(f"💼 Cargando inversión: ID={id_inversionista}")
-        logging.info(f"💰 Capital inicial: {capital_inicial:.2f}")
-        
-        # Crear instancia del inversionista
-        inv = Inversionista(id_inv=id_inversionista, capital=capital_inicial, config=config)
-        
-        # Inicializar y ejecutar simulador
-        sim = Simulador(inversionista=inv, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
-        logging.info(f"⚙️  Ejecutando simulador para inversionista {id_inversionista}...")
-        sim.ejecutar()
-        
-        logging.info(f"✅ Simulación completada para inversionista {id_inversionista}")
+    if workers == 1:
+        # Secuencial en este proceso: velas precargadas una sola vez para todos
+        price_store = PriceStore.para_rango(fecha_inicio, fecha_fin)
+        resultados = [
+            simular_inversionista(config, fecha_inicio, fecha_fin, price_store=price_store,
+                                  opciones_perfil=opciones_perfil, opciones_punto_control=opciones_punto_control,
+                                  incremental=incremental, persistir=persistir,
+                                  directorio_resultados=directorio_resultados)
+            for config in inversionistas_configs
+        ]
+    else:
+        # Caché de velas al día una sola vez: los workers solo la leen
+        obtener_backend().preparar_velas(fecha_inicio, fecha_fin)
+        resultados = ejecutar_en_paralelo(inversionistas_configs, fecha_inicio, fecha_fin, workers, ruta_sqlite,
+                                          opciones_perfil, opciones_medicion, opciones_punto_control, incremental,
+                                          persistir, registro_estrategias, opciones_log, directorio_resultados)
+
+    reportar_resultados(resultados)
+    if medicion_activa():
+        reportar_medicion_bd(resultados, explicar_top)
+    return resultados
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Simulador de trading")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Procesos en paralelo (por defecto SIM_WORKERS o número de CPUs)")
+    parser.add_argument('--sqlite', default=None, metavar='RUTA',
+                        help="Usar un archivo SQLite como backend de datos en lugar de PostgreSQL")
+    parser.add_argument('--perfil', default=None, metavar='DIR',
+                        help="Escribir el resumen de tiempos por fase de cada inversionista en DIR")
+    parser.add_argument('--cprofile', action='store_true',
+                        help="Con --perfil: guardar también un cProfile por inversionista (.prof)")
+    parser.add_argument('--traza', action='store_true',
+                        help="Con --perfil: guardar también una traza Chrome por inversionista (.trace.json)")
+    parser.add_argument('--medir-bd', action='store_true',
+                        help=f"Contar viajes, filas y tiempo por sentencia y escribir {RUTA_REPORTE_BD}")
+    parser.add_argument('--umbral-lento-ms', type=float, default=None,
+                        help="Con --medir-bd: registrar las sentencias más lentas que esto (defecto SIM_CONSULTA_LENTA_MS o 500)")
+    parser.add_argument('--explain', type=int, default=0, metavar='N',
+                        help="Con --medir-bd: agregar EXPLAIN (ANALYZE, BUFFERS) de las N sentencias más lentas")
+    parser.add_argument('--punto-control', default=None, metavar='DIR',
+                        help="Guardar puntos de control por inversionista en DIR para poder reanudar")
+    parser.add_argument('--cada-minutos', type=int, default=None, metavar='N',
+                        help=f"Con --punto-control: guardar cada N minutos simulados (defecto {MINUTOS_CHECKPOINT_OPERACIONES})")
+    parser.add_argument('--cada-segundos', type=float, default=None, metavar='S',
+                        help="Con --punto-control: guardar también cada S segundos de reloj")
+    parser.add_argument('--reanudar', action='store_true',
+                        help="Con --punto-control: continuar desde el último punto de control de cada inversionista")
+    parser.add_argument('--desde', type=datetime.fromisoformat, default=None, metavar='FECHA',
+                        help="Inicio del rango (ISO, p. ej. 2025-03-01T00:01; defecto 2025-01-01)")
+    parser.add_argument('--hasta', type=datetime.fromisoformat, default=None, metavar='FECHA',
+                        help="Fin del rango, inclusive (ISO; defecto 2025-03-01)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Continuar desde el estado final guardado de cada inversionista; "
+                             "--desde debe ser el minuto siguiente al fin de la corrida anterior")
+    parser.add_argument('--sin-persistencia', action='store_true',
+                        help="Modo investigación: leer de la BD pero dejar operaciones, eventos y capital en memoria")
+    parser.add_argument('--resultados', default=None, metavar='DIR',
+                        help="Con --sin-persistencia: guardar operaciones y eventos de cada inversionista en DIR (JSON)")
+    parser.add_argument('--log-nivel', default='INFO', metavar='NIVEL',
+                        help="Nivel del log (DEBUG agrega una línea por apertura, DCA, cierre y rechazo)")
+    parser.add_argument('--log-niveles', default=None, metavar='MODULO=NIVEL,...',
+                        help="Nivel por módulo, p. ej. simulador=WARNING,modulos.confirmacion=DEBUG")
+    parser.add_argument('--silencioso', action='store_true',
+                        help="Modo benchmark: solo WARNING y superiores")
+    args = parser.parse_args()
+    if (args.umbral_lento_ms is not None or args.explain) and not args.medir_bd:
+        parser.error("--umbral-lento-ms y --explain requieren --medir-bd")
+    if (args.cprofile or args.traza) and not args.perfil:
+        parser.error("--cprofile y --traza requieren --perfil DIR")
+    if (args.cada_minutos or args.cada_segundos or args.reanudar) and not args.punto_control:
+        parser.error("--cada-minutos, --cada-segundos y --reanudar requieren --punto-control DIR")
+    if args.sin_persistencia and args.punto_control:
+        parser.error("--sin-persistencia no admite --punto-control")
+    if args.resultados and not args.sin_persistencia:
+        parser.error("--resultados requiere --sin-persistencia")
+    if args.incremental and not args.desde:
+        parser.error("--incremental requiere --desde FECHA")
+    opciones_perfil = {'directorio': args.perfil, 'cprofile': args.cprofile, 'traza': args.traza} if args.perfil else None
+    opciones_medicion = {'umbral_lento_ms': args.umbral_lento_ms} if args.medir_bd else None
+    opciones_punto_control = {
+        'directorio': args.punto_control,
+        'cada_minutos': args.cada_minutos or (None if args.cada_segundos else MINUTOS_CHECKPOINT_OPERACIONES),
+        'cada_segundos': args.cada_segundos,
+        'reanudar': args.reanudar
+    } if args.punto_control else None
+    try:
+        opciones_log = {'nivel': parsear_nivel(args.log_nivel), 'niveles': parsear_niveles(args.log_niveles),
+                        'silencioso': args.silencioso}
+    except ValueError as e:
+        parser.error(str(e))
+    configurar_logging(opciones_log)
+    main(workers=args.workers, ruta_sqlite=args.sqlite, opciones_perfil=opciones_perfil,
+         opciones_medicion=opciones_medicion, explicar_top=args.explain,
+         opciones_punto_control=opciones_punto_control, fecha_inicio=args.desde, fecha_fin=args.hasta,
+         incremental=args.incremental, persistir=not args.sin_persistencia, opciones_log=opciones_log,
+         directorio_resultados=args.resultados)
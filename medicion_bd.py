@@ -0,0 +1,295 @@
+# medicion_bd.py
+try:
+    import psycopg2
+    import psycopg2.extensions
+except ImportError:
+    psycopg2 = None
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+"""
+Medición de viajes a PostgreSQL.
+
+Con la medición activa, las conexiones del pool (db_connection) crean
+cursores CursorMedido, que cuentan ejecuciones, filas y tiempo por
+(función DAO llamadora, plantilla de la sentencia). La plantilla es el SQL
+con espacios colapsados y los literales reemplazados por '?' (así las
+páginas de execute_values comparten plantilla). En cursores de servidor cada
+fetchmany cuenta como un viaje más de la misma plantilla.
+
+- Las sentencias que tardan más de umbral_lento_ms se registran con WARNING.
+- tomar_medicion() entrega lo acumulado y lo reinicia (un bloque por
+  inversionista); combinar_mediciones() junta bloques de varios procesos.
+- reporte_medicion() arma la tabla por plantilla y, con `conn`, agrega
+  EXPLAIN (ANALYZE, BUFFERS) de las más lentas sobre su muestra más lenta,
+  dentro de una transacción que se revierte.
+
+SIM_MEDIR_BD=1 la activa al importar; SIM_CONSULTA_LENTA_MS fija el umbral.
+"""
+
+UMBRAL_CONSULTA_LENTA_MS = float(os.environ.get('SIM_CONSULTA_LENTA_MS', 500))
+LARGO_MAX_SQL_LOG = 300  # Caracteres de SQL en logs y reportes
+
+_activa = False
+_umbral_lento = UMBRAL_CONSULTA_LENTA_MS / 1000
+_estadisticas = {}  # (funcion, plantilla) -> EstadisticaConsulta
+_lock = threading.Lock()
+
+_RE_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?")
+_RE_TUPLAS = re.compile(r"\([^()]*\)(?:\s*,\s*\([^()]*\))+")
+_RE_ESPACIOS = re.compile(r"\s+")
+
+# Sentencias a las que se les puede pedir EXPLAIN ANALYZE (se revierte igual)
+_RE_EXPLICABLE = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+
+
+class EstadisticaConsulta:
+    """
+    Acumulado de una plantilla de SQL emitida desde una función.
+    muestra: (sql, parámetros) de la ejecución más lenta.
+    """
+    __slots__ = ('funcion', 'plantilla', 'ejecuciones', 'filas', 'segundos', 'max_segundos', 'muestra')
+
+    def __init__(self, funcion, plantilla):
+        self.funcion = funcion
+        self.plantilla = plantilla
+        self.ejecuciones = 0
+        self.filas = 0
+        self.segundos = 0.0
+        self.max_segundos = 0.0
+        self.muestra = None
+
+    def sumar(self, filas, segundos, muestra=None):
+        self.ejecuciones += 1
+        self.filas += max(filas, 0)
+        self.segundos += segundos
+        if segundos > self.max_segundos:
+            self.max_segundos = segundos
+            if muestra is not None:
+                self.muestra = muestra
+
+    def como_dict(self):
+        return {attr: getattr(self, attr) for attr in self.__slots__}
+
+
+def plantilla_sql(sql):
+    """
+    Forma normalizada de una sentencia: literales -> '?', listas de tuplas
+    -> '(...)' y espacios colapsados.
+    """
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    elif not isinstance(sql, str):
+        sql = str(sql)  # psycopg2.sql.Composed
+    sql = _RE_TEXTO.sub('?', sql)
+    sql = _RE_NUMERO.sub('?', sql)
+    sql = _RE_TUPLAS.sub('(...)', sql)
+    return _RE_ESPACIOS.sub(' ', sql).strip()
+
+
+def _funcion_llamadora():
+    """
+    'modulo.funcion' del primer frame fuera de psycopg2 y de este módulo.
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        modulo = frame.f_globals.get('__name__', '')
+        if not modulo.startswith(('psycopg2', __name__)):
+            return f"{modulo}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return '?'
+
+
+def _registrar(funcion, sql, parametros, filas, segundos, con_muestra=True):
+    plantilla = plantilla_sql(sql)
+    muestra = None
+    if con_muestra:
+        muestra = (sql.decode('utf-8', 'replace') if isinstance(sql, bytes) else str(sql), parametros)
+    with _lock:
+        estadistica = _estadisticas.get((funcion, plantilla))
+        if estadistica is None:
+            estadistica = _estadisticas[(funcion, plantilla)] = EstadisticaConsulta(funcion, plantilla)
+        estadistica.sumar(filas, segundos, muestra)
+    if segundos >= _umbral_lento:
+        logging.warning(f"🐢 Consulta lenta ({segundos * 1000:.0f} ms) en {funcion}: {plantilla[:LARGO_MAX_SQL_LOG]}")
+    return estadistica
+
+
+if psycopg2 is not None:
+    class CursorMedido(psycopg2.extensions.cursor):
+        """
+        Cursor que registra cada viaje a la BD en la medición del proceso.
+        """
+
+        def execute(self, query, vars=None):
+            funcion = _funcion_llamadora()
+            inicio = time.perf_counter()
+            try:
+                return super().execute(query, vars)
+            finally:
+                self._estadistica = _registrar(funcion, query, vars, self.rowcount, time.perf_counter() - inicio)
+
+        def executemany(self, query, vars_list):
+            funcion = _funcion_llamadora()
+            inicio = time.perf_counter()
+            try:
+                return super().executemany(query, vars_list)
+            finally:
+                _registrar(funcion, query, None, self.rowcount, time.perf_counter() - inicio, con_muestra=False)
+
+        def copy_expert(self, sql, file, size=8192):
+            funcion = _funcion_llamadora()
+            inicio = time.perf_counter()
+            try:
+                return super().copy_expert(sql, file, size)
+            finally:
+                _registrar(funcion, sql, None, self.rowcount, time.perf_counter() - inicio, con_muestra=False)
+
+        def fetchmany(self, size=None):
+            if self.name is None:
+                return super().fetchmany(size) if size is not None else super().fetchmany()
+            inicio = time.perf_counter()
+            filas = super().fetchmany(size) if size is not None else super().fetchmany()
+            estadistica = getattr(self, '_estadistica', None)
+            if estadistica is not None:
+                with _lock:
+                    estadistica.sumar(len(filas), time.perf_counter() - inicio)
+            return filas
+
+        def __iter__(self):
+            if self.name is None:
+                return super().__iter__()
+            return self._iterar_por_bloques()
+
+        def _iterar_por_bloques(self):
+            # Iterar un cursor de servidor pide bloques de itersize filas: uno por viaje
+            while True:
+                filas = self.fetchmany(self.itersize)
+                if not filas:
+                    return
+                yield from filas
+else:
+    CursorMedido = None
+
+
+def activar_medicion(umbral_lento_ms=None):
+    """
+    Activa la medición en este proceso (afecta a las conexiones prestadas
+    desde ese momento).
+    """
+    global _activa, _umbral_lento
+    if CursorMedido is None:
+        logging.warning("⚠️  psycopg2 no está instalado: no hay consultas que medir")
+        return
+    _activa = True
+    if umbral_lento_ms is not None:
+        _umbral_lento = umbral_lento_ms / 1000
+    logging.info(f"📏 Medición de consultas activa (lentas > {_umbral_lento * 1000:.0f} ms)")
+
+
+def desactivar_medicion():
+    global _activa
+    _activa = False
+
+
+def medicion_activa():
+    return _activa
+
+
+def fabrica_cursor():
+    """
+    cursor_factory para las conexiones prestadas: CursorMedido si la medición
+    está activa, el cursor de psycopg2 si no.
+    """
+    return CursorMedido if _activa else psycopg2.extensions.cursor
+
+
+def tomar_medicion():
+    """
+    Retorna lo acumulado como lista de dicts y reinicia los contadores.
+    """
+    global _estadisticas
+    with _lock:
+        estadisticas, _estadisticas = _estadisticas, {}
+    return [e.como_dict() for e in estadisticas.values()]
+
+
+def combinar_mediciones(*mediciones):
+    """
+    Junta listas de tomar_medicion() (de varios inversionistas o procesos).
+    """
+    combinadas = {}
+    for medicion in mediciones:
+        for fila in medicion or ():
+            clave = (fila['funcion'], fila['plantilla'])
+            destino = combinadas.get(clave)
+            if destino is None:
+                combinadas[clave] = dict(fila)
+                continue
+            destino['ejecuciones'] += fila['ejecuciones']
+            destino['filas'] += fila['filas']
+            destino['segundos'] += fila['segundos']
+            if fila['max_segundos'] > destino['max_segundos']:
+                destino['max_segundos'] = fila['max_segundos']
+                destino['muestra'] = fila['muestra']
+    return list(combinadas.values())
+
+
+def explicar(conn, fila):
+    """
+    EXPLAIN (ANALYZE, BUFFERS) de la muestra más lenta de una plantilla. La
+    sentencia se ejecuta de verdad, por eso se revierte al terminar. Retorna
+    el plan como texto o None si la sentencia no se puede explicar.
+    """
+    muestra = fila.get('muestra')
+    if not muestra or not _RE_EXPLICABLE.match(muestra[0]) or 'nextval' in muestra[0].lower():
+        return None  # COPY no admite EXPLAIN; nextval no se revierte
+    sql, parametros = muestra
+    try:
+        # Cursor sin medir: el EXPLAIN no entra en el reporte
+        with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql, parametros)
+            return "\n".join(r[0] for r in cur.fetchall())
+    except Exception as e:
+        return f"(EXPLAIN falló: {e})"
+    finally:
+        conn.rollback()
+
+
+def reporte_medicion(medicion, conn=None, explicar_top=0):
+    """
+    Tabla de texto ordenada por tiempo total, con totales al final. Con
+    `conn` y explicar_top > 0 agrega el plan de las plantillas más lentas.
+    """
+    filas = sorted(medicion, key=lambda f: f['segundos'], reverse=True)
+    total_ejecuciones = sum(f['ejecuciones'] for f in filas)
+    total_segundos = sum(f['segundos'] for f in filas)
+    lineas = [
+        f"{'función':<48}{'viajes':>9}{'filas':>11}{'seg':>10}{'ms prom':>10}{'ms máx':>10}  plantilla"
+    ]
+    for f in filas:
+        promedio = f['segundos'] / f['ejecuciones'] * 1000 if f['ejecuciones'] else 0.0
+        lineas.append(
+            f"{f['funcion'][:47]:<48}{f['ejecuciones']:>9}{f['filas']:>11}{f['segundos']:>10.3f}"
+            f"{promedio:>10.2f}{f['max_segundos'] * 1000:>10.2f}  {f['plantilla'][:120]}"
+        )
+    lineas.append(f"Total: {total_ejecuciones} viajes | {total_segundos:.3f} s | {len(filas)} plantillas")
+
+    if conn is not None and explicar_top:
+        for f in sorted(filas, key=lambda f: f['max_segundos'], reverse=True)[:explicar_top]:
+            plan = explicar(conn, f)
+            if plan is None:
+                continue
+            lineas.append("")
+            lineas.append(f"EXPLAIN {f['funcion']} ({f['max_segundos'] * 1000:.1f} ms): {f['plantilla'][:LARGO_MAX_SQL_LOG]}")
+            lineas.append(plan)
+    return "\n".join(lineas)
+
+
+if os.environ.get('SIM_MEDIR_BD') == '1':
+    activar_medicion()
@@ -1,6 +1,44 @@
 # dao/operaciones.py
 from db_connection import conectar_db
+from dao.copia_bulk import copiar_filas
+from dao.filas_bd import como_dicts
+import json
 import logging
+import math
+from datetime import date, datetime
+
+# Columnas de una apertura (mismo orden que crear_operacion_en_bd) más el id
+COLUMNAS_OPERACION = (
+    'id_operacion',
+    'id_inversionista_fk', 'id_estrategia_fk', 'id_senal_fk', 'ticker_fk',
+    'tipo_operacion', 'precio_entrada', 'cantidad', 'apalancamiento',
+    'stop_loss_price', 'take_profit_price', 'id_operacion_padre',
+    'timestamp_apertura', 'capital_riesgo_usado', 'valor_total_exposicion',
+    'porc_sl', 'porc_tp', 'precio_max_alcanzado', 'cnt_operaciones',
+    'id_vela_1m_apertura'
+)
+
+# Columnas de una operación abierta cargada para una simulación incremental
+COLUMNAS_OPERACION_ABIERTA = COLUMNAS_OPERACION + ('precio_min_alcanzado', 'pyg_no_realizado')
+
+# Requisito de esquema de los puntos de control (marca_persistencia): un id
+# creciente por evento del log. El resto del simulador no usa esta columna.
+DDL_ID_LOG = (
+    "ALTER TABLE log_operaciones_simuladas ADD COLUMN IF NOT EXISTS id_log BIGSERIAL;\n"
+    "CREATE INDEX IF NOT EXISTS ix_log_simuladas_inversionista_id_log "
+    "ON log_operaciones_simuladas (id_inversionista_fk, id_log);"
+)
+PGCODE_COLUMNA_INEXISTENTE = '42703'
+
+
+def _error_esquema_punto_control(e):
+    """
+    Si `e` es por falta de log_operaciones_simuladas.id_log, lo reemplaza
+    por un error que indica cómo agregarla.
+    """
+    if getattr(e, 'pgcode', None) == PGCODE_COLUMNA_INEXISTENTE:
+        return RuntimeError(f"Los puntos de control requieren la columna log_operaciones_simuladas.id_log:\n{DDL_ID_LOG}")
+    return e
 
 
 def crear_operacion_en_bd(
@@ -39,11 +77,74 @@ def crear_operacion_en_bd(
                 return id_operacion
     except Exception as e:
         logging.error(f"❌ Error al crear operación en BD: {e}")
-        if 'conn' in locals():
-            conn.rollback()
         raise
 
 
+def insertar_operaciones_lote(filas, columnas=COLUMNAS_OPERACION, conn=None):
+    """
+    Inserta en bloque operaciones con id ya asignado usando COPY.
+    `filas` son tuplas en el orden de `columnas`.
+    """
+    try:
+        total = copiar_filas('operaciones_simuladas', columnas, filas, conn=conn)
+        logging.info(f"✅ {total} operaciones insertadas en BD (COPY)")
+        return total
+    except Exception as e:
+        logging.error(f"❌ Error al insertar lote de operaciones: {e}")
+        raise
+
+
+def reservar_ids_operacion(cantidad):
+    """
+    Toma `cantidad` valores de la secuencia de id_operacion en una consulta.
+    """
+    query = """
+        SELECT nextval(pg_get_serial_sequence('operaciones_simuladas', 'id_operacion'))
+        FROM generate_series(1, %s);
+    """
+    try:
+        with conectar_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (cantidad,))
+                return [row[0] for row in cur.fetchall()]
+    except Exception as e:
+        logging.error(f"❌ Error al reservar IDs de operación: {e}")
+        raise
+
+
+def _valor_json(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return None
+    return valor
+
+
+def actualizar_operaciones_lote(cambios, conn):
+    """
+    Aplica {id_operacion: {columna: valor}} con un UPDATE ... FROM
+    json_populate_recordset por grupo de columnas (los tipos salen de la
+    propia tabla). Usa `conn` sin confirmar.
+    """
+    grupos = {}
+    for id_operacion, valores in cambios.items():
+        columnas = tuple(sorted(valores))
+        fila = {'id_operacion': id_operacion}
+        fila.update({c: _valor_json(valores[c]) for c in columnas})
+        grupos.setdefault(columnas, []).append(fila)
+    with conn.cursor() as cur:
+        for columnas, filas in grupos.items():
+            asignaciones = ', '.join(f"{c} = v.{c}" for c in columnas)
+            cur.execute(
+                f"""
+                UPDATE operaciones_simuladas o SET {asignaciones}
+                FROM json_populate_recordset(NULL::operaciones_simuladas, %s) v
+                WHERE o.id_operacion = v.id_operacion;
+                """,
+                (json.dumps(filas),)
+            )
+
+
 def actualizar_operacion_dca(
     id_operacion, precio_entrada, cantidad, capital_riesgo_usado,
     valor_total_exposicion, cnt_operaciones
@@ -120,6 +221,30 @@ def actualizar_precio_max_min(id_operacion, precio_max, precio_min):
         logging.error(f"❌ Error al actualizar precios extremos: {e}")
 
 
+def actualizar_precios_max_min_lote(filas):
+    """
+    Actualiza en un solo UPDATE los extremos de varias operaciones.
+    `filas`: [(id_operacion, precio_max, precio_min), ...]
+    """
+    if not filas:
+        return
+    query = """
+        UPDATE operaciones_simuladas o SET
+            precio_max_alcanzado = v.precio_max,
+            precio_min_alcanzado = v.precio_min
+        FROM (VALUES %s) AS v(id_operacion, precio_max, precio_min)
+        WHERE o.id_operacion = v.id_operacion;
+    """
+    from psycopg2.extras import execute_values
+    try:
+        with conectar_db() as conn:
+            with conn.cursor() as cur:
+                execute_values(cur, query, filas, template="(%s, %s::numeric, %s::numeric)", page_size=len(filas))
+            conn.commit()
+    except Exception as e:
+        logging.error(f"❌ Error al actualizar precios extremos en lote: {e}")
+
+
 def obtener_id_vela_1m(ticker, timestamp):
     """
     Obtiene el id de la vela de 1 minuto.
@@ -136,6 +261,112 @@ def obtener_id_vela_1m(ticker, timestamp):
         return None
 
 
+def marca_persistencia(id_inversionista):
+    """
+    (máximo id_operacion, máximo id_log) del inversionista. Todo lo que se
+    escriba después tendrá ids mayores: ambos salen de secuencias.
+
+    id_log no es parte del esquema base de log_operaciones_simuladas: solo
+    los puntos de control lo necesitan y se agrega con DDL_ID_LOG.
+    """
+    query = """
+        SELECT
+            (SELECT COALESCE(MAX(id_operacion), 0) FROM operaciones_simuladas WHERE id_inversionista_fk = %s),
+            (SELECT COALESCE(MAX(id_log), 0) FROM log_operaciones_simuladas WHERE id_inversionista_fk = %s);
+    """
+    try:
+        with conectar_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (id_inversionista, id_inversionista))
+                return tuple(cur.fetchone())
+    except Exception as e:
+        logging.error(f"❌ Error al obtener marca de persistencia: {e}")
+        raise _error_esquema_punto_control(e) from e
+
+
+def descartar_posteriores(id_inversionista, id_operacion_max, id_log_max):
+    """
+    Borra en una transacción los eventos y operaciones del inversionista con
+    id mayor que la marca (los eventos primero: referencian operaciones).
+
+    Solo se deshacen las filas insertadas después de la marca: los UPDATE
+    posteriores sobre filas anteriores (DCA, cierres y extremos de
+    operaciones ya escritas, capital) quedan como estaban, y los corrige la
+    nueva corrida desde el punto de control, que vuelve a escribirlos igual.
+    """
+    try:
+        with conectar_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM log_operaciones_simuladas WHERE id_inversionista_fk = %s AND id_log > %s;",
+                    (id_inversionista, id_log_max)
+                )
+                eventos = cur.rowcount
+                cur.execute(
+                    "DELETE FROM operaciones_simuladas WHERE id_inversionista_fk = %s AND id_operacion > %s;",
+                    (id_inversionista, id_operacion_max)
+                )
+                operaciones_borradas = cur.rowcount
+            conn.commit()
+            logging.info(f"🧹 Descartados {operaciones_borradas} operaciones y {eventos} eventos posteriores al punto de control")
+    except Exception as e:
+        logging.error(f"❌ Error al descartar escrituras posteriores al punto de control: {e}")
+        raise _error_esquema_punto_control(e) from e
+
+
+def obtener_operaciones_abiertas(id_inversionista):
+    """
+    Operaciones del inversionista que siguen abiertas (sin cierre y sin hija
+    de un cierre parcial) como dicts de COLUMNAS_OPERACION_ABIERTA, en el
+    orden en que se abrieron.
+    """
+    query = f"""
+        SELECT {', '.join('o.' + c for c in COLUMNAS_OPERACION_ABIERTA)}
+        FROM operaciones_simuladas o
+        WHERE o.id_inversionista_fk = %s
+          AND o.timestamp_cierre IS NULL
+          AND NOT EXISTS (SELECT 1 FROM operaciones_simuladas h WHERE h.id_operacion_padre = o.id_operacion)
+        ORDER BY o.timestamp_apertura, o.id_senal_fk, o.id_operacion;
+    """
+    try:
+        with conectar_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (id_inversionista,))
+                return como_dicts(cur.fetchall(), COLUMNAS_OPERACION_ABIERTA)
+    except Exception as e:
+        logging.error(f"❌ Error al obtener operaciones abiertas: {e}")
+        raise
+
+
+def resumen_actividad(id_inversionista, dia_inicio, dia_fin):
+    """
+    (operaciones del día, última actividad) del inversionista: aperturas sin
+    padre y DCA con timestamp en [dia_inicio, dia_fin), y el timestamp de
+    apertura o cierre más reciente de sus operaciones (None si no tiene).
+    """
+    query = """
+        SELECT
+            (SELECT COUNT(*) FROM operaciones_simuladas
+             WHERE id_inversionista_fk = %s AND id_operacion_padre IS NULL
+               AND timestamp_apertura >= %s AND timestamp_apertura < %s)
+          + (SELECT COUNT(*) FROM log_operaciones_simuladas
+             WHERE id_inversionista_fk = %s AND tipo_evento = 'dca'
+               AND timestamp_evento >= %s AND timestamp_evento < %s),
+            (SELECT GREATEST(MAX(timestamp_apertura), MAX(timestamp_cierre))
+             FROM operaciones_simuladas WHERE id_inversionista_fk = %s);
+    """
+    try:
+        with conectar_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (id_inversionista, dia_inicio, dia_fin,
+                                    id_inversionista, dia_inicio, dia_fin, id_inversionista))
+                operaciones_dia, ultima_actividad = cur.fetchone()
+                return int(operaciones_dia), ultima_actividad
+    except Exception as e:
+        logging.error(f"❌ Error al obtener resumen de actividad: {e}")
+        raise
+
+
 def actualizar_pyg_no_realizado(id_operacion, pyg_no_realizado):
     """
     Actualiza el pyg_no_realizado en BD.
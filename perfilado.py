@@ -0,0 +1,171 @@
+# modulos/perfilado.py
+import cProfile
+import json
+import logging
+import os
+import time
+from collections import Counter
+
+"""
+Perfilado de Simulador.ejecutar por fases.
+
+PerfilSimulacion acumula segundos y llamadas por fase con time.perf_counter
+(un par de llamadas por medición, sin context managers en el bucle por
+minuto) y contadores de la corrida. Las fases 'precios' y 'bd.*' se miden
+dentro de otras ('intentar_operar', 'monitorear_cierres', 'checkpoint',
+'flush_final'), por eso sus porcentajes se solapan.
+
+Opcionalmente:
+- cprofile=True: cProfile de toda la corrida -> perfil_inv<ID>.prof
+  (se lee con `python -m pstats` o snakeviz);
+- traza=True: eventos de fase en formato Chrome trace ->
+  perfil_inv<ID>.trace.json (chrome://tracing o ui.perfetto.dev).
+
+Con `directorio` el resumen se escribe en perfil_inv<ID>.txt; sin él solo
+va al log.
+"""
+
+# Tope de eventos de la traza Chrome (~100 bytes por evento en el JSON)
+MAX_EVENTOS_TRAZA = 500000
+
+# Orden de las fases en el resumen (las no listadas van al final)
+ORDEN_FASES = (
+    'preparacion', 'confirmaciones', 'senales', 'intentar_operar',
+    'monitorear_cierres', 'precios', 'checkpoint', 'punto_control', 'flush_final'
+)
+
+
+class PerfilSimulacion:
+    """
+    Tiempos por fase y contadores de una simulación (un inversionista).
+    """
+
+    def __init__(self, id_inversionista, directorio=None, cprofile=False, traza=False):
+        self.id_inversionista = id_inversionista
+        self.directorio = directorio
+        self.fases = {}  # fase -> [segundos, llamadas]
+        self.contadores = Counter()
+        self.eventos_traza = [] if traza else None
+        self._trazar = traza
+        self.profiler = cProfile.Profile() if cprofile else None
+        self.inicio = None
+        self.segundos_totales = 0.0
+
+    # --- Medición ---
+
+    def iniciar(self):
+        self.inicio = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def agregar(self, fase, inicio, fin):
+        """
+        Suma a `fase` el intervalo [inicio, fin] medido con time.perf_counter.
+        """
+        acumulado = self.fases.get(fase)
+        if acumulado is None:
+            acumulado = self.fases[fase] = [0.0, 0]
+        acumulado[0] += fin - inicio
+        acumulado[1] += 1
+        if self._trazar:
+            self._agregar_evento_traza(fase, inicio, fin)
+
+    def _agregar_evento_traza(self, fase, inicio, fin):
+        if len(self.eventos_traza) >= MAX_EVENTOS_TRAZA:
+            logging.warning(f"⚠️  Traza del inversionista {self.id_inversionista} truncada en {MAX_EVENTOS_TRAZA} eventos")
+            self._trazar = False
+            return
+        self.eventos_traza.append((fase, inicio, fin))
+
+    def contar(self, contador, cantidad=1):
+        self.contadores[contador] += cantidad
+
+    def finalizar(self):
+        """
+        Detiene la medición, registra el resumen en el log y escribe los
+        archivos pedidos.
+        """
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.inicio is not None:
+            self.segundos_totales = time.perf_counter() - self.inicio
+        resumen = self.tabla_resumen()
+        logging.info(f"⏱️  Perfil de la simulación:\n{resumen}")
+        if self.directorio:
+            self.guardar(resumen)
+        return resumen
+
+    # --- Reporte ---
+
+    def tabla_resumen(self):
+        """
+        Tabla de texto: segundos, % del total, llamadas y µs por llamada de
+        cada fase, seguida de los contadores.
+        """
+        total = self.segundos_totales or sum(s for s, _ in self.fases.values()) or 1.0
+        orden = {fase: k for k, fase in enumerate(ORDEN_FASES)}
+        fases = sorted(self.fases.items(), key=lambda f: (orden.get(f[0], len(orden)), f[0]))
+        lineas = [
+            f"Inversionista {self.id_inversionista} | {self.segundos_totales:.2f} s",
+            f"{'fase':<38}{'seg':>10}{'%':>8}{'llamadas':>12}{'µs/llamada':>12}"
+        ]
+        for fase, (segundos, llamadas) in fases:
+            por_llamada = segundos / llamadas * 1e6 if llamadas else 0.0
+            lineas.append(f"{fase:<38}{segundos:>10.3f}{100 * segundos / total:>7.1f}%{llamadas:>12}{por_llamada:>12.1f}")
+        if self.contadores:
+            lineas.append("contadores: " + " | ".join(f"{c}={n}" for c, n in sorted(self.contadores.items())))
+        return "\n".join(lineas)
+
+    def _ruta(self, sufijo):
+        return os.path.join(self.directorio, f"perfil_inv{self.id_inversionista}{sufijo}")
+
+    def guardar(self, resumen=None):
+        os.makedirs(self.directorio, exist_ok=True)
+        with open(self._ruta('.txt'), 'w', encoding='utf-8') as f:
+            f.write((resumen or self.tabla_resumen()) + "\n")
+        if self.profiler is not None:
+            self.profiler.dump_stats(self._ruta('.prof'))
+        if self.eventos_traza:
+            self._guardar_traza(self._ruta('.trace.json'))
+        logging.info(f"💾 Perfil guardado en {self._ruta('.txt')}")
+
+    def _guardar_traza(self, ruta):
+        pid = os.getpid()
+        base = self.inicio if self.inicio is not None else self.eventos_traza[0][1]
+        eventos = [
+            {
+                'name': fase, 'cat': 'simulador', 'ph': 'X', 'pid': pid, 'tid': self.id_inversionista,
+                'ts': round((inicio - base) * 1e6, 3), 'dur': round((fin - inicio) * 1e6, 3)
+            }
+            for fase, inicio, fin in self.eventos_traza
+        ]
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': eventos, 'displayTimeUnit': 'ms'}, f)
+
+
+class BackendCronometrado:
+    """
+    Envuelve un BackendDatos y mide cada método llamado como fase 'bd.<método>'.
+    Los atributos que no son métodos se leen del backend envuelto.
+    """
+
+    def __init__(self, backend, perfil):
+        self._backend = backend
+        self._perfil = perfil
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._backend, nombre)
+        if not callable(atributo):
+            return atributo
+        perfil = self._perfil
+        fase = f"bd.{nombre}"
+
+        def medido(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return atributo(*args, **kwargs)
+            finally:
+                perfil.agregar(fase, inicio, time.perf_counter())
+
+        setattr(self, nombre, medido)  # Próximas llamadas sin pasar por __getattr__
+        return medido
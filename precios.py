@@ -1,7 +1,6 @@
 # dao/precios.py
 from db_connection import conectar_db
 import logging
-from decimal import Decimal
 
 """
 Acceso a velas de 1 minuto.
@@ -13,9 +12,33 @@ Funciones públicas:
 - obtener_precio_min_max_close(ticker, ts) -> (high, low, close)
 - obtener_id_vela_1m(ticker, ts) -> id
 - obtener_close_1m(ticker, ts) -> close
+
+Si hay un PriceStore instalado (configurar_price_store) y cubre el ticker y el
+minuto pedidos, la consulta se atiende desde memoria; si no, la atiende el
+backend de datos activo (dao/backend_datos.py), que en PostgreSQL usa
+consultar_vela_1m.
 """
 
-def _obtener_crudo_vela_1m(ticker: str, timestamp):
+# PriceStore activo (dao/almacen_precios.py); None = consultar siempre la BD
+_price_store = None
+
+
+def configurar_price_store(store):
+    """
+    Instala el PriceStore que atiende las consultas de velas. None lo retira.
+    """
+    global _price_store
+    _price_store = store
+
+
+def obtener_price_store():
+    return _price_store
+
+
+def consultar_vela_1m(ticker: str, timestamp):
+    """
+    (id, high, low, close) de una vela leída directamente de ohlcv_raw_1m.
+    """
     query = """
         SELECT id, high, low, close
         FROM ohlcv_raw_1m
@@ -29,19 +52,20 @@ def _obtener_crudo_vela_1m(ticker: str, timestamp):
                 row = cur.fetchone()
                 if not row:
                     return None, None, None, None
-                id_vela, high, low, close = row
-
-                def to_float(v):
-                    if isinstance(v, (Decimal,)):
-                        return float(v)
-                    return float(v) if v is not None else None
-
-                return id_vela, to_float(high), to_float(low), to_float(close)
+                return row  # ✅ NUMERIC ya llega como float (db_connection.registrar_numeric_float)
     except Exception as e:
         logging.error(f"❌ Error al obtener vela 1m: {e}")
         return None, None, None, None
 
 
+def _obtener_crudo_vela_1m(ticker: str, timestamp):
+    store = _price_store
+    if store is not None and store.cubre(ticker, timestamp):
+        return store.obtener(ticker, timestamp)
+    from dao.backend_datos import obtener_backend
+    return obtener_backend().obtener_vela_1m(ticker, timestamp)
+
+
 # --- Función original mantenida por compatibilidad ---
 def obtener_datos_vela_1m(ticker, timestamp):
     return _obtener_crudo_vela_1m(ticker, timestamp)
@@ -0,0 +1,88 @@
+# modulos/punto_control.py
+import logging
+import os
+import pickle
+import time
+
+"""
+Puntos de control en disco para reanudar Simulador.ejecutar.
+
+Cada N minutos simulados y/o cada S segundos de reloj, Simulador escribe en
+la BD todo lo pendiente (operaciones diferidas, extremos y log) y, si quedó
+todo escrito, guarda en un archivo local el estado del minuto: capital y
+contadores del inversionista, operaciones abiertas, cola del Confirmador,
+señales procesadas, IDs de operación reservados y una marca de lo ya
+persistido (backend.marca_persistencia).
+
+Al reanudar se borra de la BD lo escrito después de la marca (vaciados del
+log y checkpoints entre el último punto de control y la caída) y la
+simulación sigue desde ese minuto con los IDs reservados que quedaban, así
+las filas quedan como si la corrida no se hubiera interrumpido (salvo los
+id_operacion de bloques reservados después del punto de control: la
+secuencia no retrocede). Solo se borran filas insertadas: lo actualizado
+después en filas anteriores (DCA, cierres, extremos) no se revierte, y lo
+vuelve a escribir la corrida reanudada, que es determinista.
+
+En PostgreSQL la marca usa log_operaciones_simuladas.id_log, que no es parte
+del esquema base (ver dao/operaciones.DDL_ID_LOG).
+
+El archivo se escribe en uno temporal y se renombra, de modo que una caída
+a mitad de escritura deja el punto de control anterior. Al terminar bien la
+simulación se borra.
+"""
+
+VERSION_PUNTO_CONTROL = 3  # 3: confirmaciones programadas por adelantado (Confirmador._programadas)
+
+
+class PuntoControl:
+    """
+    Archivo de punto de control de un inversionista y su frecuencia.
+    """
+
+    def __init__(self, ruta, cada_minutos=None, cada_segundos=None, reanudar=False):
+        self.ruta = ruta
+        self.cada_minutos = cada_minutos
+        self.cada_segundos = cada_segundos
+        self.reanudar = reanudar  # Continuar desde el archivo si existe
+        self.ultimo_guardado = time.monotonic()
+
+    @classmethod
+    def para_inversionista(cls, directorio, id_inversionista, **opciones):
+        os.makedirs(directorio, exist_ok=True)
+        return cls(os.path.join(directorio, f"punto_control_inv{id_inversionista}.pkl"), **opciones)
+
+    def toca_guardar(self, minutos):
+        """
+        True si tras `minutos` simulados corresponde guardar.
+        """
+        if self.cada_minutos and minutos % self.cada_minutos == 0:
+            return True
+        return bool(self.cada_segundos) and time.monotonic() - self.ultimo_guardado >= self.cada_segundos
+
+    def guardar(self, estado):
+        temporal = f"{self.ruta}.tmp"
+        with open(temporal, 'wb') as f:
+            pickle.dump({'version': VERSION_PUNTO_CONTROL, **estado}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self.ruta)
+        self.ultimo_guardado = time.monotonic()
+        logging.info(f"📌 Punto de control guardado: {self.ruta} | minuto {estado['minuto']}")
+
+    def cargar(self):
+        """
+        Estado guardado, o None si no hay archivo.
+        """
+        if not os.path.exists(self.ruta):
+            return None
+        with open(self.ruta, 'rb') as f:
+            estado = pickle.load(f)
+        if estado.get('version') != VERSION_PUNTO_CONTROL:
+            raise ValueError(f"Punto de control {self.ruta} con versión {estado.get('version')} "
+                             f"(se esperaba {VERSION_PUNTO_CONTROL})")
+        return estado
+
+    def eliminar(self):
+        if os.path.exists(self.ruta):
+            os.remove(self.ruta)
+            logging.info(f"🗑️  Punto de control eliminado: {self.ruta}")
@@ -0,0 +1,96 @@
+# dao/registro_estrategias.py
+import logging
+from types import MappingProxyType
+from dao.backend_datos import obtener_backend
+
+"""
+Registro de parámetros de cierre de las estrategias activas.
+
+Se carga con una sola consulta (backend.cargar_parametros_estrategias) y
+guarda, por estrategia, los parámetros ya convertidos a fracción como
+mappings de solo lectura, para compartirlos entre simuladores. Se puede
+serializar (pickle) para pasarlo una vez a cada proceso worker en lugar de
+que cada uno consulte la BD.
+
+refrescar() vuelve a leer la tabla y reemplaza los parámetros solo si
+cambiaron, así un proceso de larga vida toma los cambios sin reiniciarse.
+"""
+
+# Registro del proceso; None = cada Simulador carga el suyo
+_registro = None
+
+
+class RegistroEstrategias:
+    """
+    {id_estrategia: parámetros} de solo lectura, con versión.
+    """
+
+    def __init__(self, parametros):
+        self._parametros = self._congelar(parametros)
+        self.version = 1  # Aumenta con cada refrescar() que encuentra cambios
+
+    @staticmethod
+    def _congelar(parametros):
+        return {id_estrategia: MappingProxyType(dict(p)) for id_estrategia, p in parametros.items()}
+
+    @classmethod
+    def cargar(cls, backend=None):
+        backend = backend if backend is not None else obtener_backend()
+        registro = cls(backend.cargar_parametros_estrategias())
+        logging.info(f"📚 Registro de estrategias: {len(registro)} activas")
+        return registro
+
+    def __reduce__(self):
+        # MappingProxyType no se serializa: se envían dicts y se vuelven a congelar
+        return _restaurar, ({i: dict(p) for i, p in self._parametros.items()}, self.version)
+
+    def __len__(self):
+        return len(self._parametros)
+
+    def __contains__(self, id_estrategia):
+        return id_estrategia in self._parametros
+
+    def obtener(self, id_estrategia):
+        """Parámetros de la estrategia (ValueError si no está activa)."""
+        parametros = self._parametros.get(id_estrategia)
+        if parametros is None:
+            raise ValueError(f"❌ ERROR CRÍTICO: No se encontró estrategia activa con ID {id_estrategia}")
+        return parametros
+
+    def refrescar(self, backend=None):
+        """
+        Relee los parámetros. Retorna True si cambiaron (y sube la versión).
+        """
+        backend = backend if backend is not None else obtener_backend()
+        nuevos = self._congelar(backend.cargar_parametros_estrategias())
+        if nuevos == self._parametros:
+            return False
+        cambiadas = sorted(
+            i for i in nuevos.keys() | self._parametros.keys()
+            if nuevos.get(i) != self._parametros.get(i)
+        )
+        self._parametros = nuevos
+        self.version += 1
+        logging.info(f"🔄 Registro de estrategias actualizado (versión {self.version}): "
+                     f"{len(cambiadas)} estrategias cambiaron {cambiadas[:10]}")
+        return True
+
+
+def _restaurar(parametros, version):
+    registro = RegistroEstrategias(parametros)
+    registro.version = version
+    return registro
+
+
+def configurar_registro_estrategias(registro):
+    """
+    Instala el registro del proceso (lo usan los Simulador que no reciben
+    uno). None vuelve a la carga por simulador.
+    """
+    global _registro
+    _registro = registro
+
+
+def obtener_registro_estrategias():
+    """Registro del proceso, o None si no se configuró."""
+    return _registro
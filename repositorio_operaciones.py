@@ -0,0 +1,123 @@
+# dao/repositorio_operaciones.py
+from dao.backend_datos import obtener_backend
+import logging
+from collections import deque
+
+"""
+Unidad de trabajo para operaciones_simuladas.
+
+Reserva bloques de id_operacion en el backend, mantiene en memoria las
+aperturas, DCA y cierres y los escribe juntos en persistir() con
+backend.persistir_operaciones, que los aplica en una sola transacción
+(en PostgreSQL: un COPY para las nuevas y un UPDATE ... FROM
+json_populate_recordset por grupo de columnas). Un fallo deja los cambios
+pendientes para el siguiente intento.
+"""
+
+logger = logging.getLogger(__name__)
+
+TAMANO_BLOQUE_IDS = 500
+
+
+class RepositorioOperaciones:
+    """
+    Guarda en memoria los cambios de operaciones hasta el próximo persistir().
+    """
+
+    def __init__(self, backend=None, tamano_bloque_ids=TAMANO_BLOQUE_IDS):
+        self.backend = backend if backend is not None else obtener_backend()
+        self.tamano_bloque_ids = tamano_bloque_ids
+        self._ids_libres = deque()
+        self._nuevas = {}  # id_operacion -> tupla en orden de COLUMNAS_OPERACION
+        self._cambios = {}  # id_operacion -> {columna: valor}
+
+    # --- IDs ---
+
+    def _reservar_ids(self):
+        self._ids_libres.extend(self.backend.reservar_ids_operacion(self.tamano_bloque_ids))
+        logger.debug("🔢 Reservados %s IDs de operación", self.tamano_bloque_ids)
+
+    def siguiente_id(self):
+        if not self._ids_libres:
+            self._reservar_ids()
+        return self._ids_libres.popleft()
+
+    def ids_libres(self):
+        """IDs reservados y aún sin usar, en el orden en que se asignarán."""
+        return list(self._ids_libres)
+
+    def restaurar_ids_libres(self, ids):
+        self._ids_libres = deque(ids)
+
+    # --- Registro de cambios ---
+
+    def registrar_apertura(self, op, id_inversionista):
+        """
+        Asigna id a la operación y la deja pendiente de inserción.
+        """
+        id_operacion = self.siguiente_id()
+        self._nuevas[id_operacion] = (
+            id_operacion,
+            id_inversionista, op.id_estrategia_fk, op.id_senal, op.ticker,
+            op.tipo_operacion, op.precio_entrada, op.cantidad, op.apalancamiento,
+            op.stop_loss, op.take_profit, op.id_operacion_padre,
+            op.timestamp_apertura, op.capital_riesgo_usado, op.valor_total_exposicion,
+            op.porc_sl, op.porc_tp, op.precio_max_alcanzado, op.cnt_operaciones,
+            op.id_vela_1m_apertura
+        )
+        return id_operacion
+
+    def _marcar(self, id_operacion, valores):
+        self._cambios.setdefault(id_operacion, {}).update(valores)
+
+    def registrar_dca(self, op):
+        self._marcar(op.id_operacion, {
+            'precio_entrada': op.precio_entrada,
+            'cantidad': op.cantidad,
+            'capital_riesgo_usado': op.capital_riesgo_usado,
+            'valor_total_exposicion': op.valor_total_exposicion,
+            'cnt_operaciones': op.cnt_operaciones
+        })
+
+    def registrar_cierre(self, op, id_vela_1m_cierre):
+        self._marcar(op.id_operacion, {
+            'timestamp_cierre': op.timestamp_cierre,
+            'precio_cierre': op.precio_cierre,
+            'resultado': op.resultado,
+            'motivo_cierre': op.motivo_cierre,
+            'duracion_operacion': op.duracion_operacion,
+            'id_vela_1m_cierre': id_vela_1m_cierre,
+            'estado': 'cerrada_total'
+        })
+
+    def registrar_extremos(self, op):
+        self._marcar(op.id_operacion, {
+            'precio_max_alcanzado': op.precio_max_alcanzado,
+            'precio_min_alcanzado': op.precio_min_alcanzado
+        })
+
+    def registrar_pyg_no_realizado(self, op):
+        self._marcar(op.id_operacion, {'pyg_no_realizado': op.pyg_no_realizado})
+
+    def pendientes(self):
+        return len(self._nuevas) + len(self._cambios)
+
+    # --- Escritura ---
+
+    def persistir(self):
+        """
+        Escribe todas las operaciones y cambios pendientes. Retorna True si
+        no quedó nada pendiente.
+        """
+        if not self._nuevas and not self._cambios:
+            return True
+        nuevas = [self._nuevas[i] for i in sorted(self._nuevas)]  # padres antes que hijas
+        try:
+            self.backend.persistir_operaciones(nuevas, self._cambios)
+            logger.info("💾 Operaciones persistidas: %s nuevas | %s actualizadas", len(nuevas), len(self._cambios))
+            self._nuevas.clear()
+            self._cambios.clear()
+            return True
+        except Exception as e:
+            logger.error("❌ Error al persistir operaciones: %s", e)
+            return False
@@ -1,13 +1,23 @@
 # dao/senales.py
 from db_connection import conectar_db
+from dao.filas_bd import como_columnas, como_dicts
 import logging
-from decimal import Decimal
+import numpy as np
+
+
+COLUMNAS_SENAL = [
+    'id_senal', 'id_estrategia_fk', 'ticker_fk', 'timestamp_senal',
+    'tipo_senal', 'precio_senal', 'target_profit_price',
+    'stop_loss_price', 'apalancamiento_calculado'
+]
+COLUMNAS_FLOAT = ['precio_senal', 'target_profit_price', 'stop_loss_price', 'apalancamiento_calculado']
+# dtype de cada columna de COLUMNAS_SENAL en TablaSenales (None = lista)
+TIPOS_SENAL = (np.int64, None, None, None, None) + (np.float64,) * len(COLUMNAS_FLOAT)
 
 
 def obtener_senales(timestamp):
     """
-    Obtiene señales para un timestamp específico.
-    Convierte todos los Decimal a float.
+    Obtiene señales para un timestamp específico, como dicts de COLUMNAS_SENAL.
     """
     query = """
         SELECT 
@@ -27,25 +37,122 @@ def obtener_senales(timestamp):
         with conectar_db() as conn:
             with conn.cursor() as cur:
                 cur.execute(query, (timestamp,))
-                rows = cur.fetchall()
-                if not rows:
-                    return []
-                columnas = [
-                    'id_senal', 'id_estrategia_fk', 'ticker_fk', 'timestamp_senal',
-                    'tipo_senal', 'precio_senal', 'target_profit_price', 
-                    'stop_loss_price', 'apalancamiento_calculado'
-                ]
-                # Convertir Decimal a float
-                registros = []
-                for row in rows:
-                    registro = {}
-                    for col, val in zip(columnas, row):
-                        if isinstance(val, Decimal):
-                            registro[col] = float(val)
-                        else:
-                            registro[col] = val
-                    registros.append(registro)
-                return registros
+                return como_dicts(cur.fetchall(), COLUMNAS_SENAL)
     except Exception as e:
         logging.error(f"❌ Error al obtener señales: {e}")
-        return []
\ No newline at end of file
+        return []
+
+
+def obtener_tickers_senales_rango(fecha_inicio, fecha_fin):
+    """
+    Obtiene los tickers distintos con señales en [fecha_inicio, fecha_fin].
+    """
+    query = """
+        SELECT DISTINCT ticker_fk
+        FROM senales_generadas
+        WHERE timestamp_senal BETWEEN %s AND %s
+    """
+    try:
+        with conectar_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (fecha_inicio, fecha_fin))
+                return [row[0] for row in cur.fetchall()]
+    except Exception as e:
+        logging.error(f"❌ Error al obtener tickers de señales: {e}")
+        return []
+
+
+class TablaSenales:
+    """
+    Señales de un rango guardadas por columnas, ordenadas por timestamp_senal.
+
+    Los campos numéricos quedan como float64 (NULL -> NaN) y el índice
+    inicio_minuto[m]:inicio_minuto[m + 1] da las filas del minuto m
+    (desplazamiento desde fecha_inicio).
+    """
+
+    def __init__(self, fecha_inicio, fecha_fin, filas):
+        self.fecha_inicio = fecha_inicio
+        self.fecha_fin = fecha_fin
+        delta = fecha_fin - fecha_inicio
+        self.n_minutos = delta.days * 1440 + delta.seconds // 60 + 1
+
+        # Solo cuentan señales alineadas al minuto (obtener_senales usa igualdad exacta)
+        minutos = []
+        alineadas = []
+        for row in filas:
+            d = row[3] - fecha_inicio
+            if d.days < 0 or d.microseconds or d.seconds % 60:
+                continue
+            minuto = d.days * 1440 + d.seconds // 60
+            if minuto >= self.n_minutos:
+                continue
+            minutos.append(minuto)
+            alineadas.append(row)
+
+        (self.id_senal, self.id_estrategia_fk, self.ticker_fk, self.timestamp_senal,
+         self.tipo_senal, *numericos) = como_columnas(alineadas, TIPOS_SENAL)
+        self.numericos = dict(zip(COLUMNAS_FLOAT, numericos))
+        conteo = np.bincount(np.asarray(minutos, dtype=np.int64), minlength=self.n_minutos)
+        self.inicio_minuto = np.zeros(self.n_minutos + 1, dtype=np.int64)
+        np.cumsum(conteo, out=self.inicio_minuto[1:])
+
+    def __len__(self):
+        return len(self.id_senal)
+
+    def _registro(self, i):
+        registro = {
+            'id_senal': int(self.id_senal[i]),
+            'id_estrategia_fk': self.id_estrategia_fk[i],
+            'ticker_fk': self.ticker_fk[i],
+            'timestamp_senal': self.timestamp_senal[i],
+            'tipo_senal': self.tipo_senal[i],
+        }
+        for col in COLUMNAS_FLOAT:
+            val = self.numericos[col][i]
+            registro[col] = None if val != val else float(val)
+        return registro
+
+    def senales_minuto(self, minuto):
+        """
+        Señales del minuto indicado, con el mismo formato que obtener_senales.
+        """
+        if minuto < 0 or minuto >= self.n_minutos:
+            return []
+        inicio = self.inicio_minuto[minuto]
+        fin = self.inicio_minuto[minuto + 1]
+        if inicio == fin:
+            return []
+        return [self._registro(i) for i in range(inicio, fin)]
+
+
+def cargar_senales_rango(fecha_inicio, fecha_fin):
+    """
+    Carga todas las señales de [fecha_inicio, fecha_fin] con una sola consulta
+    ordenada y las devuelve como TablaSenales.
+    """
+    query = """
+        SELECT 
+            id_senal, 
+            id_estrategia_fk, 
+            ticker_fk, 
+            timestamp_senal,
+            tipo_senal, 
+            precio_senal, 
+            target_profit_price, 
+            stop_loss_price, 
+            apalancamiento_calculado
+        FROM senales_generadas 
+        WHERE timestamp_senal BETWEEN %s AND %s
+        ORDER BY timestamp_senal, id_senal
+    """
+    try:
+        with conectar_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (fecha_inicio, fecha_fin))
+                tabla = TablaSenales(fecha_inicio, fecha_fin, cur.fetchall())
+                logging.info(f"📥 {len(tabla)} señales precargadas para {fecha_inicio} → {fecha_fin}")
+                return tabla
+    except Exception as e:
+        logging.error(f"❌ Error al precargar señales: {e}")
+        raise
@@ -1,71 +1,387 @@
 # simulador.py (CORREGIDO Y FINAL)
 
+import json
 import logging
+import os
+import time
 from datetime import datetime, timedelta
-from clases import Inversionista, Operacion
-from dao.senales import obtener_senales
-from dao.precios import obtener_precio_min_max_close, obtener_id_vela_1m
-from dao.estrategias import obtener_parametros_estrategia
+from clases import Inversionista, Operacion, persistir_extremos_pendientes
+from dao.precios import configurar_price_store
+from dao.almacen_precios import PriceStore
+from dao.backend_datos import obtener_backend
+from dao.backend_investigacion import BackendInvestigacion
+from dao.registro_estrategias import RegistroEstrategias, obtener_registro_estrategias
 from modulos.confirmacion import Confirmador
+from modulos.escaner_salidas import escanear_salida, extremos_hasta
 from modulos.logging_utils import registrar_evento, vaciar_log_a_bd
+from modulos.perfilado import PerfilSimulacion, BackendCronometrado
+from dao.repositorio_operaciones import RepositorioOperaciones
+from modulos.configuracion_log import ResumenEventos
+
+logger = logging.getLogger(__name__)
 
 # ✅ Variable temporal mientras se implementa en BD
 PORC_MINIMO_AVANCE_TP_DEFAULT = 0.20  # 20% del camino hacia TP para activar protección
 
+# Cada cuántos minutos simulados se escriben las operaciones diferidas
+MINUTOS_CHECKPOINT_OPERACIONES = 1440
+
+# Cada cuántos minutos simulados se escribe el resumen de eventos (ResumenEventos)
+MINUTOS_RESUMEN_LOG = 60
+
+# Holgura del límite de tamaño en DCA, como fracción de tamano_max: cantidad *
+# precio (float) puede quedar unos ulp bajo el límite ya alcanzado
+TOLERANCIA_LIMITE_DCA = 1e-9
+
+
+class ResultadoSimulacion:
+    """
+    Resultado de una simulación sin persistencia.
+    operaciones: filas de operaciones_simuladas como dicts, por id_operacion.
+    eventos: filas del log como dicts (COLUMNAS_LOG), en orden de registro.
+    """
+    __slots__ = ('id_inversionista', 'capital_final', 'operaciones', 'eventos')
+
+    def __init__(self, id_inversionista, capital_final, operaciones, eventos):
+        self.id_inversionista = id_inversionista
+        self.capital_final = capital_final
+        self.operaciones = operaciones
+        self.eventos = eventos
+
+    def guardar(self, directorio):
+        """
+        Escribe resultado_inv<ID>.json en `directorio` y retorna su ruta.
+        """
+        os.makedirs(directorio, exist_ok=True)
+        ruta = os.path.join(directorio, f"resultado_inv{self.id_inversionista}.json")
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({
+                'id_inversionista': self.id_inversionista,
+                'capital_final': self.capital_final,
+                'operaciones': self.operaciones,
+                'eventos': self.eventos,
+            }, f, default=str, ensure_ascii=False)
+        return ruta
+
+
 class Simulador:
-    def __init__(self, inversionista, fecha_inicio, fecha_fin):
+    def __init__(self, inversionista, fecha_inicio, fecha_fin, price_store=None,
+                 minutos_checkpoint=MINUTOS_CHECKPOINT_OPERACIONES, backend=None, perfil=None,
+                 punto_control=None, incremental=False, persistir=True, registro_estrategias=None):
         self.inv = inversionista
+        # ✅ Tiempos por fase y contadores (archivos de perfil solo si se pasa un PerfilSimulacion con directorio)
+        self.perfil = perfil if perfil is not None else PerfilSimulacion(inversionista.id)
+        backend = backend if backend is not None else obtener_backend()
+        self.persistir = persistir  # ✅ False = modo investigación: se lee del backend pero se escribe en memoria
+        if not persistir:
+            if punto_control is not None:
+                raise ValueError("Una simulación sin persistencia no admite puntos de control")
+            if not isinstance(backend, BackendInvestigacion):
+                backend = BackendInvestigacion(backend)
+        self.memoria = backend if not persistir else None  # ✅ Tablas en memoria del modo investigación
+        self.backend = BackendCronometrado(backend, self.perfil)  # ✅ Acceso a datos (PostgreSQL, memoria, SQLite), medido por método
+        self.inv.backend = self.backend
         self.fecha_inicio = fecha_inicio
         self.fecha_fin = fecha_fin
-        self.timeline = self._generar_timeline()
-        self.confirmador = Confirmador()
+        self.price_store = price_store  # ✅ Velas precargadas (se crea en ejecutar si es None)
+        self.tabla_senales = None  # ✅ Señales del rango, precargadas en ejecutar
+        self.timeline = self._generar_timeline()  # ✅ range de minutos desde fecha_inicio (perezoso)
+        self.confirmador = Confirmador(obtener_precios=self._obtener_precio_min_max_close)
         self.senales_procesadas = set()  # ✅ Evitar procesar la misma señal dos veces
-        self.cache_estrategias = {}  # ✅ Cache para parámetros de estrategias
-        logging.info(f"📋 Simulador inicializado para inversión {self.inv.id}")
+        self.registro_estrategias = registro_estrategias  # ✅ Parámetros de estrategias (None = el del proceso o uno propio)
+        self.minutos_checkpoint = minutos_checkpoint
+        self.punto_control = punto_control  # ✅ PuntoControl: estado en disco para reanudar (None = sin archivo)
+        self.incremental = incremental  # ✅ Continuar desde el estado final guardado en la BD (fecha_inicio = minuto siguiente)
+        self.repositorio = RepositorioOperaciones(self.backend)  # ✅ Operaciones en memoria, se escriben en checkpoints
+        self.inv.repositorio_operaciones = self.repositorio
+        self.inv.resumen_eventos = ResumenEventos(self.inv.id, logger)  # ✅ Una línea de log por hora simulada
+        logger.info("📋 Simulador inicializado para inversión %s", self.inv.id)
 
     def _generar_timeline(self):
-        logging.info(f"⏳ Generando línea de tiempo desde {self.fecha_inicio} hasta {self.fecha_fin}")
-        ts = self.fecha_inicio
-        timeline = []
-        while ts <= self.fecha_fin:
-            timeline.append(ts)
-            ts += timedelta(minutes=1)
-        logging.info(f"⏰ Timeline generado: {len(timeline)} minutos")
-        self.timeline = timeline
-        return timeline
+        """
+        Minutos del rango como enteros (0 = fecha_inicio, mismo índice que el
+        PriceStore). Los datetime se crean con _timestamp solo cuando hacen falta.
+        """
+        delta = self.fecha_fin - self.fecha_inicio
+        self.n_minutos = delta.days * 1440 + delta.seconds // 60 + 1 if delta.days >= 0 else 0
+        logger.info("⏰ Timeline: %s minutos desde %s hasta %s", self.n_minutos, self.fecha_inicio, self.fecha_fin)
+        self.timeline = range(self.n_minutos)
+        return self.timeline
+
+    def _timestamp(self, minuto):
+        return self.fecha_inicio + timedelta(minutes=minuto)
 
     def _obtener_parametros_estrategia_cached(self, id_estrategia):
-        """Obtiene parámetros de estrategia con cache"""
-        if id_estrategia not in self.cache_estrategias:
-            try:
-                self.cache_estrategias[id_estrategia] = obtener_parametros_estrategia(id_estrategia)
-            except Exception as e:
-                logging.critical(f"❌ ERROR CRÍTICO: No se pueden continuar operaciones sin parámetros de estrategia {id_estrategia}")
-                logging.critical(f"Detalles del error: {e}")
-                raise  # Re-lanzar el error para detener ejecución
-        return self.cache_estrategias[id_estrategia]
+        """
+        Parámetros de estrategia desde el RegistroEstrategias: el recibido, el
+        del proceso o, si no hay, uno cargado en una sola consulta al backend.
+        """
+        registro = self.registro_estrategias
+        if registro is None:
+            registro = obtener_registro_estrategias()
+            if registro is None:
+                registro = RegistroEstrategias.cargar(self.backend)
+            self.registro_estrategias = registro
+        try:
+            return registro.obtener(id_estrategia)
+        except Exception as e:
+            logger.critical("❌ ERROR CRÍTICO: No se pueden continuar operaciones sin parámetros de estrategia %s", id_estrategia)
+            logger.critical("Detalles del error: %s", e)
+            raise  # Re-lanzar el error para detener ejecución
+
+    def _preparar_price_store(self):
+        """
+        Precarga las velas del rango para que el bucle por minuto no consulte la BD.
+        """
+        if self.price_store is None:
+            self.price_store = PriceStore.para_rango(self.fecha_inicio, self.fecha_fin, backend=self.backend)
+        elif self.price_store.fecha_inicio != self.fecha_inicio or self.price_store.n_minutos < self.n_minutos:
+            # El minuto del timeline se usa directamente como índice del store
+            raise ValueError(
+                f"El PriceStore ({self.price_store.fecha_inicio} → {self.price_store.fecha_fin}) no cubre "
+                f"el rango del simulador ({self.fecha_inicio} → {self.fecha_fin})"
+            )
+        configurar_price_store(self.price_store)
+        self.confirmador.price_store = self.price_store  # ✅ Reglas de precio resueltas sobre las velas precargadas
+
+    def _obtener_vela(self, ticker, ts):
+        """
+        (id, high, low, close) desde el PriceStore o, si no cubre, desde el backend.
+        """
+        inicio = time.perf_counter()
+        store = self.price_store
+        if store is not None and store.cubre(ticker, ts):
+            vela = store.obtener(ticker, ts)
+        else:
+            vela = self.backend.obtener_vela_1m(ticker, ts)
+        self.perfil.agregar('precios', inicio, time.perf_counter())
+        return vela
+
+    def _obtener_precio_min_max_close(self, ticker, ts):
+        _, high, low, close = self._obtener_vela(ticker, ts)
+        return high, low, close
+
+    def _obtener_id_vela_1m(self, ticker, ts):
+        return self._obtener_vela(ticker, ts)[0]
+
+    def _programar_salida(self, op, minuto):
+        """
+        Escanea hacia adelante desde `minuto` y guarda en el libro de
+        posiciones el primer minuto en que la operación podría cerrar. Retorna
+        (minuto_desde, minuto_evento) o None si el ticker no está en el PriceStore.
+        """
+        serie = self.price_store.serie(op.ticker) if self.price_store is not None else None
+        if serie is None or minuto is None:
+            return None
+        params = self._obtener_parametros_estrategia_cached(op.id_estrategia_fk)
+        resultado = escanear_salida(
+            serie, minuto, op.tipo_operacion, op.precio_entrada, op.take_profit, op.stop_loss,
+            op.precio_max_alcanzado, op.precio_min_alcanzado, params,
+            es_hija=getattr(op, 'es_operacion_hija', False),
+            porc_minimo_avance_tp=PORC_MINIMO_AVANCE_TP_DEFAULT,
+            hasta=self.n_minutos  # ✅ El store puede cubrir más que el rango simulado
+        )
+        minuto_evento = resultado.minuto if resultado.minuto is not None else self.n_minutos
+        self.inv.operaciones_activas.programar_salida(op, minuto, minuto_evento)
+        return minuto, minuto_evento
+
+    def _ponerse_al_dia(self, op, hasta):
+        """
+        Descarta la salida programada de la operación y le aplica los extremos
+        de los minutos saltados [minuto_desde, hasta).
+        """
+        programada = self.inv.operaciones_activas.quitar_salida(op)
+        if programada is None or hasta <= programada[0]:
+            return
+        serie = self.price_store.serie(op.ticker)
+        precio_max, precio_min = extremos_hasta(
+            serie, programada[0], hasta, op.tipo_operacion,
+            op.precio_max_alcanzado, op.precio_min_alcanzado
+        )
+        op.actualizar_precio(precio_max if op.tipo_operacion == "LONG" else precio_min, None)
+
+    def _checkpoint_persistencia(self, minuto):
+        """
+        Escribe en bloque los extremos pendientes y las operaciones diferidas.
+        Las operaciones con salida programada se ponen al día hasta `minuto`.
+        Retorna False si quedaron operaciones sin escribir.
+        """
+        for op in self.inv.operaciones_activas.con_salida_programada():
+            self._ponerse_al_dia(op, minuto)
+        persistir_extremos_pendientes(self.inv.operaciones_activas.values())
+        return self.repositorio.persistir()
 
     def ejecutar(self):
-        logging.info(f"🚀 Iniciando simulación para inversión {self.inv.id}")
-        logging.info(f"💰 Capital inicial: {self.inv.capital_actual:.2f}")
-        for i, ts in enumerate(self.timeline):
+        """
+        Corre la simulación midiendo sus fases; el resumen del perfil se
+        emite aunque la simulación falle. Sin persistencia retorna un
+        ResultadoSimulacion (None si persiste).
+        """
+        self.perfil.iniciar()
+        try:
+            self._ejecutar()
+        finally:
+            self.perfil.finalizar()
+        return self.resultado() if not self.persistir else None
+
+    def resultado(self):
+        """
+        Operaciones, eventos y capital del inversionista desde las tablas en
+        memoria (solo sin persistencia).
+        """
+        if self.memoria is None:
+            raise ValueError("resultado() solo está disponible en simulaciones sin persistencia")
+        operaciones = [
+            dict(registro) for _, registro in sorted(self.memoria.operaciones.items())
+            if registro['id_inversionista_fk'] == self.inv.id
+        ]
+        eventos = [evento for evento in self.memoria.eventos() if evento['id_inversionista_fk'] == self.inv.id]
+        return ResultadoSimulacion(self.inv.id, self.inv.capital_actual, operaciones, eventos)
+
+    def _guardar_punto_control(self, minuto):
+        """
+        Escribe todo lo pendiente y guarda el estado para reanudar desde
+        `minuto`. Si algo quedó sin escribir no guarda: el archivo anterior
+        sigue siendo consistente con la BD.
+        """
+        self._checkpoint_persistencia(minuto)
+        vaciar_log_a_bd(self.inv)
+        if self.repositorio.pendientes() or self.inv.log_eventos:
+            logger.warning("⚠️  Punto de control omitido en el minuto %s: quedan escrituras pendientes", minuto)
+            return
+        self.punto_control.guardar({
+            'id_inversionista': self.inv.id,
+            'fecha_inicio': self.fecha_inicio,
+            'fecha_fin': self.fecha_fin,
+            'minuto': minuto,
+            'marca': self.backend.marca_persistencia(self.inv.id),
+            'inversionista': {
+                'capital_actual': self.inv.capital_actual,
+                'operaciones_hoy': self.inv.operaciones_hoy,
+                'fecha_actual_operaciones': self.inv.fecha_actual_operaciones,
+            },
+            'operaciones': [(clave, op.estado_punto_control()) for clave, op in self.inv.operaciones_activas.items()],
+            'cola_confirmacion': self.confirmador.estado(),
+            'senales_procesadas': self.senales_procesadas,
+            'ids_libres': self.repositorio.ids_libres(),
+        })
+
+    def _restaurar_punto_control(self):
+        """
+        Carga el punto de control, descarta de la BD lo escrito después de él
+        y deja el simulador en su estado. Retorna el minuto desde el que se
+        continúa (None si no hay archivo).
+        """
+        estado = self.punto_control.cargar()
+        if estado is None:
+            logger.info("📌 Sin punto de control en %s: se simula desde el inicio", self.punto_control.ruta)
+            return None
+        if (estado['id_inversionista'], estado['fecha_inicio'], estado['fecha_fin']) != \
+                (self.inv.id, self.fecha_inicio, self.fecha_fin):
+            raise ValueError(
+                f"El punto de control {self.punto_control.ruta} es del inversionista {estado['id_inversionista']} "
+                f"({estado['fecha_inicio']} → {estado['fecha_fin']}), no de esta simulación"
+            )
+        self.backend.descartar_posteriores(self.inv.id, estado['marca'])
+        for atributo, valor in estado['inversionista'].items():
+            setattr(self.inv, atributo, valor)
+        for clave, estado_op in estado['operaciones']:
+            self.inv.operaciones_activas[clave] = Operacion.desde_punto_control(estado_op, self.repositorio, self.backend)
+        self.confirmador.restaurar(estado['cola_confirmacion'])
+        self.senales_procesadas = estado['senales_procesadas']
+        self.repositorio.restaurar_ids_libres(estado['ids_libres'])
+        logger.info("📌 Reanudando desde el minuto %s (%s) | Capital: %.2f | Abiertas: %s", estado['minuto'],
+                    self._timestamp(estado['minuto']), self.inv.capital_actual, len(self.inv.operaciones_activas))
+        return estado['minuto']
+
+    def _cargar_estado_final(self):
+        """
+        Simulación incremental: deja al inversionista como terminó su última
+        simulación (capital, operaciones abiertas y contador del día) para
+        simular solo desde fecha_inicio. Lanza ValueError si ya hay
+        operaciones del inversionista en fecha_inicio o después.
+        """
+        estado = self.backend.cargar_estado_final(self.inv.id, self.fecha_inicio.date())
+        ultima_actividad = estado['ultima_actividad']
+        if ultima_actividad is not None and ultima_actividad >= self.fecha_inicio:
+            raise ValueError(
+                f"El inversionista {self.inv.id} ya tiene operaciones hasta {ultima_actividad}: "
+                f"la simulación incremental debe empezar después ({self.fecha_inicio})"
+            )
+        if estado['capital_actual'] is not None:
+            self.inv.capital_actual = float(estado['capital_actual'])
+        self.inv.operaciones_hoy = estado['operaciones_dia']
+        self.inv.fecha_actual_operaciones = self.fecha_inicio.date()
+        for fila in estado['operaciones_abiertas']:
+            op = Operacion.desde_bd(fila, self.repositorio, self.backend)
+            self.inv.operaciones_activas[op.clave] = op
+        # Las posiciones abiertas pueden ser de tickers sin señales en el rango
+        faltantes = sorted({op.ticker for op in self.inv.operaciones_activas.values()} - set(self.price_store.series))
+        if faltantes:
+            self.backend.cargar_velas(self.price_store, faltantes)
+        logger.info("📂 Continuando desde el estado guardado | Capital: %.2f | Abiertas: %s | Operaciones hoy: %s",
+                    self.inv.capital_actual, len(self.inv.operaciones_activas), self.inv.operaciones_hoy)
+
+    def _operar_senal(self, sen, ts):
+        inicio = time.perf_counter()
+        self._intentar_operar(sen, ts)
+        self.perfil.agregar('intentar_operar', inicio, time.perf_counter())
+
+    def _ejecutar(self):
+        logger.info("🚀 Iniciando simulación para inversión %s", self.inv.id)
+        logger.info("💰 Capital inicial: %.2f", self.inv.capital_actual)
+        perfil = self.perfil
+        reloj = time.perf_counter
+        inicio = reloj()
+        self._preparar_price_store()
+        self.tabla_senales = self.backend.cargar_senales_rango(self.fecha_inicio, self.fecha_fin)
+        primer_minuto = None
+        if self.punto_control is not None and self.punto_control.reanudar:
+            primer_minuto = self._restaurar_punto_control()
+        if primer_minuto is None:
+            primer_minuto = 0
+            if self.incremental:
+                self._cargar_estado_final()
+            if self.punto_control is not None:
+                # Marca inicial: una caída antes del primer punto de control también se puede reanudar
+                self._guardar_punto_control(0)
+        perfil.agregar('preparacion', inicio, reloj())
+        resumen = self.inv.resumen_eventos
+        resumen.desde = self._timestamp(primer_minuto)
+        for i in self.timeline[primer_minuto:]:
+            # Resumen de eventos de la última hora simulada
+            if i % MINUTOS_RESUMEN_LOG == 0 and i > primer_minuto:
+                resumen.emitir(self._timestamp(i))
             # Mostrar progreso cada 300 minutos (5 horas)
             if i % 300 == 0:
-                logging.info(f"⏳ Procesando minuto: {ts} [{i+1}/{len(self.timeline)}] | Capital: {self.inv.capital_actual:.2f}")
+                logger.info("⏳ Procesando minuto: %s [%s/%s] | Capital: %.2f",
+                            self._timestamp(i), i + 1, self.n_minutos, self.inv.capital_actual)
+            ts = None  # ✅ El datetime del minuto se crea solo si algo lo necesita
 
             # 1. Procesar confirmaciones pendientes
-            senales_confirmadas = self.confirmador.procesar_cola(ts, self.inv, registrar_evento)
+            senales_confirmadas = ()
+            if self.confirmador.cola:
+                ts = self._timestamp(i)
+                inicio = reloj()
+                senales_confirmadas = self.confirmador.procesar_cola(ts, self.inv, registrar_evento)
+                perfil.agregar('confirmaciones', inicio, reloj())
             for sen in senales_confirmadas:
                 if sen['id_senal'] in self.senales_procesadas:
                     continue
-                logging.info(f"✅ Señal confirmada: {sen['ticker_fk']} | {sen['tipo_senal']} | ID={sen['id_senal']}")
-                self._intentar_operar(sen, ts)
+                logger.debug("✅ Señal confirmada: %s | %s | ID=%s", sen['ticker_fk'], sen['tipo_senal'], sen['id_senal'])
+                perfil.contar('senales_confirmadas')
+                self._operar_senal(sen, ts)
                 self.senales_procesadas.add(sen['id_senal'])
 
             # 2. Procesar nuevas señales
-            senales = obtener_senales(ts)
+            inicio = reloj()
+            senales = self.tabla_senales.senales_minuto(i)
+            perfil.agregar('senales', inicio, reloj())
             if senales:
-                logging.info(f"🔔 Se encontraron {len(senales)} señales para {ts}")
+                if ts is None:
+                    ts = self._timestamp(i)
+                logger.debug("🔔 Se encontraron %s señales para %s", len(senales), ts)
+                perfil.contar('senales', len(senales))
                 for sen in senales:
                     if sen['id_senal'] in self.senales_procesadas:
                         continue  # ✅ Evitar procesar la misma señal dos veces
@@ -81,23 +397,45 @@ class Simulador:
                             detalle=f"Esperando confirmación para {sen['ticker_fk']} | {sen['tipo_senal']}"
                         )
                     else:
-                        self._intentar_operar(sen, ts)
+                        self._operar_senal(sen, ts)
                         self.senales_procesadas.add(sen['id_senal'])  # ✅ Marcar como procesada
 
             # 3. Monitorear cierres de operaciones activas
-            self._monitorear_cierres(ts)
+            inicio = reloj()
+            self._monitorear_cierres(i, ts)
+            perfil.agregar('monitorear_cierres', inicio, reloj())
+
+            # Checkpoint: escribir operaciones diferidas y extremos pendientes
+            if self.minutos_checkpoint and (i + 1) % self.minutos_checkpoint == 0:
+                inicio = reloj()
+                self._checkpoint_persistencia(i + 1)
+                perfil.agregar('checkpoint', inicio, reloj())
+            if self.punto_control is not None and self.punto_control.toca_guardar(i + 1):
+                inicio = reloj()
+                self._guardar_punto_control(i + 1)
+                perfil.agregar('punto_control', inicio, reloj())
+            perfil.contadores['minutos'] += 1
+        resumen.emitir(self._timestamp(self.n_minutos))
 
         # 4. Calcular pyg_no_realizado para operaciones abiertas
+        inicio = reloj()
         self._calcular_pyg_no_realizado_final()
 
-        # 5. Guardar logs y capital
-        logging.info("💾 Guardando logs en base de datos...")
+        # 5. Guardar operaciones, logs y capital
+        logger.info("💾 Guardando operaciones y logs en base de datos...")
+        persistido = self._checkpoint_persistencia(self.n_minutos)
         vaciar_log_a_bd(self.inv)
-        logging.info("🏦 Actualizando capital del inversionista en BD...")
-        from dao.logs import actualizar_capital_inversionista
-        actualizar_capital_inversionista(self.inv.id, self.inv.capital_actual)
-        logging.info("✅ Simulación finalizada exitosamente.")
-        logging.info(f"📊 Capital final: {self.inv.capital_actual:.2f}")
+        if not persistido or self.repositorio.pendientes() or self.inv.log_eventos:
+            # ✅ Sin actualizar capital ni borrar el punto de control: la corrida se puede reanudar
+            raise RuntimeError(f"Escritura final incompleta: {self.repositorio.pendientes()} operaciones y "
+                               f"{len(self.inv.log_eventos)} eventos sin escribir")
+        logger.info("🏦 Actualizando capital del inversionista en BD...")
+        self.backend.actualizar_capital_inversionista(self.inv.id, self.inv.capital_actual)
+        perfil.agregar('flush_final', inicio, reloj())
+        if self.punto_control is not None:
+            self.punto_control.eliminar()
+        logger.info("✅ Simulación finalizada exitosamente.")
+        logger.info("📊 Capital final: %.2f", self.inv.capital_actual)
 
     def _intentar_operar(self, sen, ts):
         from clases import aplicar_slippage
@@ -148,7 +486,7 @@ class Simulador:
             return
 
         # ✅ Validar límite de operaciones activas (solo para NUEVAS operaciones, no para DCA)
-        clave = f"{sen['ticker_fk']}-{sen['tipo_senal']}"
+        clave = (sen['ticker_fk'], sen['tipo_senal'])
         if clave not in self.inv.operaciones_activas:  # Solo para nuevas operaciones
             if len(self.inv.operaciones_activas) >= self.inv.limite_abiertas:
                 registrar_evento(
@@ -162,7 +500,7 @@ class Simulador:
                 return
 
         # ✅ Obtener high, low y close de la vela de 1 minuto
-        high, low, close = obtener_precio_min_max_close(sen['ticker_fk'], ts)
+        high, low, close = self._obtener_precio_min_max_close(sen['ticker_fk'], ts)
         if not close:
             registrar_evento(
                 inversionista=self.inv,
@@ -189,15 +527,17 @@ class Simulador:
             return
 
         # Clave única por ticker + tipo
-        clave = f"{sen['ticker_fk']}-{sen['tipo_senal']}"
         if clave in self.inv.operaciones_activas:
             # DCA: Acumular en operación existente
             op = self.inv.operaciones_activas[clave]
+            # El DCA cambia el precio de entrada: la salida programada deja de ser válida
+            if self.inv.operaciones_activas.salida_programada(op) is not None:
+                self._ponerse_al_dia(op, self.price_store.offset(ts))
             # ✅ Verificar que el DCA no exceda el tamaño máximo permitido
             capital_actual_op = op.capital_riesgo_usado
             capital_maximo_op = self.inv.tamano_max
             capital_disponible_para_dca = capital_maximo_op - capital_actual_op
-            if capital_disponible_para_dca <= 0:
+            if capital_disponible_para_dca <= TOLERANCIA_LIMITE_DCA * capital_maximo_op:
                 # Ya se alcanzó el límite máximo para esta operación
                 registrar_evento(
                     inversionista=self.inv,
@@ -228,6 +568,7 @@ class Simulador:
             op.aplicar_dca(self.inv, precio_con_slippage, cantidad_dca)
             self.inv.capital_actual -= monto_dca
             self.inv.operaciones_hoy += 1
+            self.perfil.contar('dca')
             # ✅ Registrar evento de DCA
             registrar_evento(
                 inversionista=self.inv,
@@ -251,7 +592,8 @@ class Simulador:
                 nro_operacion=op.cnt_operaciones,
                 id_vela_1m_apertura=op.id_vela_1m_apertura  # ✅ Registrar ID de vela de apertura en el log
             )
-            logging.info(f"🔁 DCA aplicado: {sen['ticker_fk']} | {sen['tipo_senal']} | +{cantidad_dca:.6f} @ {precio_con_slippage} | Monto={monto_dca:.2f}")
+            logger.debug("🔁 DCA aplicado: %s | %s | +%.6f @ %s | Monto=%.2f",
+                         sen['ticker_fk'], sen['tipo_senal'], cantidad_dca, precio_con_slippage, monto_dca)
         else:
             # Nueva operación: usar monto objetivo validado
             monto_operacion = monto_objetivo
@@ -276,7 +618,7 @@ class Simulador:
                 apal = self.inv.apalancamiento_max
 
             # ✅ Obtener id_vela_1m_apertura para registrar en la operación
-            id_vela_apertura = obtener_id_vela_1m(sen['ticker_fk'], ts)
+            id_vela_apertura = self._obtener_id_vela_1m(sen['ticker_fk'], ts)
             if not id_vela_apertura:
                 registrar_evento(
                     inversionista=self.inv,
@@ -301,11 +643,14 @@ class Simulador:
                 id_inversionista=self.inv.id,
                 id_estrategia_fk=sen['id_estrategia_fk'],
                 timestamp_apertura=sen['timestamp_senal'],
-                id_vela_1m_apertura=id_vela_apertura  # ✅ Agregar ID de vela de apertura
+                id_vela_1m_apertura=id_vela_apertura,  # ✅ Agregar ID de vela de apertura
+                repositorio=self.repositorio,
+                backend=self.backend
             )
             self.inv.operaciones_activas[clave] = op
             self.inv.capital_actual -= monto_operacion
             self.inv.operaciones_hoy += 1
+            self.perfil.contar('aperturas')
             registrar_evento(
                 inversionista=self.inv,
                 tipo_evento="apertura",
@@ -328,21 +673,39 @@ class Simulador:
                 nro_operacion=op.cnt_operaciones,
                 id_vela_1m_apertura=id_vela_apertura  # ✅ Registrar ID de vela de apertura en el log
             )
-            logging.info(f"🆕 Apertura: {sen['ticker_fk']} | {sen['tipo_senal']} | {cantidad:.6f} @ {precio_con_slippage} | Monto={monto_operacion:.2f} | Vela ID={id_vela_apertura}")
+            logger.debug("🆕 Apertura: %s | %s | %.6f @ %s | Monto=%.2f | Vela ID=%s", sen['ticker_fk'],
+                         sen['tipo_senal'], cantidad, precio_con_slippage, monto_operacion, id_vela_apertura)
 
-    def _monitorear_cierres(self, ts):
+    def _monitorear_cierres(self, i, ts=None):
         """
-        Monitorea todas las operaciones activas para verificar cierres por:
+        Monitorea las operaciones activas del minuto `i` del timeline (ts es
+        su datetime, si ya se creó) para verificar cierres por:
         - TP
         - Retroceso desde entrada
         - Retroceso desde máximo (CON PROTECCIÓN DE GANANCIAS MÍNIMA)
         - Cierre parcial por SL
         - SL (Stop Loss Total)
         """
-        activas = list(self.inv.operaciones_activas.values())
+        libro = self.inv.operaciones_activas
+        minuto = i if self.price_store is not None else None
+        # ✅ Una comparación sobre el libro descarta las posiciones cuya salida programada es posterior
+        activas = libro.por_evaluar(minuto)
+        if not activas:
+            return
+        if ts is None:
+            ts = self._timestamp(i)
+        evaluadas = []  # Para contar cierres al final sin tocar cada rama
         for op in activas:
-            clave_op = f"{op.ticker}-{op.tipo_operacion}" # Clave única para operar en el diccionario
-            high, low, close = obtener_precio_min_max_close(op.ticker, ts)
+            # ✅ Con velas precargadas, solo se evalúa la operación en el minuto de su próxima salida
+            programada = libro.salida_programada(op) or self._programar_salida(op, minuto)
+            if programada is not None:
+                if programada[1] > minuto:
+                    continue
+                self._ponerse_al_dia(op, minuto)
+            evaluadas.append(op)
+
+            clave_op = op.clave # Clave única para operar en el libro de posiciones
+            high, low, close = self._obtener_precio_min_max_close(op.ticker, ts)
             if not high or not low or not close:
                 continue
 
@@ -355,7 +718,7 @@ class Simulador:
             op.actualizar_precio(close, ts)
 
             # ✅ Obtener id_vela_1m_cierre una sola vez
-            id_vela = obtener_id_vela_1m(op.ticker, ts)
+            id_vela = self._obtener_id_vela_1m(op.ticker, ts)
 
             # ✅ Obtener parámetros de la estrategia asociada a la operación
             try:
@@ -365,7 +728,7 @@ class Simulador:
                 porc_retroceso_parcial = params['porc_retroceso_liquidacion_sl']  # <-- Este es un porcentaje (ej: 0.4 para 40%)
                 porc_liquidacion = params['porc_liquidacion_parcial_sl']  # <-- Este es un porcentaje (ej: 0.5 para 50%)
             except Exception as e:
-                logging.critical(f"❌ ERROR CRÍTICO: Imposible continuar monitoreo de cierres para operación {op.id_operacion}")
+                logger.critical("❌ ERROR CRÍTICO: Imposible continuar monitoreo de cierres para operación %s", op.id_operacion)
                 raise  # Detener ejecución
 
             # --- Cierre por TP ---
@@ -374,7 +737,7 @@ class Simulador:
                 op.cerrar_total(self.inv, close, "Take Profit", ts, id_vela)
                 if clave_op in self.inv.operaciones_activas:
                     del self.inv.operaciones_activas[clave_op]
-                logging.info(f"🎯 TP alcanzado: {op.ticker} | {op.tipo_operacion} | Cerrada")
+                logger.debug("🎯 TP alcanzado: %s | %s | Cerrada", op.ticker, op.tipo_operacion)
                 continue  # Pasar a la siguiente operación
 
             # --- Cierre por retroceso desde entrada ---
@@ -385,7 +748,7 @@ class Simulador:
                     op.cerrar_total(self.inv, close, "Retroceso desde apertura", ts, id_vela)
                     if clave_op in self.inv.operaciones_activas:
                         del self.inv.operaciones_activas[clave_op]
-                    logging.warning(f"📉 Retroceso desde entrada: {op.ticker} | Cerrada")
+                    logger.debug("📉 Retroceso desde entrada: %s | Cerrada", op.ticker)
                     continue  # Pasar a la siguiente operación
             elif op.tipo_operacion == "SHORT":
                 retroceso_desde_entrada = (high - op.precio_entrada) / op.precio_entrada
@@ -393,7 +756,7 @@ class Simulador:
                     op.cerrar_total(self.inv, close, "Retroceso desde apertura", ts, id_vela)
                     if clave_op in self.inv.operaciones_activas:
                         del self.inv.operaciones_activas[clave_op]
-                    logging.warning(f"📈 Retroceso desde entrada: {op.ticker} | Cerrada")
+                    logger.debug("📈 Retroceso desde entrada: %s | Cerrada", op.ticker)
                     continue  # Pasar a la siguiente operación
 
             # --- Cierre por retroceso desde máximo (CON PROTECCIÓN DE GANANCIAS MÍNIMA) ---
@@ -419,11 +782,13 @@ class Simulador:
                             op.cerrar_total(self.inv, close, "Retroceso desde máximo", ts, id_vela)
                             if clave_op in self.inv.operaciones_activas:
                                 del self.inv.operaciones_activas[clave_op]
-                            logging.warning(f"🔻 Retroceso desde máximo: {op.ticker} | Cerrada | Max={op.precio_max_alcanzado:.6f} | MinPermitido={precio_minimo_permitido:.6f} | Actual={low:.6f}")
+                            logger.debug("🔻 Retroceso desde máximo: %s | Cerrada | Max=%.6f | MinPermitido=%.6f | Actual=%.6f",
+                                         op.ticker, op.precio_max_alcanzado, precio_minimo_permitido, low)
                             continue  # Pasar a la siguiente operación
                     else:
                         # No hay ganancia suficiente para activar protección
-                        logging.debug(f"🔒 Protección desactivada: {op.ticker} | Max={op.precio_max_alcanzado:.6f} < MinReq={precio_minimo_activacion:.6f}")
+                        logger.debug("🔒 Protección desactivada: %s | Max=%.6f < MinReq=%.6f",
+                                     op.ticker, op.precio_max_alcanzado, precio_minimo_activacion)
             elif op.tipo_operacion == "SHORT":
                 if op.precio_min_alcanzado < op.precio_entrada:
                     # ✅ Verificar si se ha alcanzado el avance mínimo hacia TP para activar protección
@@ -444,11 +809,13 @@ class Simulador:
                             op.cerrar_total(self.inv, close, "Retroceso desde mínimo", ts, id_vela)
                             if clave_op in self.inv.operaciones_activas:
                                 del self.inv.operaciones_activas[clave_op]
-                            logging.warning(f"🔺 Retroceso desde mínimo: {op.ticker} | Cerrada | Min={op.precio_min_alcanzado:.6f} | MaxPermitido={precio_maximo_permitido:.6f} | Actual={high:.6f}")
+                            logger.debug("🔺 Retroceso desde mínimo: %s | Cerrada | Min=%.6f | MaxPermitido=%.6f | Actual=%.6f",
+                                         op.ticker, op.precio_min_alcanzado, precio_maximo_permitido, high)
                             continue  # Pasar a la siguiente operación
                     else:
                         # No hay ganancia suficiente para activar protección
-                        logging.debug(f"🔒 Protección desactivada: {op.ticker} | Min={op.precio_min_alcanzado:.6f} > MaxReq={precio_maximo_activacion:.6f}")
+                        logger.debug("🔒 Protección desactivada: %s | Min=%.6f > MaxReq=%.6f",
+                                     op.ticker, op.precio_min_alcanzado, precio_maximo_activacion)
 
             # --- Cierre parcial por SL ---
             # Solo se evalúa si NO es una operación hija y si no se activó la protección de retroceso desde máximo
@@ -477,7 +844,7 @@ class Simulador:
                              # Pero como cerrar_parcial reemplaza la clave, esto podría ser redundante.
                              # La clave punto es que NO usamos 'continue' aquí.
                              pass # No hacer nada, la lógica de cerrar_parcial maneja el diccionario
-                         logging.warning(f"⚠️  Cierre parcial por SL: {op.ticker} | {porc_liquidacion}% liquidado")
+                         logger.debug("⚠️  Cierre parcial por SL: %s | %s%% liquidado", op.ticker, porc_liquidacion)
                          # NO usar 'continue' aquí. Permitir que el bucle siga, aunque en la práctica,
                          # la operación original ya no está en la lista 'activas' de esta iteración del for.
                          # La nueva operación hija será procesada en la próxima iteración del timeline.
@@ -490,7 +857,7 @@ class Simulador:
                          # Mismo manejo del diccionario que para LONG
                          if clave_op in self.inv.operaciones_activas:
                              pass # Manejado por cerrar_parcial
-                         logging.warning(f"⚠️  Cierre parcial por SL: {op.ticker} | {porc_liquidacion}% liquidado")
+                         logger.debug("⚠️  Cierre parcial por SL: %s | %s%% liquidado", op.ticker, porc_liquidacion)
                          # NO usar 'continue'
 
             # --- Cierre por SL (Stop Loss Total) ---
@@ -500,17 +867,22 @@ class Simulador:
                 op.cerrar_total(self.inv, close, "Stop Loss", ts, id_vela)
                 if clave_op in self.inv.operaciones_activas:
                     del self.inv.operaciones_activas[clave_op]
-                logging.info(f"🛑 SL alcanzado: {op.ticker} | {op.tipo_operacion} | Cerrada")
+                logger.debug("🛑 SL alcanzado: %s | %s | Cerrada", op.ticker, op.tipo_operacion)
                 continue  # Pasar a la siguiente operación
 
         # Fin del bucle for op in activas
+        for op in evaluadas:
+            if op.estado == "cerrada_total":
+                self.perfil.contar('cierres')
+            elif op.estado == "cerrada_parcial":
+                self.perfil.contar('cierres_parciales')
 
     def _calcular_pyg_no_realizado_final(self):
         """
         Calcula el pyg_no_realizado para operaciones abiertas al final de la simulación.
         """
         for op in self.inv.operaciones_activas.values():
-            high, low, close = obtener_precio_min_max_close(op.ticker, self.fecha_fin)
+            high, low, close = self._obtener_precio_min_max_close(op.ticker, self.fecha_fin)
             if not close:
                 continue
             close = float(close)
@@ -518,6 +890,5 @@ class Simulador:
                 op.pyg_no_realizado = (close - op.precio_entrada) * op.cantidad
             else:
                 op.pyg_no_realizado = (op.precio_entrada - close) * op.cantidad
-            # Actualizar en BD
-            from dao.operaciones import actualizar_pyg_no_realizado
-            actualizar_pyg_no_realizado(op.id_operacion, op.pyg_no_realizado)
\ No newline at end of file
+            # Actualizar en BD (se escribe con el resto de cambios diferidos)
+            self.repositorio.registrar_pyg_no_realizado(op)
\ No newline at end of file